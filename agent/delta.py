@@ -0,0 +1,81 @@
+"""
+Delta-encoded metric uploads.
+Sends a full keyframe every KEYFRAME_INTERVAL samples and, in between, only
+the fields that changed plus counter increases. Totals, boot time and most
+other fields rarely change, so frames shrink to a handful of values.
+The server answers 409 when it has lost our state; we resend a keyframe.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+KEYFRAME_INTERVAL = 60
+
+# Monotonic counters, sent as the increase since the previous frame (mirrors the backend schema)
+COUNTER_FIELDS = (
+    "disk_read_bytes", "disk_write_bytes", "network_sent", "network_recv",
+    "network_packets_sent", "network_packets_recv", "uptime_seconds",
+)
+
+class DeltaEncoder:
+    def __init__(self, keyframe_interval: int = KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.last = None
+        self.since_keyframe = 0
+
+    def reset(self):
+        """Next frame is a keyframe."""
+        self.last = None
+
+    def frame(self, sample: dict, keyframe: bool = False) -> dict:
+        last = self.last
+        keyframe = (
+            keyframe or last is None
+            or self.since_keyframe >= self.keyframe_interval
+            or last.get("system_id") != sample.get("system_id")
+            or last.get("boot_time") != sample.get("boot_time")  # Counters restarted
+        )
+        frame = {"system_id": sample["system_id"], "seq": self.seq + 1, "keyframe": keyframe}
+        if keyframe:
+            frame["fields"] = {name: value for name, value in sample.items() if name != "system_id"}
+            return frame
+
+        fields, counters = {}, {}
+        for name, value in sample.items():
+            if name == "system_id" or last.get(name) == value:
+                continue
+            previous = last.get(name)
+            if name in COUNTER_FIELDS and isinstance(value, int) and isinstance(previous, int) and value > previous:
+                counters[name] = value - previous
+            else:
+                fields[name] = value
+        frame["fields"] = fields
+        if counters:
+            frame["counters"] = counters
+        return frame
+
+    def _sent(self, sample: dict, frame: dict):
+        self.seq = frame["seq"]
+        self.last = sample
+        self.since_keyframe = 0 if frame["keyframe"] else self.since_keyframe + 1
+
+    def post(self, encoder, session, base_url: str, sample: dict):
+        """Send one sample through a WireEncoder; the response is returned as for /metrics."""
+        url = f"{base_url}/metrics/delta"
+        try:
+            frame = self.frame(sample)
+            response = encoder.post(session, url, frame)
+            if response.status_code == 409:
+                logger.info("Server asked for a keyframe.")
+                frame = self.frame(sample, keyframe=True)
+                response = encoder.post(session, url, frame)
+        except Exception:
+            self.reset()  # We can't know whether the server applied the frame
+            raise
+
+        if response.status_code == 202:
+            self._sent(sample, frame)
+        else:
+            self.reset()
+        return response
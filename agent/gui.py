@@ -402,7 +402,7 @@ class ModernAgentGUI:
         from collector import SystemCollector
         collector = SystemCollector()
         session = requests.Session()
-        session.headers.update({"X-API-Key": API_KEY})
+        session.headers.update({"X-API-Key": API_KEY, "X-Agent-Id": socket.gethostname()})
         # ... logic continues ...
 
         try:
@@ -419,13 +419,21 @@ class ModernAgentGUI:
             system_id = reg_resp.json()['id']
             self.system_id = system_id # Cache for UI usage
 
+            from wire import WireEncoder
+            from delta import DeltaEncoder
+            encoder = WireEncoder.negotiate(session, base_url)
+            delta = DeltaEncoder() if encoder.delta else None
+
             while not self.stop_event.is_set():
                 metrics = collector.get_metrics()
                 metrics["system_id"] = system_id
                 
                 try:
-                    resp = session.post(f"{base_url}/metrics", json=metrics)
-                    if resp.status_code == 200:
+                    if delta:
+                        resp = delta.post(encoder, session, base_url, metrics)
+                    else:
+                        resp = encoder.post(session, f"{base_url}/metrics", metrics)
+                    if resp.status_code in (200, 201, 202):
                         self.metrics_count += 1
                         cpu = metrics.get('cpu_usage', 0)
                         mem = metrics.get('memory_percent', 0)
@@ -477,7 +485,7 @@ class ModernAgentGUI:
             API_KEY = os.getenv("AGENT_API_KEY", "secret-agent-key")
 
             session = requests.Session()
-            session.headers.update({"X-API-Key": API_KEY})
+            session.headers.update({"X-API-Key": API_KEY, "X-Agent-Id": socket.gethostname()})
             
             payload = {
                 "system_id": system_id,
@@ -506,7 +514,7 @@ class ModernAgentGUI:
             sys_info['user_label'] = user_label
             
             session = requests.Session()
-            session.headers.update({"X-API-Key": API_KEY})
+            session.headers.update({"X-API-Key": API_KEY, "X-Agent-Id": socket.gethostname()})
             
             reg_resp = session.post(f"{base_url}/systems/register", json=sys_info)
             if reg_resp.status_code == 200:
@@ -530,7 +538,7 @@ class ModernAgentGUI:
             sys_info['user_label'] = user_label
             
             session = requests.Session()
-            session.headers.update({"X-API-Key": API_KEY})
+            session.headers.update({"X-API-Key": API_KEY, "X-Agent-Id": socket.gethostname()})
             
             reg_resp = session.post(f"{base_url}/systems/register", json=sys_info)
             if reg_resp.status_code == 200:
@@ -1,9 +1,12 @@
 import time
 import requests
 import os
+import socket
 import logging
 from dotenv import load_dotenv
 from collector import SystemCollector
+from wire import WireEncoder
+from delta import DeltaEncoder
 
 load_dotenv()
 
@@ -35,7 +38,7 @@ def register_agent(collector, session, user_label=None):
 def main():
     collector = SystemCollector()
     session = requests.Session()
-    session.headers.update({"X-API-Key": API_KEY})
+    session.headers.update({"X-API-Key": API_KEY, "X-Agent-Id": socket.gethostname()})
 
     user_label = os.getenv("USER_LABEL", None)
     
@@ -55,6 +58,8 @@ def main():
     # Actually, register_agent calls it. Let's just trust the print.
     
     system_id = register_agent(collector, session, user_label)
+    encoder = WireEncoder.negotiate(session, SERVER_URL)
+    delta = DeltaEncoder() if encoder.delta else None
 
     logger.info("Starting metric collection loop...")
     while True:
@@ -62,8 +67,11 @@ def main():
             metrics = collector.get_metrics()
             metrics["system_id"] = system_id
             
-            response = session.post(f"{SERVER_URL}/metrics", json=metrics)
-            if response.status_code == 201:
+            if delta:
+                response = delta.post(encoder, session, SERVER_URL, metrics)
+            else:
+                response = encoder.post(session, f"{SERVER_URL}/metrics", metrics)
+            if response.status_code in (201, 202):
                 logger.debug("Metrics sent successfully.")
             elif response.status_code == 404:
                 logger.warning("System ID not found (404). Re-registering...")
@@ -0,0 +1,88 @@
+"""
+Upload encoding for the agent.
+Asks the server which body encodings it accepts (GET /capabilities) and
+sends metrics as msgpack and/or zstd/gzip-compressed when both sides
+support it; otherwise plain JSON, exactly as before.
+"""
+import gzip
+import json
+import logging
+import requests
+
+try:
+    import msgpack
+except ImportError:  # Optional: JSON bodies only
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: gzip only
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+MIN_COMPRESS_BYTES = 256  # Smaller bodies aren't worth the CPU or the header
+
+class WireEncoder:
+    def __init__(self, content_type: str = JSON_TYPE, content_encoding: str = None, delta: bool = False):
+        self.content_type = content_type
+        self.content_encoding = content_encoding
+        self.delta = delta  # Server accepts POST /metrics/delta
+        self.zstd = zstandard.ZstdCompressor(level=3) if content_encoding == "zstd" else None
+
+    @classmethod
+    def negotiate(cls, session, base_url: str) -> "WireEncoder":
+        """Pick the best encoding both sides support; older servers get plain JSON."""
+        try:
+            response = session.get(f"{base_url}/capabilities", timeout=5)
+            caps = response.json() if response.status_code == 200 else {}
+        except (requests.exceptions.RequestException, ValueError):
+            caps = {}
+
+        content_type = MSGPACK_TYPE if msgpack and MSGPACK_TYPE in caps.get("content_types", []) else JSON_TYPE
+        encodings = caps.get("content_encodings", [])
+        if zstandard and "zstd" in encodings:
+            content_encoding = "zstd"
+        elif "gzip" in encodings:
+            content_encoding = "gzip"
+        else:
+            content_encoding = None
+
+        delta = bool(caps.get("delta"))
+        logger.info(f"Upload encoding: {content_type}, compression: {content_encoding or 'none'}, delta: {delta}")
+        return cls(content_type, content_encoding, delta)
+
+    @property
+    def is_plain(self) -> bool:
+        return self.content_type == JSON_TYPE and self.content_encoding is None
+
+    def encode(self, payload) -> tuple:
+        """(body bytes, headers) for a payload."""
+        if self.content_type == MSGPACK_TYPE:
+            body = msgpack.packb(payload, use_bin_type=True)
+        else:
+            body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        headers = {"Content-Type": self.content_type}
+
+        if self.content_encoding and len(body) >= MIN_COMPRESS_BYTES:
+            if self.content_encoding == "zstd":
+                body = self.zstd.compress(body)
+            else:
+                body = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = self.content_encoding
+        return body, headers
+
+    def post(self, session, url: str, payload):
+        if self.is_plain:
+            return session.post(url, json=payload)
+
+        body, headers = self.encode(payload)
+        response = session.post(url, data=body, headers=headers)
+        if response.status_code == 415:
+            # The server no longer accepts this encoding (e.g. downgraded); stay on JSON from now on
+            logger.warning("Server rejected the upload encoding; falling back to JSON.")
+            self.content_type, self.content_encoding, self.zstd = JSON_TYPE, None, None
+            response = session.post(url, json=payload)
+        return response
@@ -0,0 +1,154 @@
+"""
+Async versions of the hot endpoints (ingest, systems, metrics history).
+Mounted ahead of the sync router when DB_ASYNC is enabled, so these paths
+await the database on the event loop instead of occupying threadpool slots.
+Everything else is still served by app/api/endpoints.py.
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime
+
+from app.db.database import get_async_db, SessionLocal
+from app.models import models
+from app.schemas import schemas
+from app.core.security import get_api_key
+from app.core.alerts import check_thresholds
+from app.core.ingest import write_metric_rows
+from app.core.registry import system_registry
+from app.core.history import metric_history, as_utc
+from app.core.wire import WireRoute
+from app.core.delta import delta_state
+from app.core.fastjson import FastJSONResponse, rows_as_dicts
+from app.core.processes import process_tracker, write_process_snapshots
+from app.core.segments import segment_store
+from app.api.endpoints import enqueue_metric, record_batch, process_snapshots, _metric_row, _metric_range, metric_dicts, SYSTEM_COLUMNS, METRIC_COLUMNS
+
+router = APIRouter(route_class=WireRoute)
+
+async def _system_exists(system_id: int, db: AsyncSession) -> bool:
+    # Known ids never reach the database
+    if system_registry.is_known(system_id):
+        return True
+    return await db.run_sync(lambda session: system_registry.exists(system_id, session))
+
+def _check_thresholds(metric: schemas.MetricCreate):
+    # Healthy samples are answered from the alert cache; a session is only used to write alerts
+    db = SessionLocal()
+    try:
+        check_thresholds(metric, db)
+    finally:
+        db.close()
+
+# --- System Endpoints ---
+
+@router.get("/systems", response_model=List[schemas.System], response_class=FastJSONResponse)
+async def get_systems(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    result = await db.execute(select(*SYSTEM_COLUMNS).offset(skip).limit(limit))
+    return FastJSONResponse(rows_as_dicts(result.all(), SYSTEM_COLUMNS))
+
+@router.get("/systems/{system_id:int}", response_model=schemas.System)
+async def get_system(system_id: int, db: AsyncSession = Depends(get_async_db)):
+    system = await db.get(models.System, system_id)
+    if not system:
+        raise HTTPException(status_code=404, detail="System not found")
+    return system
+
+# --- Metric Endpoints ---
+
+@router.post("/metrics", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(get_api_key)])
+async def create_metric(
+    metric: schemas.MetricCreate,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not await _system_exists(metric.system_id, db):
+        raise HTTPException(status_code=404, detail="System not found")
+
+    enqueue_metric(metric)
+
+    background_tasks.add_task(_check_thresholds, metric)
+
+    return {"status": "queued"}
+
+@router.post("/metrics/delta", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(get_api_key)])
+async def create_metric_delta(
+    frame: schemas.MetricDelta,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
+):
+    if not await _system_exists(frame.system_id, db):
+        raise HTTPException(status_code=404, detail="System not found")
+
+    metric = delta_state.apply(frame)
+    enqueue_metric(metric)
+
+    background_tasks.add_task(_check_thresholds, metric)
+
+    return {"status": "queued"}
+
+@router.post("/metrics/batch", status_code=status.HTTP_201_CREATED, dependencies=[Depends(get_api_key)])
+async def create_metrics_batch(
+    batch: schemas.MetricBatch,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db)
+):
+    system_ids = {m.system_id for m in batch.metrics}
+    known_ids = {system_id for system_id in system_ids if await _system_exists(system_id, db)}
+    if not known_ids:
+        raise HTTPException(status_code=404, detail="System not found")
+
+    accepted = [m for m in batch.metrics if m.system_id in known_ids]
+
+    rows = [_metric_row(m) for m in accepted]
+    snapshots = process_snapshots(accepted, rows)
+    try:
+        await db.run_sync(write_metric_rows, rows)
+        await db.run_sync(write_process_snapshots, snapshots)
+        await db.commit()
+    except Exception:
+        process_tracker.forget_unstored(snapshots)
+        raise
+    record_batch(rows, known_ids)
+
+    for metric in accepted:
+        background_tasks.add_task(_check_thresholds, metric)
+
+    return {
+        "status": "stored",
+        "stored": len(accepted),
+        "unknown_systems": sorted(system_ids - known_ids),
+    }
+
+# The :int convertor lets /metrics/export fall through to the sync router
+@router.get("/metrics/{system_id:int}", response_class=FastJSONResponse)
+async def get_metrics_history(
+    system_id: int,
+    limit: int = 100,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Same contract as the sync handler: newest first, ring buffer when possible."""
+    if start is None and end is None and await _system_exists(system_id, db):
+        recent = await db.run_sync(
+            lambda session: metric_history.recent(system_id, limit, session, since=as_utc(since) if since else None)
+        )
+        if recent is not None:
+            return FastJSONResponse(recent)
+
+    if segment_store.enabled:
+        # Segment reads are file I/O, not database work
+        return FastJSONResponse(await run_in_threadpool(
+            segment_store.history, system_id, limit, *(as_utc(t) if t else None for t in (start, end, since))
+        ))
+
+    query = select(*METRIC_COLUMNS).filter(models.Metric.system_id == system_id)
+    query = _metric_range(query, start, end, since)\
+        .order_by(models.Metric.timestamp.desc())\
+        .limit(limit)
+    result = await db.execute(query)
+    return FastJSONResponse(metric_dicts(result.all()))
@@ -1,77 +1,145 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta, timezone
 import uuid
-import csv
-import io
-from fastapi.responses import StreamingResponse
+import asyncio
+from fastapi.responses import StreamingResponse, Response
 
 from app.db.database import get_db
 from app.models import models
 from app.schemas import schemas
 
-router = APIRouter()
+from app.core.wire import WireRoute, capabilities
+
+# WireRoute accepts msgpack and gzip/zstd-compressed bodies besides plain JSON
+router = APIRouter(route_class=WireRoute)
 
 from app.core.security import get_api_key, get_current_user
-from app.core.alerts import check_thresholds
+from app.core.alerts import check_thresholds, alert_cache, publish_alert
+from app.core.anomaly import anomaly_detector
+from app.core.pubsub import event_broker, system_topic, FLEET_TOPIC
+from app.core.ingest import metric_writer, write_metric_rows
+from app.core.registry import system_registry
+from app.core.history import metric_history, as_utc
+from app.core.fleet import fleet_state, load_fleet_snapshot
+from app.core.delta import delta_state
+from app.core.fastjson import FastJSONResponse, schema_columns, rows_as_dicts
+from app.core.drivers import store_inventory, release_inventory
+from app.core.processes import process_tracker, write_process_snapshots, process_history
+from app.core.packing import pack_floats, unpack_floats
+from app.core.segments import segment_store
+from app.core.workers import MULTI_WORKER
+from app.core.rollup import choose_resolution, rollup_points, RESOLUTION_LABELS
+from app.core.export import iter_metrics_csv, columnar_available, COLUMNAR_WRITERS, COLUMNAR_MEDIA_TYPES
+
+@router.get("/capabilities")
+def get_capabilities():
+    """Upload options this server accepts; agents fall back to plain JSON without it."""
+    # Delta state is per process, so frames spread over several workers would never line up
+    return {**capabilities(), "delta": not MULTI_WORKER}
 
 # --- System Endpoints ---
 
 @router.post("/systems/register", response_model=schemas.System, dependencies=[Depends(get_api_key)])
 def register_system(system: schemas.SystemCreate, db: Session = Depends(get_db)):
     db_system = db.query(models.System).filter(models.System.hostname == system.hostname).first()
+    # Unchanged inventories (the common case) are neither rewritten nor re-sent to clients
+    drivers_hash = store_inventory(db, system.drivers) if system.drivers is not None else None
     if db_system:
         # Update existing system with all new fields
-        for field, value in system.dict().items():
+        for field, value in system.dict(exclude={"drivers"}).items():
             if value is not None:
                 setattr(db_system, field, value)
+        previous_hash = db_system.drivers_hash
+        if drivers_hash is not None:
+            db_system.drivers_hash = drivers_hash
         db_system.is_active = True
         db_system.last_seen = datetime.now(timezone.utc)
+        if previous_hash != db_system.drivers_hash:
+            release_inventory(db, previous_hash)
         db.commit()
         db.refresh(db_system)
+        system_registry.add(db_system.id, db_system.last_seen)
+        fleet_state.upsert_system(db_system)
+        _publish_system("updated", db_system)
         return db_system
     
-    new_system = models.System(**system.dict(), last_seen=datetime.now(timezone.utc))
+    new_system = models.System(
+        **system.dict(exclude={"drivers"}), drivers_hash=drivers_hash, last_seen=datetime.now(timezone.utc)
+    )
     db.add(new_system)
     db.commit()
     db.refresh(new_system)
+    system_registry.add(new_system.id, new_system.last_seen)
+    metric_history.mark_new(new_system.id)
+    fleet_state.upsert_system(new_system)
+    _publish_system("registered", new_system)
     return new_system
 
-@router.get("/systems", response_model=List[schemas.System])
-def get_systems(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    # Mark stale systems as offline (60 seconds to allow for network delays)
-    cutoff = datetime.now(timezone.utc) - timedelta(seconds=60)
-    db.query(models.System).filter(
-        models.System.last_seen < cutoff,
-        models.System.is_active == True
-    ).update({"is_active": False})
-    db.commit()
+def _publish_system(action: str, system: models.System):
+    if not event_broker.has_subscribers(system.id):
+        return
+    data = schemas.System.model_validate(system).model_dump()
+    data["action"] = action
+    event_broker.publish("system", data, system_id=system.id)
+
+# List endpoints select just the schema's columns and encode the tuples directly;
+# response_model is kept for the OpenAPI docs
+SYSTEM_COLUMNS = schema_columns(models.System, schemas.System)
+ALERT_COLUMNS = schema_columns(models.Alert, schemas.Alert)
+TICKET_COLUMNS = schema_columns(models.Ticket, schemas.Ticket)
+METRIC_COLUMNS = list(models.Metric.__table__.columns)
 
-    systems = db.query(models.System).offset(skip).limit(limit).all()
-    return systems
+@router.get("/systems", response_model=List[schemas.System], response_class=FastJSONResponse)
+def get_systems(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+    # Pure read: online/offline state is maintained by the LivenessSweeper
+    rows = db.query(*SYSTEM_COLUMNS).offset(skip).limit(limit).all()
+    return FastJSONResponse(rows_as_dicts(rows, SYSTEM_COLUMNS))
 
 @router.get("/systems/{system_id}", response_model=schemas.System)
 def get_system(system_id: int, db: Session = Depends(get_db)):
     system = db.query(models.System).filter(models.System.id == system_id).first()
     if not system:
         raise HTTPException(status_code=404, detail="System not found")
-    
-    # Check status on single fetch too
-    if system.is_active and system.last_seen:
-         # Ensure both are offset-aware for comparison
-         last_seen = system.last_seen
-         if last_seen.tzinfo is None:
-             last_seen = last_seen.replace(tzinfo=timezone.utc)
-             
-         cutoff = datetime.now(timezone.utc) - timedelta(seconds=60)
-         if last_seen < cutoff:
-             system.is_active = False
-             db.commit()
-             db.refresh(system)
-
     return system
 
+@router.get("/systems/{system_id}/drivers", response_class=FastJSONResponse)
+def get_system_drivers(system_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    The system's driver list. The ETag is the inventory's content hash (also
+    in the system's drivers_hash), so clients can revalidate without a download.
+    """
+    row = db.query(models.System.drivers_hash).filter(models.System.id == system_id).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="System not found")
+    if row.drivers_hash is None:
+        return FastJSONResponse([])
+
+    etag = f'"{row.drivers_hash}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    inventory = db.get(models.DriverInventory, row.drivers_hash)
+    return FastJSONResponse(inventory.drivers if inventory else [], headers={"ETag": etag})
+
+@router.get("/systems/{system_id}/processes", response_class=FastJSONResponse)
+def get_system_processes(
+    system_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 100,
+    db: Session = Depends(get_db)
+):
+    """
+    Top-process snapshots, newest first. Snapshots are stored only on change,
+    so the one in effect at `start` is included; `limit=1` gives the current one.
+    """
+    if not system_registry.exists(system_id, db):
+        raise HTTPException(status_code=404, detail="System not found")
+    return FastJSONResponse(process_history(
+        db, system_id, start=as_utc(start) if start else None, end=as_utc(end) if end else None, limit=limit
+    ))
+
 @router.delete("/systems/{system_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(get_current_user)])
 def delete_system(system_id: int, db: Session = Depends(get_db)):
     system = db.query(models.System).filter(models.System.id == system_id).first()
@@ -80,107 +148,369 @@ def delete_system(system_id: int, db: Session = Depends(get_db)):
     
     # Cascade deletes metrics and alerts automatically
     db.delete(system)
+    release_inventory(db, system.drivers_hash)
     db.commit()
+    if segment_store.enabled:
+        segment_store.drop_system(system_id)
+    system_registry.remove(system_id)
+    alert_cache.forget_system(system_id)
+    anomaly_detector.forget_system(system_id)
+    metric_history.forget(system_id)
+    fleet_state.remove(system_id)
+    delta_state.forget(system_id)
+    process_tracker.forget(system_id)
+    event_broker.publish("system", {"action": "deleted", "id": system_id}, system_id=system_id)
     return None
 
+# --- Fleet Endpoints ---
+
+@router.get("/fleet/overview", response_model=schemas.FleetOverview)
+def get_fleet_overview(db: Session = Depends(get_db)):
+    """Identity, online state, latest sample and open alert counts for every system, from memory."""
+    if MULTI_WORKER:
+        systems = load_fleet_snapshot(db)
+    else:
+        systems = fleet_state.snapshot(system_registry.active, system_registry.last_seen)
+    return {"generated_at": datetime.now(timezone.utc), "systems": systems}
+
 # --- Metric Endpoints ---
 
-@router.post("/metrics", status_code=status.HTTP_201_CREATED, dependencies=[Depends(get_api_key)])
+@router.post("/metrics", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(get_api_key)])
 def create_metric(
     metric: schemas.MetricCreate, 
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
-    system = db.query(models.System).filter(models.System.id == metric.system_id).first()
-    if not system:
+    if not system_registry.exists(metric.system_id, db):
         raise HTTPException(status_code=404, detail="System not found")
     
-    # Update system heatlh
-    system.last_seen = datetime.now(timezone.utc)
-    system.is_active = True # If sending metrics, it is active
-    
-    # Save Metric to DB
-    new_metric = models.Metric(
-        system_id=metric.system_id,
-        cpu_usage=metric.cpu_usage,
-        memory_percent=metric.memory_percent,
-        memory_used=metric.memory_used,
-        disk_usage=metric.disk_usage,
-        network_sent=metric.network_sent,
-        network_recv=metric.network_recv,
-        process_count=metric.process_count,
-        boot_time=metric.boot_time,
-        timestamp=datetime.now(timezone.utc)
-    )
-    db.add(new_metric)
-    db.commit()
-    db.refresh(new_metric)
-
-    # Pruning: Delete metrics older than 24 hours for this system (simple cleanup)
-    # To optimize, run this only occasionally or in background, but for now specific per-request is safe for low load.
-    # actually let's do it with 1% probability or just every time if it's indexed? Index on timestamp helps.
-    # Let's keep it simple: No auto-prune on every request (slow).
-    # We will rely on user 'Restarting' to not matter, but disk space grows.
-    # User wanted history.
-    
+    enqueue_metric(metric)
+
     background_tasks.add_task(check_thresholds, metric, db)
     
-    return {"id": new_metric.id, "status": "stored"}
+    return {"status": "queued"}
+
+@router.post("/metrics/delta", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(get_api_key)])
+def create_metric_delta(
+    frame: schemas.MetricDelta,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Delta-encoded sample: a keyframe, or only the fields that changed since the
+    previous frame. 409 asks the agent to resend a keyframe.
+    """
+    if not system_registry.exists(frame.system_id, db):
+        raise HTTPException(status_code=404, detail="System not found")
+
+    metric = delta_state.apply(frame)
+    enqueue_metric(metric)
+
+    background_tasks.add_task(check_thresholds, metric, db)
+
+    return {"status": "queued"}
+
+def enqueue_metric(metric: schemas.MetricCreate):
+    """
+    Hand the row to the write-behind queue; the writer group-commits it.
+    The heartbeat (last_seen / is_active) is batched by the registry.
+    """
+    row = _metric_row(metric)
+    row["timestamp"] = datetime.now(timezone.utc)
+    if not metric_writer.submit(row):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingest queue is full. Please retry.",
+            headers={"Retry-After": "1"}
+        )
+    system_registry.touch(metric.system_id, row["timestamp"])
+
+    # Top processes are stored apart from the row, and only when they changed
+    snapshot = process_tracker.snapshot(metric.system_id, row["timestamp"], metric.top_processes)
+    if snapshot and not metric_writer.submit_processes(snapshot):
+        process_tracker.forget(metric.system_id)  # Retried with the next sample
+
+    _record_metric(metric_history.add(row), metric.top_processes)
+
+# Fleet subscribers get a compact delta; per-system subscribers get the full sample
+FLEET_METRIC_FIELDS = ("system_id", "timestamp", "cpu_usage", "memory_percent", "memory_used", "disk_usage")
+
+def _record_metric(sample: dict, top_processes: Optional[list] = None):
+    fleet_state.record_metric(sample)
+    _publish_metric(sample, top_processes)
+
+def _publish_metric(sample: dict, top_processes: Optional[list] = None):
+    if not event_broker.has_subscribers(sample["system_id"]):
+        return
+    if top_processes is not None:
+        sample = dict(sample, top_processes=top_processes)
+    event_broker.publish(
+        "metric", sample, system_id=sample["system_id"],
+        fleet_data={name: sample[name] for name in FLEET_METRIC_FIELDS}
+    )
+
+def _metric_row(metric: schemas.MetricCreate) -> dict:
+    """Column values for one metrics row, keeping the agent's own timestamp."""
+    return {
+        "system_id": metric.system_id,
+        "cpu_usage": metric.cpu_usage,
+        "cpu_per_core": pack_floats(metric.cpu_per_core),
+        "memory_total": metric.memory_total,
+        "memory_percent": metric.memory_percent,
+        "memory_used": metric.memory_used,
+        "memory_available": metric.memory_available,
+        "swap_total": metric.swap_total,
+        "swap_used": metric.swap_used,
+        "swap_percent": metric.swap_percent,
+        "disk_total": metric.disk_total,
+        "disk_used": metric.disk_used,
+        "disk_free": metric.disk_free,
+        "disk_usage": metric.disk_usage,
+        "disk_read_bytes": metric.disk_read_bytes or 0,
+        "disk_write_bytes": metric.disk_write_bytes or 0,
+        "network_sent": metric.network_sent,
+        "network_recv": metric.network_recv,
+        "network_packets_sent": metric.network_packets_sent,
+        "network_packets_recv": metric.network_packets_recv,
+        "process_count": metric.process_count,
+        "boot_time": metric.boot_time,
+        "uptime_seconds": metric.uptime_seconds,
+        "uptime_human": metric.uptime_human,
+        "timestamp": as_utc(metric.timestamp) if metric.timestamp else datetime.now(timezone.utc),
+    }
+
+@router.post("/metrics/batch", status_code=status.HTTP_201_CREATED, dependencies=[Depends(get_api_key)])
+def create_metrics_batch(
+    batch: schemas.MetricBatch,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    """
+    Store many samples with one multi-row INSERT and a single commit.
+    Samples for unknown systems are skipped and reported back so the agent can re-register.
+    """
+    system_ids = {m.system_id for m in batch.metrics}
+    known_ids = {system_id for system_id in system_ids if system_registry.exists(system_id, db)}
+    if not known_ids:
+        raise HTTPException(status_code=404, detail="System not found")
+
+    accepted = [m for m in batch.metrics if m.system_id in known_ids]
 
-@router.get("/metrics/{system_id}")
-def get_metrics_history(system_id: int, limit: int = 100, db: Session = Depends(get_db)):
-    # Fetch from DB
-    metrics = db.query(models.Metric)\
-        .filter(models.Metric.system_id == system_id)\
+    rows = [_metric_row(m) for m in accepted]
+    snapshots = process_snapshots(accepted, rows)
+    try:
+        write_metric_rows(db, rows)
+        write_process_snapshots(db, snapshots)
+        db.commit()
+    except Exception:
+        process_tracker.forget_unstored(snapshots)
+        raise
+    record_batch(rows, known_ids)
+
+    for metric in accepted:
+        background_tasks.add_task(check_thresholds, metric, db)
+
+    return {
+        "status": "stored",
+        "stored": len(accepted),
+        "unknown_systems": sorted(system_ids - known_ids),
+    }
+
+def process_snapshots(metrics: List[schemas.MetricCreate], rows: List[dict]) -> List[dict]:
+    """Top-process snapshots worth storing for a batch, in sample order."""
+    snapshots = (
+        process_tracker.snapshot(metric.system_id, row["timestamp"], metric.top_processes)
+        for metric, row in zip(metrics, rows)
+    )
+    return [snapshot for snapshot in snapshots if snapshot]
+
+def record_batch(rows: List[dict], system_ids: set):
+    """After a batch is committed: update history, fleet state and heartbeats."""
+    for row in rows:
+        _record_metric(metric_history.add(row))
+
+    now = datetime.now(timezone.utc)
+    for system_id in system_ids:
+        system_registry.touch(system_id, now)
+
+def metric_dicts(rows: List[tuple]) -> List[dict]:
+    """Response dicts for metric row tuples, shaped like the ring buffer's samples."""
+    metrics = rows_as_dicts(rows, METRIC_COLUMNS)
+    for metric in metrics:
+        metric["timestamp"] = as_utc(metric["timestamp"])
+        metric["cpu_per_core"] = unpack_floats(metric["cpu_per_core"])
+    return metrics
+
+def _metric_range(query, start: Optional[datetime], end: Optional[datetime], since: Optional[datetime] = None):
+    """Apply start (inclusive), end (exclusive) and since (exclusive) bounds on Metric.timestamp."""
+    if start:
+        query = query.filter(models.Metric.timestamp >= as_utc(start))
+    if end:
+        query = query.filter(models.Metric.timestamp < as_utc(end))
+    if since:
+        query = query.filter(models.Metric.timestamp > as_utc(since))
+    return query
+
+# Declared before /metrics/{system_id} so "export" is not parsed as a system id
+@router.get("/metrics/export")
+def export_fleet_metrics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since: Optional[datetime] = None,
+    format: str = "parquet"
+):
+    """Export of every system's samples in a time range: parquet (default), arrow or csv."""
+    start, end, since = (as_utc(t) if t else None for t in (start, end, since))
+    if format == "csv":
+        return StreamingResponse(
+            iter_metrics_csv(None, start, end, since),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=fleet_metrics.csv"}
+        )
+    return _columnar_response(format, None, start, end, since, "fleet_metrics")
+
+@router.get("/metrics/{system_id}", response_class=FastJSONResponse)
+def get_metrics_history(
+    system_id: int,
+    limit: int = 100,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Newest samples first. `start`/`end` bound a time range, `since` returns only
+    samples newer than the given timestamp (incremental polling).
+    """
+    # Recent history is served from the in-memory ring buffer
+    if start is None and end is None and system_registry.exists(system_id, db):
+        recent = metric_history.recent(system_id, limit, db, since=as_utc(since) if since else None)
+        if recent is not None:
+            return FastJSONResponse(recent)
+
+    if segment_store.enabled:
+        return FastJSONResponse(segment_store.history(
+            system_id, limit, *(as_utc(t) if t else None for t in (start, end, since))
+        ))
+
+    # Ranges and older data fall back to the DB, via the (system_id, timestamp) index
+    query = db.query(*METRIC_COLUMNS).filter(models.Metric.system_id == system_id)
+    rows = _metric_range(query, start, end, since)\
         .order_by(models.Metric.timestamp.desc())\
         .limit(limit)\
         .all()
-    return metrics
+    return FastJSONResponse(metric_dicts(rows))
+
+@router.get("/metrics/{system_id}/series")
+def get_metrics_series(
+    system_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_points: int = 500,
+    db: Session = Depends(get_db)
+):
+    """
+    CPU / memory / disk series for a time range, oldest first.
+    Uses the finest of raw, 1m, 5m or 1h data that covers the range within max_points.
+    """
+    end = as_utc(end) if end else datetime.now(timezone.utc)
+    start = as_utc(start) if start else end - timedelta(hours=1)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if not (1 <= max_points <= 10000):
+        raise HTTPException(status_code=400, detail="max_points must be 1-10000")
+
+    resolution = choose_resolution(start, end, max_points)
+    if resolution == 0 and segment_store.enabled:
+        records = segment_store.read(system_id, start, end, newest_first=False)
+        fields = ("timestamp", "cpu_usage", "memory_percent", "disk_usage")
+        points = [
+            dict(zip(fields, values))
+            for values in zip(*(segment_store.column(records, name) for name in fields))
+        ]
+    elif resolution == 0:
+        rows = db.query(
+            models.Metric.timestamp, models.Metric.cpu_usage,
+            models.Metric.memory_percent, models.Metric.disk_usage
+        ).filter(
+            models.Metric.system_id == system_id,
+            models.Metric.timestamp >= start,
+            models.Metric.timestamp < end
+        ).order_by(models.Metric.timestamp).all()
+        points = [
+            {"timestamp": r.timestamp, "cpu_usage": r.cpu_usage,
+             "memory_percent": r.memory_percent, "disk_usage": r.disk_usage}
+            for r in rows
+        ]
+    else:
+        points = rollup_points(db, system_id, resolution, start, end)
+
+    return {
+        "system_id": system_id,
+        "resolution": RESOLUTION_LABELS[resolution],
+        "resolution_seconds": resolution,
+        "start": start,
+        "end": end,
+        "points": points,
+    }
+
+def _columnar_response(export_format: str, system_id: Optional[int], start, end, since, filename: str):
+    if export_format not in COLUMNAR_WRITERS:
+        raise HTTPException(status_code=400, detail="format must be csv, parquet or arrow")
+    if not columnar_available():
+        raise HTTPException(status_code=501, detail="Columnar export requires the 'pyarrow' package")
+
+    extension = "parquet" if export_format == "parquet" else "arrows"
+    return StreamingResponse(
+        COLUMNAR_WRITERS[export_format](system_id, start, end, since),
+        media_type=COLUMNAR_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f"attachment; filename={filename}.{extension}"}
+    )
 
 @router.get("/metrics/{system_id}/export")
-def export_metrics(system_id: int, db: Session = Depends(get_db)):
-    metrics = db.query(models.Metric)\
-        .filter(models.Metric.system_id == system_id)\
-        .order_by(models.Metric.timestamp.desc())\
-        .limit(10000)\
-        .all()
-        
-    if not metrics:
+def export_metrics(
+    system_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since: Optional[datetime] = None,
+    format: str = "csv",
+    db: Session = Depends(get_db)
+):
+    """
+    Stream every matching sample, newest first, paging through the table server-side.
+    format: csv (default), parquet or arrow (Arrow IPC stream).
+    """
+    start, end, since = (as_utc(t) if t else None for t in (start, end, since))
+
+    if segment_store.enabled:
+        exists = segment_store.history(system_id, 1, start, end, since)
+    else:
+        exists = _metric_range(db.query(models.Metric.id), start, end, since)\
+            .filter(models.Metric.system_id == system_id)\
+            .first()
+    if not exists:
         raise HTTPException(status_code=404, detail="No metrics found for this system")
 
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow([
-        "Timestamp", "CPU (%)", "Memory (%)", "Memory Used (MB)", 
-        "Disk (%)", "Net Sent (Bytes)", "Net Recv (Bytes)", 
-        "Process Count", "Boot Time"
-    ])
-    
-    # Rows
-    for m in metrics:
-        writer.writerow([
-            m.timestamp, m.cpu_usage, m.memory_percent, m.memory_used,
-            m.disk_usage, m.network_sent, m.network_recv,
-            m.process_count, m.boot_time
-        ])
-        
-    output.seek(0)
-    
+    if format != "csv":
+        return _columnar_response(format, system_id, start, end, since, f"system_{system_id}_metrics")
+
     return StreamingResponse(
-        iter([output.getvalue()]),
+        iter_metrics_csv(system_id, start, end, since),
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename=system_{system_id}_metrics.csv"}
     )
 
+@router.get("/ingest/stats")
+def get_ingest_stats():
+    """Write-behind queue depth, flush latency and dropped/failed row counts."""
+    return metric_writer.stats()
+
 # --- Alert Endpoints ---
 
-@router.get("/alerts", response_model=List[schemas.Alert])
+@router.get("/alerts", response_model=List[schemas.Alert], response_class=FastJSONResponse)
 def get_alerts(skip: int = 0, limit: int = 100, is_resolved: bool = False, db: Session = Depends(get_db)):
-    alerts = db.query(models.Alert).filter(models.Alert.is_resolved == is_resolved).offset(skip).limit(limit).all()
-    return alerts
+    rows = db.query(*ALERT_COLUMNS).filter(models.Alert.is_resolved == is_resolved).offset(skip).limit(limit).all()
+    return FastJSONResponse(rows_as_dicts(rows, ALERT_COLUMNS))
 
 @router.put("/alerts/{alert_id}/resolve", response_model=schemas.Alert)
 def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
@@ -188,9 +518,14 @@ def resolve_alert(alert_id: int, db: Session = Depends(get_db)):
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
     
+    was_open = not alert.is_resolved
     alert.is_resolved = True
     db.commit()
     db.refresh(alert)
+    alert_cache.alert_resolved(alert.system_id, alert.alert_type)
+    if was_open:
+        fleet_state.alert_resolved(alert.system_id, alert.severity)
+    publish_alert("resolved", alert)
     return alert
 
 # --- Alert Settings Endpoints ---
@@ -250,6 +585,7 @@ def update_alert_settings(settings: schemas.AlertSettingsCreate, db: Session = D
     
     db.commit()
     db.refresh(db_settings)
+    alert_cache.invalidate_settings(target_system_id)
     return db_settings
 
 # --- User Endpoint ---
@@ -262,8 +598,7 @@ def get_current_user_info(current_user: models.User = Depends(get_current_user))
 @router.post("/tickets", response_model=schemas.Ticket, dependencies=[Depends(get_api_key)])
 def create_ticket(ticket: schemas.TicketCreate, db: Session = Depends(get_db)):
     # Verify system exists
-    system = db.query(models.System).filter(models.System.id == ticket.system_id).first()
-    if not system:
+    if not system_registry.exists(ticket.system_id, db):
         raise HTTPException(status_code=404, detail="System not found")
 
     new_ticket = models.Ticket(
@@ -274,17 +609,26 @@ def create_ticket(ticket: schemas.TicketCreate, db: Session = Depends(get_db)):
     db.add(new_ticket)
     db.commit()
     db.refresh(new_ticket)
+    _publish_ticket("created", new_ticket)
     return new_ticket
 
-@router.get("/tickets", response_model=List[schemas.Ticket])
+def _publish_ticket(action: str, ticket: models.Ticket):
+    if not event_broker.has_subscribers(ticket.system_id):
+        return
+    data = schemas.Ticket.model_validate(ticket).model_dump()
+    data["action"] = action
+    event_broker.publish("ticket", data, system_id=ticket.system_id)
+
+@router.get("/tickets", response_model=List[schemas.Ticket], response_class=FastJSONResponse)
 def get_tickets(skip: int = 0, limit: int = 100, status: Optional[str] = None, system_id: Optional[int] = None, db: Session = Depends(get_db)):
-    query = db.query(models.Ticket)
+    query = db.query(*TICKET_COLUMNS)
     if status:
         query = query.filter(models.Ticket.status == status)
     if system_id:
         query = query.filter(models.Ticket.system_id == system_id)
     
-    return query.order_by(models.Ticket.created_at.desc()).offset(skip).limit(limit).all()
+    rows = query.order_by(models.Ticket.created_at.desc()).offset(skip).limit(limit).all()
+    return FastJSONResponse(rows_as_dicts(rows, TICKET_COLUMNS))
 
 @router.put("/tickets/{ticket_id}/status", response_model=schemas.Ticket)
 def update_ticket_status(ticket_id: int, update: schemas.TicketUpdate, db: Session = Depends(get_db)):
@@ -301,4 +645,34 @@ def update_ticket_status(ticket_id: int, update: schemas.TicketUpdate, db: Sessi
         
     db.commit()
     db.refresh(ticket)
+    _publish_ticket("updated", ticket)
     return ticket
+
+# --- Live Updates ---
+
+STREAM_KEEPALIVE_SECONDS = 15
+
+@router.get("/stream")
+async def stream_events(request: Request, system_id: Optional[int] = None):
+    """
+    Server-Sent Events stream. Without system_id: fleet-wide compact metric deltas plus
+    system/alert/ticket changes. With system_id: full samples and changes for that system.
+    """
+    subscription = event_broker.subscribe(system_topic(system_id) if system_id else FLEET_TOPIC)
+
+    async def event_source():
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
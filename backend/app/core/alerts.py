@@ -1,6 +1,127 @@
+import time
+import threading
+from typing import NamedTuple, Optional, Dict, Set, List
 from sqlalchemy.orm import Session
 from app.models import models
 from app.schemas import schemas
+from app.core.pubsub import event_broker
+from app.core.fleet import fleet_state
+from app.core.anomaly import anomaly_detector
+from app.core.workers import MULTI_WORKER
+
+SETTINGS_TTL = 30  # Multi-worker mode: seconds before settings changed through another worker are picked up
+
+_MISSING = object()  # Cache miss, as opposed to a cached None ("no system-specific settings")
+
+class ThresholdSettings(NamedTuple):
+    """Detached copy of an AlertSettings row, safe to share between threads."""
+    cpu_threshold: float
+    memory_threshold: float
+    disk_threshold: float
+
+    @classmethod
+    def from_row(cls, row: models.AlertSettings) -> "ThresholdSettings":
+        return cls(row.cpu_threshold, row.memory_threshold, row.disk_threshold)
+
+class AlertStateCache:
+    """
+    In-memory alert settings and open alert types per system.
+    Settings stay cached until update_alert_settings invalidates them; open alert
+    types are loaded once per system and kept in sync by check_thresholds and resolve_alert.
+    Database reads happen outside the lock, so each kind of entry has a generation
+    counter: a load only stores its result if nothing was invalidated or resolved meanwhile.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.settings: Dict[Optional[int], Optional[ThresholdSettings]] = {}  # None key = global
+        self.open_types: Dict[int, Set[str]] = {}
+        self.settings_loaded_at = time.monotonic()
+        self.settings_generation = 0
+        self.open_generation = 0
+
+    def get_settings(self, system_id: int, db: Session) -> ThresholdSettings:
+        """System-specific settings, falling back to global. Cached entries never touch the database."""
+        if MULTI_WORKER and time.monotonic() - self.settings_loaded_at > SETTINGS_TTL:
+            # Other workers can't invalidate this cache, so it expires instead
+            with self.lock:
+                self.settings.clear()
+                self.settings_loaded_at = time.monotonic()
+                self.settings_generation += 1
+
+        generation = self.settings_generation
+        specific = self.settings.get(system_id, _MISSING)
+        if specific is _MISSING:
+            row = db.query(models.AlertSettings).filter(models.AlertSettings.system_id == system_id).first()
+            # Remember "no specific settings" too, so the fallback is a dict lookup
+            specific = ThresholdSettings.from_row(row) if row else None
+            self._store_settings(system_id, specific, generation)
+        if specific is not None:
+            return specific
+
+        fallback = self.settings.get(None, _MISSING)
+        if fallback is _MISSING:
+            fallback = ThresholdSettings.from_row(get_or_create_global_settings(db))
+            self._store_settings(None, fallback, generation)
+        return fallback
+
+    def _store_settings(self, system_id: Optional[int], settings: Optional[ThresholdSettings], generation: int):
+        with self.lock:
+            # An invalidation since the read means `settings` may be stale; the next call reloads
+            if self.settings_generation == generation:
+                self.settings[system_id] = settings
+
+    def invalidate_settings(self, system_id: Optional[int] = None):
+        """Drop cached settings for one system, or the global settings when system_id is None."""
+        with self.lock:
+            self.settings.pop(system_id, None)
+            self.settings_generation += 1
+
+    def claim_open(self, system_id: int, alert_types: List[str], db: Session) -> List[str]:
+        """
+        Atomically mark alert types as open, returning only those that were not open already.
+        In multi-worker mode alerts are opened and resolved through other workers too,
+        so the open types are re-read on every (rare) threshold breach.
+        """
+        while True:
+            loaded = None
+            if MULTI_WORKER or system_id not in self.open_types:
+                generation = self.open_generation
+                rows = db.query(models.Alert.alert_type).filter(
+                    models.Alert.system_id == system_id,
+                    models.Alert.is_resolved == False
+                ).all()
+                loaded = {row.alert_type for row in rows}
+
+            with self.lock:
+                if loaded is not None:
+                    if self.open_generation != generation:
+                        continue  # Resolved or forgotten meanwhile: the rows may list a closed alert
+                    if MULTI_WORKER:
+                        self.open_types[system_id] = loaded
+                    else:
+                        self.open_types.setdefault(system_id, loaded)
+                open_types = self.open_types.get(system_id)
+                if open_types is None:
+                    continue  # Forgotten since the check above
+                claimed = [t for t in alert_types if t not in open_types]
+                open_types.update(claimed)
+                return claimed
+
+    def alert_resolved(self, system_id: int, alert_type: str):
+        with self.lock:
+            self.open_generation += 1
+            if system_id in self.open_types:
+                self.open_types[system_id].discard(alert_type)
+
+    def forget_system(self, system_id: int):
+        with self.lock:
+            self.settings.pop(system_id, None)
+            self.open_types.pop(system_id, None)
+            self.settings_generation += 1
+            self.open_generation += 1
+
+# Global cache instance shared by the alert path and the alert endpoints
+alert_cache = AlertStateCache()
 
 def get_or_create_global_settings(db: Session) -> models.AlertSettings:
     """Helper to get GLOBAL settings (system_id=None), creating defaults if missing."""
@@ -28,9 +149,13 @@ def get_effective_settings(system_id: int, db: Session) -> models.AlertSettings:
     return get_or_create_global_settings(db)
 
 def check_thresholds(metric: schemas.MetricCreate, db: Session):
-    """Evaluates metrics against thresholds and creates alerts if necessary."""
+    """
+    Evaluates metrics against thresholds and the system's own baselines, creating alerts if necessary.
+    Settings and open alert types come from alert_cache and baselines from anomaly_detector,
+    so a healthy sample never touches the database.
+    """
     
-    settings = get_effective_settings(metric.system_id, db)
+    settings = alert_cache.get_settings(metric.system_id, db)
     alerts_to_create = []
 
     # Check CPU
@@ -58,20 +183,32 @@ def check_thresholds(metric: schemas.MetricCreate, db: Session):
             "severity": "Critical"
         })
 
+    # Unusual for this system even if under the threshold; a breached threshold already says more
+    breached = {a["type"] for a in alerts_to_create}
+    anomalies = anomaly_detector.observe(metric.system_id, {
+        "CPU": metric.cpu_usage, "Memory": memory_percent, "Disk": metric.disk_usage
+    })
+    for anomaly in anomalies:
+        if anomaly.gauge in breached:
+            continue
+        alerts_to_create.append({
+            "type": f"{anomaly.gauge} Anomaly",
+            "message": f"Unusual {anomaly.gauge} usage detected: {anomaly.value:.2f}% "
+                       f"(Baseline: {anomaly.mean:.2f}%, z-score {anomaly.z:.1f})",
+            "severity": "Warning"
+        })
+
     if not alerts_to_create:
         return
 
-    # Check for existing unresolved alerts to avoid spam
-    # Optimization: Fetch all active alerts for system in one go
-    active_alerts = db.query(models.Alert).filter(
-        models.Alert.system_id == metric.system_id,
-        models.Alert.is_resolved == False
-    ).all()
-    
-    active_types = {a.alert_type for a in active_alerts}
+    # Skip types that already have an unresolved alert to avoid spam
+    claimed = alert_cache.claim_open(metric.system_id, [a["type"] for a in alerts_to_create], db)
+    if not claimed:
+        return
 
+    new_alerts = []
     for alert_data in alerts_to_create:
-        if alert_data["type"] not in active_types:
+        if alert_data["type"] in claimed:
             new_alert = models.Alert(
                 system_id=metric.system_id,
                 alert_type=alert_data["type"],
@@ -79,5 +216,24 @@ def check_thresholds(metric: schemas.MetricCreate, db: Session):
                 message=alert_data["message"]
             )
             db.add(new_alert)
+            new_alerts.append(new_alert)
     
-    db.commit()
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        for alert_type in claimed:
+            alert_cache.alert_resolved(metric.system_id, alert_type)
+        raise
+
+    for new_alert in new_alerts:
+        fleet_state.alert_opened(new_alert.system_id, new_alert.severity)
+        publish_alert("created", new_alert)
+
+def publish_alert(action: str, alert: models.Alert):
+    """Push an alert change to dashboards listening on /stream."""
+    if not event_broker.has_subscribers(alert.system_id):
+        return
+    data = schemas.Alert.model_validate(alert).model_dump()
+    data["action"] = action
+    event_broker.publish("alert", data, system_id=alert.system_id)
@@ -0,0 +1,178 @@
+"""
+Streaming anomaly detection for the alert path.
+Each system keeps an exponentially weighted mean and variance per gauge
+(CPU, memory, disk), updated in O(1) per sample under one lock. A sample that
+sits ANOMALY_Z standard deviations above its own system's baseline for
+ANOMALY_STREAK samples in a row is an anomaly, whatever the static threshold.
+Baselines live in memory; a background thread checkpoints changed ones to
+anomaly_baselines so a restart doesn't have to learn them again.
+
+With several workers, each one learns only from the samples it receives, so
+a streak needs that many samples at one worker, and each worker's checkpoint
+replaces the rows the others wrote for the same system.
+"""
+import os
+import math
+import threading
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Set
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models import models
+
+logger = logging.getLogger(__name__)
+
+ALPHA = float(os.getenv("ANOMALY_ALPHA", "0.01"))          # EWMA weight of a new sample (~100-sample memory)
+Z_THRESHOLD = float(os.getenv("ANOMALY_Z", "4"))           # Deviations above the mean that count as anomalous
+MIN_STD = float(os.getenv("ANOMALY_MIN_STD", "5"))         # Percentage points; keeps flat series from flagging noise
+WARMUP_SAMPLES = int(os.getenv("ANOMALY_WARMUP", "30"))    # Samples before a baseline is trusted
+STREAK = int(os.getenv("ANOMALY_STREAK", "3"))             # Consecutive anomalous samples before alerting
+CHECKPOINT_INTERVAL = int(os.getenv("ANOMALY_CHECKPOINT_INTERVAL", "60"))  # Seconds between baseline writes
+
+class Anomaly(NamedTuple):
+    gauge: str
+    value: float
+    mean: float
+    z: float
+
+class _Baseline:
+    """EWMA mean / variance of one gauge of one system."""
+    __slots__ = ("mean", "variance", "count", "streak")
+
+    def __init__(self, mean: float = 0.0, variance: float = 0.0, count: int = 0):
+        self.mean = mean
+        self.variance = variance
+        self.count = count
+        self.streak = 0
+
+    def update(self, value: float) -> Optional[float]:
+        """Fold in a sample; returns its z-score once the streak is long enough, else None."""
+        z = None
+        if self.count >= WARMUP_SAMPLES:
+            z = (value - self.mean) / max(math.sqrt(self.variance), MIN_STD)
+            self.streak = self.streak + 1 if z > Z_THRESHOLD else 0
+
+        self.count += 1
+        # Plain running average until ALPHA takes over, so the first samples don't anchor at zero
+        alpha = max(ALPHA, 1.0 / self.count)
+        diff = value - self.mean
+        increment = alpha * diff
+        self.mean += increment
+        self.variance = (1 - alpha) * (self.variance + diff * increment)
+        return z if self.streak >= STREAK else None
+
+class AnomalyDetector:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.baselines: Dict[int, Dict[str, _Baseline]] = {}
+        self.dirty: Set[int] = set()
+
+    def observe(self, system_id: int, values: Dict[str, Optional[float]]) -> List[Anomaly]:
+        """Update the system's baselines with one sample (gauge -> percent); returns the anomalous gauges."""
+        anomalies = []
+        with self.lock:
+            baselines = self.baselines.get(system_id)
+            if baselines is None:
+                baselines = self.baselines[system_id] = {}
+            for gauge, value in values.items():
+                if value is None:
+                    continue
+                baseline = baselines.get(gauge)
+                if baseline is None:
+                    baseline = baselines[gauge] = _Baseline()
+                mean = baseline.mean
+                z = baseline.update(value)
+                if z is not None:
+                    anomalies.append(Anomaly(gauge, value, mean, z))
+            self.dirty.add(system_id)
+        return anomalies
+
+    def load(self, db: Session):
+        """Restore checkpointed baselines. Systems already observed keep their in-memory state."""
+        # A checkpoint racing delete_system can leave rows behind; they are dropped, not restored
+        known = db.query(models.System.id)
+        db.query(models.AnomalyBaseline).filter(
+            ~models.AnomalyBaseline.system_id.in_(known)
+        ).delete(synchronize_session=False)
+        db.commit()
+        rows = db.query(models.AnomalyBaseline).all()
+        with self.lock:
+            for row in rows:
+                baselines = self.baselines.setdefault(row.system_id, {})
+                baselines.setdefault(row.metric, _Baseline(row.mean, row.variance, row.sample_count))
+        logger.debug(f"Loaded {len(rows)} anomaly baselines.")
+
+    def checkpoint(self, db: Session) -> int:
+        """Write the baselines of systems observed since the last checkpoint. Returns systems written."""
+        with self.lock:
+            pending, self.dirty = self.dirty, set()
+            rows = [
+                {"system_id": system_id, "metric": gauge, "mean": b.mean,
+                 "variance": b.variance, "sample_count": b.count}
+                for system_id in pending if system_id in self.baselines
+                for gauge, b in self.baselines[system_id].items()
+            ]
+        if not pending:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            # Systems deleted since the copy above; load() drops any that still slip through
+            rows = [row for row in rows if row["system_id"] in self.baselines]
+        try:
+            # Replace rather than upsert, so the same statements work on SQLite and PostgreSQL
+            db.query(models.AnomalyBaseline).filter(
+                models.AnomalyBaseline.system_id.in_(pending)
+            ).delete(synchronize_session=False)
+            if rows:
+                db.execute(insert(models.AnomalyBaseline), [dict(row, updated_at=now) for row in rows])
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self.lock:
+                self.dirty.update(s for s in pending if s in self.baselines)
+            raise
+        return len(pending)
+
+    def forget_system(self, system_id: int):
+        with self.lock:
+            self.baselines.pop(system_id, None)
+            self.dirty.discard(system_id)
+
+class BaselineCheckpointer(threading.Thread):
+    def __init__(self, detector: AnomalyDetector, interval: int = CHECKPOINT_INTERVAL):
+        super().__init__()
+        self.detector = detector
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.daemon = True
+
+    def run(self):
+        logger.info("Starting Anomaly Baseline Checkpointer...")
+
+        while not self.stop_event.wait(self.interval):
+            self.checkpoint()
+
+        # Final write so a clean shutdown loses nothing
+        self.checkpoint()
+
+    def checkpoint(self):
+        db: Session = SessionLocal()
+        try:
+            self.detector.checkpoint(db)
+        except Exception as e:
+            logger.error(f"Anomaly baseline checkpoint failed: {e}")
+        finally:
+            db.close()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=10)
+        else:
+            self.checkpoint()
+
+# Global detector instance shared by the alert path
+anomaly_detector = AnomalyDetector()
@@ -1,3 +1,4 @@
+import os
 import time
 import threading
 import logging
@@ -5,11 +6,14 @@ from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
 from app.db.database import SessionLocal
 from app.models import models
+from app.core.rollup import delete_expired_rollups
+from app.core.processes import delete_expired_process_samples
+from app.core.segments import segment_store
 
 logger = logging.getLogger(__name__)
 
 CLEANUP_INTERVAL = 3600  # Run every hour
-RETENTION_HOURS = 24     # Keep data for 24 hours
+RETENTION_HOURS = int(os.getenv("METRICS_RETENTION_HOURS", "24"))  # Keep raw samples this long
 
 class MetricCleaner(threading.Thread):
     def __init__(self):
@@ -34,12 +38,24 @@ class MetricCleaner(threading.Thread):
         try:
             cutoff_time = datetime.now(timezone.utc) - timedelta(hours=RETENTION_HOURS)
             
-            # Delete old metrics
-            deleted_count = db.query(models.Metric).filter(models.Metric.timestamp < cutoff_time).delete()
+            # Delete old metrics; segment files go whole, once their last hour has expired
+            if segment_store.enabled:
+                deleted_count = segment_store.delete_before(cutoff_time)
+            else:
+                deleted_count = db.query(models.Metric).filter(models.Metric.timestamp < cutoff_time).delete()
+            # Snapshots are re-written hourly, so every active system keeps a current one
+            deleted_processes = delete_expired_process_samples(db, cutoff_time)
+
+            # Rollups outlive raw samples, each resolution with its own retention
+            deleted_rollups = delete_expired_rollups(db)
             db.commit()
             
             if deleted_count > 0:
                 logger.info(f"Cleaned up {deleted_count} old metric records.")
+            if deleted_processes > 0:
+                logger.info(f"Cleaned up {deleted_processes} old process samples.")
+            if deleted_rollups > 0:
+                logger.info(f"Cleaned up {deleted_rollups} expired metric rollups.")
                 
         except Exception as e:
             logger.error(f"Cleanup failed: {e}")
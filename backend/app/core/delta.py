@@ -0,0 +1,54 @@
+"""
+Per-system state for delta-encoded uploads (POST /metrics/delta).
+Keeps the last reconstructed sample and frame number for every system so
+an agent only has to send the fields that changed since its previous frame.
+A missing or out-of-order frame (server restart, lost request) is answered
+with 409 and the agent resends a keyframe.
+"""
+import threading
+from datetime import datetime, timezone
+from typing import Dict
+from fastapi import HTTPException, status
+from app.schemas import schemas
+
+KEYFRAME_REQUIRED = "Keyframe required"
+
+class DeltaState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples: Dict[int, dict] = {}
+        self.seqs: Dict[int, int] = {}
+
+    def apply(self, frame: schemas.MetricDelta) -> schemas.MetricCreate:
+        """Reconstruct the full sample a frame stands for and remember it as the new base."""
+        changed = frame.fields.model_dump(exclude_unset=True)
+        if "timestamp" not in changed:
+            changed["timestamp"] = datetime.now(timezone.utc)
+
+        with self.lock:
+            if frame.keyframe:
+                # Required fields were checked by MetricDelta; unsent optional fields take their defaults
+                sample = dict(schemas.MetricCreate.model_construct(system_id=frame.system_id, **changed))
+            else:
+                base = self.samples.get(frame.system_id)
+                if base is None or frame.seq != self.seqs[frame.system_id] + 1:
+                    raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=KEYFRAME_REQUIRED)
+                sample = dict(base)
+                sample.update(changed)
+                for name, increase in frame.counters.items():
+                    if sample[name] is None:
+                        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=KEYFRAME_REQUIRED)
+                    sample[name] += increase
+
+            self.samples[frame.system_id] = sample
+            self.seqs[frame.system_id] = frame.seq
+
+        # Every field was validated on arrival, in this frame or an earlier one
+        return schemas.MetricCreate.model_construct(**sample)
+
+    def forget(self, system_id: int):
+        with self.lock:
+            self.samples.pop(system_id, None)
+            self.seqs.pop(system_id, None)
+
+delta_state = DeltaState()
@@ -0,0 +1,52 @@
+"""
+Content-addressed storage for driver inventories.
+Systems reference their driver list by the SHA-256 of its canonical JSON,
+so identical lab images share one stored copy, re-registering with an
+unchanged list writes nothing, and the list never rides along in the
+systems payload.
+"""
+import json
+import hashlib
+from typing import Any, List, Optional, Tuple
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import models
+
+def _canonical(driver: Any) -> str:
+    return json.dumps(driver, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+def canonical_inventory(drivers: List[Any]) -> Tuple[str, List[Any]]:
+    """
+    (hash, drivers in canonical order). Order-independent: the same drivers
+    enumerated in a different order hash the same.
+    """
+    keyed = sorted(((_canonical(driver), driver) for driver in drivers), key=lambda pair: pair[0])
+    document = "[" + ",".join(key for key, _ in keyed) + "]"
+    return hashlib.sha256(document.encode("utf-8")).hexdigest(), [driver for _, driver in keyed]
+
+def store_inventory(db: Session, drivers: List[Any]) -> str:
+    """
+    Return the inventory's hash, storing the list only if no system has sent it before.
+    The row is flushed in the caller's transaction, so it commits or rolls back with the
+    system that references it. Call it before any other change: a conflict rolls the transaction back.
+    """
+    digest, ordered = canonical_inventory(drivers)
+    if db.get(models.DriverInventory, digest) is None:
+        try:
+            db.add(models.DriverInventory(hash=digest, driver_count=len(ordered), drivers=ordered))
+            db.flush()
+        except IntegrityError:
+            # Stored meanwhile by another machine registering with the same image
+            db.rollback()
+            if db.get(models.DriverInventory, digest) is None:
+                raise
+    return digest
+
+def release_inventory(db: Session, digest: Optional[str]):
+    """Delete an inventory once no system references it (after the reference was changed or deleted)."""
+    if digest is None:
+        return
+    db.flush()
+    still_used = db.query(models.System.id).filter(models.System.drivers_hash == digest).first()
+    if still_used is None:
+        db.query(models.DriverInventory).filter(models.DriverInventory.hash == digest).delete()
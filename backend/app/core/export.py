@@ -0,0 +1,194 @@
+"""
+Metric export helpers.
+Rows are paged out of the database with keyset pagination on (timestamp, id),
+so an export holds one page in memory no matter how many rows it covers.
+"""
+import csv
+import io
+import tempfile
+from datetime import datetime
+from typing import Iterator, List, Optional
+from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models import models
+from app.core.history import as_utc
+from app.core.segments import segment_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional: only needed for columnar exports
+    pa = None
+    pq = None
+
+EXPORT_PAGE_SIZE = 5000
+STREAM_CHUNK_BYTES = 1024 * 1024
+
+CSV_HEADER = [
+    "Timestamp", "CPU (%)", "Memory (%)", "Memory Used (MB)",
+    "Disk (%)", "Net Sent (Bytes)", "Net Recv (Bytes)",
+    "Process Count", "Boot Time"
+]
+
+CSV_COLUMNS = [
+    models.Metric.timestamp, models.Metric.cpu_usage, models.Metric.memory_percent,
+    models.Metric.memory_used, models.Metric.disk_usage, models.Metric.network_sent,
+    models.Metric.network_recv, models.Metric.process_count, models.Metric.boot_time
+]
+
+def iter_metric_pages(
+    system_id: Optional[int],
+    columns: list,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    since: Optional[datetime] = None,
+    page_size: int = EXPORT_PAGE_SIZE,
+    db: Optional[Session] = None
+) -> Iterator[List[tuple]]:
+    """
+    Yield pages of column tuples, newest first. system_id=None exports the whole fleet.
+    Opens its own session unless one is given, since streaming outlives the request's session.
+    """
+    if segment_store.enabled:
+        yield from segment_store.pages(system_id, [column.key for column in columns], start, end, since, page_size)
+        return
+
+    owns_session = db is None
+    db = db or SessionLocal()
+    try:
+        # SQLite hands back naive datetimes; made UTC-aware like the segment engine's
+        stamps = {i for i, column in enumerate(columns) if column.key == "timestamp"}
+        # Keyset columns ride along at the end of every row
+        query = db.query(*columns, models.Metric.timestamp, models.Metric.id)
+        if system_id is not None:
+            query = query.filter(models.Metric.system_id == system_id)
+        if start:
+            query = query.filter(models.Metric.timestamp >= start)
+        if end:
+            query = query.filter(models.Metric.timestamp < end)
+        if since:
+            query = query.filter(models.Metric.timestamp > since)
+        query = query.order_by(models.Metric.timestamp.desc(), models.Metric.id.desc())
+
+        last = None
+        while True:
+            page_query = query
+            if last is not None:
+                last_time, last_id = last
+                page_query = page_query.filter(or_(
+                    models.Metric.timestamp < last_time,
+                    and_(models.Metric.timestamp == last_time, models.Metric.id < last_id)
+                ))
+            page = page_query.limit(page_size).all()
+            if not page:
+                return
+
+            last = tuple(page[-1])[-2:]
+            yield [
+                tuple(as_utc(value) if i in stamps else value for i, value in enumerate(tuple(row)[:-2]))
+                for row in page
+            ]
+            if len(page) < page_size:
+                return
+    finally:
+        if owns_session:
+            db.close()
+
+def iter_metrics_csv(system_id: Optional[int], start: Optional[datetime] = None, end: Optional[datetime] = None,
+                     since: Optional[datetime] = None) -> Iterator[str]:
+    """CSV text, one chunk per page. system_id=None exports the whole fleet, with a System ID column first."""
+    header, columns = CSV_HEADER, CSV_COLUMNS
+    if system_id is None:
+        header, columns = ["System ID"] + CSV_HEADER, [models.Metric.system_id] + CSV_COLUMNS
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(header)
+
+    for page in iter_metric_pages(system_id, columns, start, end, since):
+        writer.writerows(page)
+        yield output.getvalue()
+        output.seek(0)
+        output.truncate(0)
+
+    # Header only when there were no rows at all
+    if output.tell():
+        yield output.getvalue()
+
+# --- Columnar (Parquet / Arrow IPC) export ---
+
+COLUMNAR_COLUMNS = [
+    models.Metric.system_id, models.Metric.timestamp, models.Metric.cpu_usage,
+    models.Metric.memory_percent, models.Metric.memory_used, models.Metric.disk_usage,
+    models.Metric.disk_read_bytes, models.Metric.disk_write_bytes, models.Metric.network_sent,
+    models.Metric.network_recv, models.Metric.process_count, models.Metric.uptime_seconds
+]
+
+COLUMNAR_MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+def columnar_available() -> bool:
+    return pa is not None
+
+def _arrow_schema():
+    return pa.schema([
+        ("system_id", pa.int32()),
+        ("timestamp", pa.timestamp("us", tz="UTC")),
+        ("cpu_usage", pa.float64()),
+        ("memory_percent", pa.float64()),
+        ("memory_used", pa.int64()),
+        ("disk_usage", pa.float64()),
+        ("disk_read_bytes", pa.int64()),
+        ("disk_write_bytes", pa.int64()),
+        ("network_sent", pa.int64()),
+        ("network_recv", pa.float64()),
+        ("process_count", pa.int32()),
+        ("uptime_seconds", pa.int64()),
+    ])
+
+def _record_batch(page: List[tuple], schema):
+    """One typed column per field, built from the whole page at once."""
+    columns = list(zip(*page))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+def iter_metrics_arrow(system_id: Optional[int], start: Optional[datetime] = None,
+                       end: Optional[datetime] = None, since: Optional[datetime] = None) -> Iterator[bytes]:
+    """Arrow IPC stream: written and sent one record batch per page."""
+    schema = _arrow_schema()
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for page in iter_metric_pages(system_id, COLUMNAR_COLUMNS, start, end, since):
+            writer.write_batch(_record_batch(page, schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate(0)
+    yield sink.getvalue()
+
+def iter_metrics_parquet(system_id: Optional[int], start: Optional[datetime] = None,
+                         end: Optional[datetime] = None, since: Optional[datetime] = None) -> Iterator[bytes]:
+    """
+    Parquet file, one row group per page. The footer is only known at the end,
+    so the file is spooled (to disk once it gets large) and then streamed.
+    """
+    schema = _arrow_schema()
+    with tempfile.SpooledTemporaryFile(max_size=64 * 1024 * 1024) as spool:
+        with pq.ParquetWriter(spool, schema, compression="zstd") as writer:
+            for page in iter_metric_pages(system_id, COLUMNAR_COLUMNS, start, end, since):
+                writer.write_batch(_record_batch(page, schema))
+
+        spool.seek(0)
+        while True:
+            chunk = spool.read(STREAM_CHUNK_BYTES)
+            if not chunk:
+                return
+            yield chunk
+
+COLUMNAR_WRITERS = {
+    "parquet": iter_metrics_parquet,
+    "arrow": iter_metrics_arrow,
+}
@@ -0,0 +1,41 @@
+"""
+Fast JSON responses for the large list endpoints.
+Rows are read as plain column tuples and encoded directly, skipping ORM
+object construction, response_model validation and jsonable_encoder.
+Uses orjson when installed, the stdlib encoder otherwise.
+"""
+import json
+from datetime import date, datetime
+from typing import Any, Iterable, List, Type
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # Optional: falls back to the stdlib encoder
+    orjson = None
+
+def _default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    if orjson:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def schema_columns(model, schema: Type[BaseModel]) -> list:
+    """The table columns behind a response schema, so a query returns exactly its fields."""
+    table = model.__table__
+    return [table.c[name] for name in schema.model_fields]
+
+def rows_as_dicts(rows: Iterable[tuple], columns: list) -> List[dict]:
+    names = [column.name for column in columns]
+    return [dict(zip(names, row)) for row in rows]
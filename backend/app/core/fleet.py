@@ -0,0 +1,182 @@
+"""
+In-memory fleet state for the overview page.
+One row per system kept as parallel columns (identity, latest sample, open
+alert counts), updated on register / ingest / alert changes, so the whole
+fleet is answered without touching the database.
+"""
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models import models
+from app.core.history import as_utc
+from app.core.segments import segment_store
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_COLUMNS = ("hostname", "user_label", "ip_address", "os_info")
+SAMPLE_COLUMNS = ("cpu_usage", "memory_percent", "disk_usage")
+SNAPSHOT_TTL = float(os.getenv("FLEET_SNAPSHOT_TTL", "2"))  # Multi-worker mode: seconds a database-built overview is reused
+
+class FleetState:
+    """
+    Column-per-field table with an id -> slot index. Rows are removed by
+    moving the last row into the freed slot, so the columns stay dense.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots: Dict[int, int] = {}
+        self.columns: Dict[str, list] = {
+            name: [] for name in ("id",) + IDENTITY_COLUMNS + SAMPLE_COLUMNS
+            + ("sample_time", "open_alerts", "critical_alerts")
+        }
+
+    def _slot(self, system_id: int) -> int:
+        slot = self.slots.get(system_id)
+        if slot is None:
+            slot = self.slots[system_id] = len(self.columns["id"])
+            for name, column in self.columns.items():
+                column.append(0 if name.endswith("_alerts") else None)
+            self.columns["id"][slot] = system_id
+        return slot
+
+    def load(self, db: Session, latest: Optional[Dict[int, dict]] = None):
+        """Fill identities and open alert counts from the database; `latest` supplies the newest samples."""
+        systems = db.query(models.System.id, *(getattr(models.System, c) for c in IDENTITY_COLUMNS)).all()
+        counts = db.query(models.Alert.system_id, models.Alert.severity, func.count())\
+            .filter(models.Alert.is_resolved == False)\
+            .group_by(models.Alert.system_id, models.Alert.severity).all()
+
+        with self.lock:
+            for row in systems:
+                slot = self._slot(row.id)
+                for name in IDENTITY_COLUMNS:
+                    self.columns[name][slot] = getattr(row, name)
+            for system_id, severity, count in counts:
+                slot = self.slots.get(system_id)
+                if slot is None:
+                    continue
+                self.columns["open_alerts"][slot] += count
+                if severity == "Critical":
+                    self.columns["critical_alerts"][slot] += count
+
+        for sample in (latest or {}).values():
+            self.record_metric(sample)
+        logger.debug(f"Loaded fleet state for {len(systems)} systems.")
+
+    def upsert_system(self, system: models.System):
+        with self.lock:
+            slot = self._slot(system.id)
+            for name in IDENTITY_COLUMNS:
+                self.columns[name][slot] = getattr(system, name)
+
+    def remove(self, system_id: int):
+        with self.lock:
+            slot = self.slots.pop(system_id, None)
+            if slot is None:
+                return
+            last = len(self.columns["id"]) - 1
+            for column in self.columns.values():
+                column[slot] = column[last]
+                column.pop()
+            if slot != last:
+                self.slots[self.columns["id"][slot]] = slot
+
+    def record_metric(self, sample: dict):
+        """Keep the newest sample per system; late (replayed) samples are ignored."""
+        with self.lock:
+            slot = self.slots.get(sample["system_id"])
+            if slot is None:
+                return
+            current = self.columns["sample_time"][slot]
+            if current is not None and sample["timestamp"] < current:
+                return
+            self.columns["sample_time"][slot] = sample["timestamp"]
+            for name in SAMPLE_COLUMNS:
+                self.columns[name][slot] = sample[name]
+
+    def alert_opened(self, system_id: int, severity: str):
+        self._count_alert(system_id, severity, 1)
+
+    def alert_resolved(self, system_id: int, severity: str):
+        self._count_alert(system_id, severity, -1)
+
+    def _count_alert(self, system_id: int, severity: str, delta: int):
+        with self.lock:
+            slot = self.slots.get(system_id)
+            if slot is None:
+                return
+            self.columns["open_alerts"][slot] = max(self.columns["open_alerts"][slot] + delta, 0)
+            if severity == "Critical":
+                self.columns["critical_alerts"][slot] = max(self.columns["critical_alerts"][slot] + delta, 0)
+
+    def snapshot(self, active: set, last_seen: Dict[int, Optional[datetime]]) -> List[dict]:
+        """
+        One dict per system, ordered by id. Online state and heartbeats are
+        owned by the system registry and joined in here.
+        """
+        with self.lock:
+            names = list(self.columns)
+            rows = [dict(zip(names, values)) for values in zip(*self.columns.values())]
+
+        for row in rows:
+            row["is_active"] = row["id"] in active
+            seen = last_seen.get(row["id"])
+            row["last_seen"] = as_utc(seen) if seen else None
+        rows.sort(key=lambda row: row["id"])
+        return rows
+
+def latest_samples(db: Session) -> Dict[int, dict]:
+    """Newest stored sample of every system, one index lookup per system."""
+    if segment_store.enabled:
+        newest = {system_id: segment_store.latest(system_id, 1) for system_id in segment_store.systems()}
+        return {
+            system_id: {name: samples[0][name] for name in ("system_id", "timestamp") + SAMPLE_COLUMNS}
+            for system_id, samples in newest.items() if samples
+        }
+
+    # Per system rather than one windowed query: each lookup reads the end of
+    # ix_metrics_system_id_timestamp, so the cost doesn't grow with stored samples
+    columns = (models.Metric.timestamp,) + tuple(getattr(models.Metric, name) for name in SAMPLE_COLUMNS)
+    latest = {}
+    for (system_id,) in db.query(models.System.id).all():
+        row = db.query(*columns).filter(models.Metric.system_id == system_id)\
+            .order_by(models.Metric.timestamp.desc()).first()
+        if row is not None:
+            latest[system_id] = {
+                "system_id": system_id, "timestamp": as_utc(row.timestamp),
+                **{name: getattr(row, name) for name in SAMPLE_COLUMNS}
+            }
+    return latest
+
+_snapshot_lock = threading.Lock()
+_snapshot: Optional[List[dict]] = None
+_snapshot_at = 0.0
+
+def load_fleet_snapshot(db: Session) -> List[dict]:
+    """
+    Multi-worker mode: each worker's fleet state would only reflect its own
+    ingest, so the overview is built from the database instead, at most once
+    per SNAPSHOT_TTL seconds per worker.
+    """
+    global _snapshot, _snapshot_at
+    with _snapshot_lock:
+        if _snapshot is not None and time.monotonic() - _snapshot_at < SNAPSHOT_TTL:
+            return _snapshot
+
+        state = FleetState()
+        state.load(db, latest_samples(db))
+        liveness = db.query(models.System.id, models.System.is_active, models.System.last_seen).all()
+        _snapshot = state.snapshot(
+            {row.id for row in liveness if row.is_active},
+            {row.id: row.last_seen for row in liveness}
+        )
+        _snapshot_at = time.monotonic()
+        return _snapshot
+
+# Global fleet state, filled at startup and kept current by the endpoints
+fleet_state = FleetState()
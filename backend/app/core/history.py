@@ -0,0 +1,211 @@
+"""
+Per-system ring buffers holding the most recent metric samples.
+Filled on ingest and warmed from the database at startup, so the dashboard's
+"latest N" history polls are answered from memory.
+"""
+import os
+import threading
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models import models
+from app.core.workers import MULTI_WORKER
+from app.core.packing import unpack_floats
+from app.core.segments import segment_store
+
+logger = logging.getLogger(__name__)
+
+HISTORY_BUFFER_SIZE = int(os.getenv("HISTORY_BUFFER_SIZE", "300"))  # Samples kept in memory per system
+
+METRIC_COLUMNS = [c.name for c in models.Metric.__table__.columns]
+
+def as_utc(value: datetime) -> datetime:
+    """SQLite hands back naive datetimes; everything stored is UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def metric_to_dict(metric: models.Metric) -> dict:
+    sample = {name: getattr(metric, name) for name in METRIC_COLUMNS}
+    sample["timestamp"] = as_utc(sample["timestamp"])
+    sample["cpu_per_core"] = unpack_floats(sample["cpu_per_core"])
+    return sample
+
+def row_to_sample(row: dict) -> dict:
+    """Shape an ingest row like a stored metric (id is assigned later by the database)."""
+    sample = {name: row.get(name) for name in METRIC_COLUMNS}
+    sample["timestamp"] = as_utc(sample["timestamp"])
+    sample["cpu_per_core"] = unpack_floats(sample["cpu_per_core"])
+    for name in ("disk_read_bytes", "disk_write_bytes"):
+        if sample[name] is None:
+            sample[name] = 0
+    return sample
+
+class MetricRingBuffer:
+    """Fixed-size, array-backed ring of samples for one system, oldest to newest."""
+    def __init__(self, size: int):
+        self.size = size
+        self.slots: List[Optional[dict]] = [None] * size
+        self.head = 0  # Next slot to write
+        self.count = 0
+        # True once the buffer is known to hold the system's newest min(size, total) samples
+        self.complete = False
+
+    def _index(self, i: int) -> int:
+        """Slot of the i-th oldest sample."""
+        return (self.head - self.count + i) % self.size
+
+    def newest_timestamp(self) -> Optional[datetime]:
+        return self.slots[self._index(self.count - 1)]["timestamp"] if self.count else None
+
+    def oldest_timestamp(self) -> Optional[datetime]:
+        return self.slots[self._index(0)]["timestamp"] if self.count else None
+
+    def items(self) -> List[dict]:
+        return [self.slots[self._index(i)] for i in range(self.count)]
+
+    def append(self, sample: dict):
+        newest = self.newest_timestamp()
+        if newest is not None and sample["timestamp"] < newest:
+            # Late sample (e.g. a batch replayed by the agent): keep the ring ordered
+            self._rebuild(self.items(), [sample])
+            return
+
+        self.slots[self.head] = sample
+        self.head = (self.head + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def prepend_older(self, samples: List[dict]):
+        """Add samples that are older than everything buffered, as long as there is room."""
+        self._rebuild(self.items(), samples)
+
+    def _rebuild(self, current: List[dict], extra: List[dict]):
+        # Both inputs are already ordered, so this sort is close to linear
+        merged = sorted(current + extra, key=lambda s: s["timestamp"])[-self.size:]
+
+        self.slots = merged + [None] * (self.size - len(merged))
+        self.count = len(merged)
+        self.head = self.count % self.size
+
+    def latest(self, n: int, since: Optional[datetime] = None) -> List[dict]:
+        """Up to n samples (newer than `since`), newest first like the SQL history query."""
+        n = min(n, self.count)
+        samples = []
+        for i in range(self.count):
+            if len(samples) >= n:
+                break
+            sample = self.slots[self._index(self.count - 1 - i)]
+            if since is not None and sample["timestamp"] <= since:
+                break
+            samples.append(sample)
+        return samples
+
+class MetricHistory:
+    def __init__(self, size: int = HISTORY_BUFFER_SIZE, enabled: bool = not MULTI_WORKER):
+        self.size = size
+        # Off in multi-worker mode: a worker's buffers would only hold its own share of the samples
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.buffers: Dict[int, MetricRingBuffer] = {}
+
+    def _buffer(self, system_id: int) -> MetricRingBuffer:
+        buffer = self.buffers.get(system_id)
+        if buffer is None:
+            buffer = self.buffers[system_id] = MetricRingBuffer(self.size)
+        return buffer
+
+    def add(self, row: dict) -> dict:
+        """Record a freshly ingested row and return it shaped as a stored sample."""
+        sample = row_to_sample(row)
+        if self.enabled:
+            with self.lock:
+                self._buffer(sample["system_id"]).append(sample)
+        return sample
+
+    def mark_new(self, system_id: int):
+        """A newly registered system has no stored history, so its (empty) buffer is complete."""
+        with self.lock:
+            self._buffer(system_id).complete = True
+
+    def forget(self, system_id: int):
+        with self.lock:
+            self.buffers.pop(system_id, None)
+
+    def newest(self) -> Dict[int, dict]:
+        """The newest buffered sample of every system that has one."""
+        with self.lock:
+            return {
+                system_id: buffer.latest(1)[0]
+                for system_id, buffer in self.buffers.items() if buffer.count
+            }
+
+    def warm(self, db: Session, system_ids: List[int]):
+        """Load the newest samples of every system (with a single windowed query on the SQL engine)."""
+        by_system: Dict[int, List[dict]] = {}
+        if segment_store.enabled:
+            for system_id in system_ids:
+                by_system[system_id] = segment_store.latest(system_id, self.size)
+        else:
+            rank = func.row_number().over(
+                partition_by=models.Metric.system_id,
+                order_by=models.Metric.timestamp.desc()
+            ).label("rank")
+            ranked = db.query(models.Metric.id, rank).subquery()
+            metrics = db.query(models.Metric)\
+                .join(ranked, ranked.c.id == models.Metric.id)\
+                .filter(ranked.c.rank <= self.size)\
+                .all()
+            for metric in metrics:
+                by_system.setdefault(metric.system_id, []).append(metric_to_dict(metric))
+
+        with self.lock:
+            for system_id in system_ids:
+                buffer = self._buffer(system_id)
+                buffer.prepend_older(by_system.get(system_id, []))
+                buffer.complete = True
+        samples = sum(len(buffered) for buffered in by_system.values())
+        logger.info(f"Warmed metric history for {len(system_ids)} systems ({samples} samples).")
+
+    def _backfill(self, system_id: int, db: Session):
+        """Complete a buffer that so far only holds samples ingested since startup."""
+        with self.lock:
+            buffer = self._buffer(system_id)
+            oldest = buffer.oldest_timestamp()
+            missing = self.size - buffer.count
+
+        if not missing:
+            older = []
+        elif segment_store.enabled:
+            older = segment_store.latest(system_id, missing, before=oldest)
+        else:
+            query = db.query(models.Metric).filter(models.Metric.system_id == system_id)
+            if oldest is not None:
+                query = query.filter(models.Metric.timestamp < oldest)
+            older = [metric_to_dict(m) for m in query.order_by(models.Metric.timestamp.desc()).limit(missing).all()]
+
+        with self.lock:
+            buffer.prepend_older(older)
+            buffer.complete = True
+
+    def recent(self, system_id: int, limit: int, db: Session,
+               since: Optional[datetime] = None) -> Optional[List[dict]]:
+        """
+        Newest `limit` samples (newer than `since`) from memory, or None when the
+        request is larger than the buffer and has to be served by SQL.
+        """
+        if not self.enabled or limit > self.size:
+            return None
+
+        buffer = self.buffers.get(system_id)
+        if buffer is None or (not buffer.complete and buffer.count < limit):
+            self._backfill(system_id, db)
+            buffer = self.buffers[system_id]
+
+        # The newest `limit` samples are always buffered, so `since` only trims the answer
+        with self.lock:
+            return buffer.latest(limit, since)
+
+# Global history instance, filled by the ingest endpoints
+metric_history = MetricHistory()
@@ -0,0 +1,217 @@
+"""
+Write-behind ingest pipeline for metrics.
+Endpoints validate and enqueue rows; a single writer thread drains the queue
+and group-commits them, so agents never wait on an fsync.
+"""
+import io
+import os
+import csv
+import time
+import queue
+import threading
+import logging
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models import models
+from app.core.processes import process_tracker, write_process_snapshots
+from app.core.segments import segment_store
+from app.core.rollup import mark_late_rows
+
+logger = logging.getLogger(__name__)
+
+QUEUE_MAX_ROWS = int(os.getenv("INGEST_QUEUE_MAX_ROWS", "50000"))      # Rows held before new samples are dropped
+FLUSH_INTERVAL_MS = int(os.getenv("INGEST_FLUSH_INTERVAL_MS", "500"))  # Commit at least this often
+FLUSH_BATCH_ROWS = int(os.getenv("INGEST_FLUSH_BATCH_ROWS", "2000"))   # ...or as soon as this many rows are waiting
+
+def write_metric_rows(db: Session, rows: list):
+    """
+    Bulk insert of metric rows: COPY on PostgreSQL, a multi-row INSERT elsewhere.
+    Caller commits; heartbeats go through the system registry. With
+    METRICS_ENGINE=segments the rows are appended to segment files instead.
+    """
+    if not rows:
+        return
+    mark_late_rows(db, rows)
+    if segment_store.enabled:
+        segment_store.append(rows)
+        return
+    if db.get_bind().dialect.name == "postgresql" and _copy_metric_rows(db, rows):
+        return
+    db.execute(insert(models.Metric), rows)
+
+def _copy_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return "\\x" + value.hex()  # bytea hex input format
+    return value
+
+def _copy_metric_rows(db: Session, rows: list) -> bool:
+    """
+    Stream rows through COPY ... FROM STDIN inside the session's transaction.
+    Returns False when the driver has no COPY support (e.g. asyncpg through run_sync).
+    """
+    cursor = db.connection().connection.cursor()
+    if not (hasattr(cursor, "copy_expert") or hasattr(cursor, "copy")):
+        cursor.close()
+        return False
+
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # None becomes an unquoted empty field, which CSV-format COPY reads as NULL
+        writer.writerow([_copy_value(row.get(column)) for column in columns])
+
+    sql = f"COPY {models.Metric.__tablename__} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+    try:
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+    return True
+
+class MetricWriter(threading.Thread):
+    def __init__(self, max_rows: int = QUEUE_MAX_ROWS, flush_interval_ms: int = FLUSH_INTERVAL_MS,
+                 batch_rows: int = FLUSH_BATCH_ROWS):
+        super().__init__()
+        self.queue = queue.Queue(maxsize=max_rows)
+        self.process_queue = queue.Queue(maxsize=max_rows)  # Change-only top-process snapshots
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.batch_rows = batch_rows
+        self.stop_event = threading.Event()
+        self.daemon = True
+
+        # Counters exposed through stats()
+        self.stats_lock = threading.Lock()
+        self.dropped_rows = 0
+        self.failed_rows = 0
+        self.written_rows = 0
+        self.flush_count = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def submit(self, row: dict) -> bool:
+        """Enqueue one row without blocking. Returns False (and counts a drop) when the queue is full."""
+        try:
+            self.queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self.stats_lock:
+                self.dropped_rows += 1
+            return False
+
+    def submit_processes(self, snapshot: dict) -> bool:
+        """Enqueue a top-process snapshot; it is committed together with the next metric batch."""
+        try:
+            self.process_queue.put_nowait(snapshot)
+            return True
+        except queue.Full:
+            return False
+
+    def run(self):
+        logger.info("Starting Metric Writer...")
+
+        while not self.stop_event.is_set():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+
+        # Drain whatever is left so a clean shutdown loses nothing
+        self.flush()
+
+    def _collect(self) -> list:
+        """Block until batch_rows are waiting or the flush interval elapses."""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> list:
+        batch = []
+        while len(batch) < self.batch_rows:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain_processes(self) -> list:
+        snapshots = []
+        while True:
+            try:
+                snapshots.append(self.process_queue.get_nowait())
+            except queue.Empty:
+                return snapshots
+
+    def flush(self):
+        """Synchronously write everything currently queued (shutdown, tests)."""
+        while True:
+            batch = self._drain()
+            if not batch and self.process_queue.empty():
+                return
+            self._write(batch)
+
+    def _write(self, batch: list):
+        started = time.perf_counter()
+        snapshots = self._drain_processes()
+        db: Session = SessionLocal()
+        try:
+            write_metric_rows(db, batch)
+            write_process_snapshots(db, snapshots)
+            db.commit()
+        except Exception as e:
+            logger.error(f"Metric flush failed, discarding {len(batch)} rows and {len(snapshots)} process snapshots: {e}")
+            db.rollback()
+            process_tracker.forget_unstored(snapshots)
+            with self.stats_lock:
+                self.failed_rows += len(batch)
+            return
+        finally:
+            db.close()
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.stats_lock:
+            self.written_rows += len(batch)
+            self.flush_count += 1
+            self.last_flush_ms = elapsed_ms
+            self.total_flush_ms += elapsed_ms
+            self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            return {
+                "queue_depth": self.queue.qsize(),
+                "queue_capacity": self.queue.maxsize,
+                "dropped_rows": self.dropped_rows,
+                "failed_rows": self.failed_rows,
+                "written_rows": self.written_rows,
+                "flush_count": self.flush_count,
+                "last_flush_ms": round(self.last_flush_ms, 3),
+                "avg_flush_ms": round(self.total_flush_ms / self.flush_count, 3) if self.flush_count else 0.0,
+                "max_flush_ms": round(self.max_flush_ms, 3),
+            }
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=10)
+        else:
+            self.flush()
+
+# Global writer instance, started with the app
+metric_writer = MetricWriter()
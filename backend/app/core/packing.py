@@ -0,0 +1,26 @@
+"""
+Fixed-width binary packing for variable-length metric vectors (cpu_per_core).
+Values are stored as little-endian float32 in a BLOB column: 4 bytes per
+core instead of a JSON text array, and nothing to encode or parse on insert.
+"""
+import sys
+from array import array
+from typing import List, Optional, Sequence
+
+def pack_floats(values: Optional[Sequence[float]]) -> Optional[bytes]:
+    if values is None:
+        return None
+    packed = array("f", values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+def unpack_floats(data: Optional[bytes]) -> Optional[List[float]]:
+    if data is None:
+        return None
+    values = array("f")
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    # float32 turns 12.3 into 12.300000190734863; agents report per-core load with one decimal
+    return [round(value, 2) for value in values]
@@ -0,0 +1,180 @@
+"""
+Normalized, change-only storage of each system's top processes.
+Process names are interned into `process_names`; a snapshot (one
+`process_samples` row per listed process) is written only when the top-N
+set changes or a value moves meaningfully, plus once an hour so retention
+never removes a system's current state. A snapshot stays in effect until
+the next one.
+"""
+import os
+import threading
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import models
+from app.core.history import as_utc
+
+logger = logging.getLogger(__name__)
+
+CPU_CHANGE = float(os.getenv("PROCESS_CPU_CHANGE", "5.0"))       # Percentage points that count as a change
+MEMORY_CHANGE = float(os.getenv("PROCESS_MEMORY_CHANGE", "1.0"))
+SNAPSHOT_MAX_AGE = timedelta(seconds=int(os.getenv("PROCESS_SNAPSHOT_MAX_AGE", "3600")))
+
+def _entries(processes: List[Any]) -> List[tuple]:
+    """(name, pid, cpu_percent, memory_percent) per listed process, in the agent's rank order."""
+    entries = []
+    for process in processes:
+        if not isinstance(process, dict) or not process.get("name"):
+            continue
+        entries.append((
+            str(process["name"]), process.get("pid"),
+            process.get("cpu_percent"), process.get("memory_percent"),
+        ))
+    return entries
+
+def _moved(old: Optional[float], new: Optional[float], threshold: float) -> bool:
+    if old is None or new is None:
+        return old is not new
+    return abs(new - old) >= threshold
+
+class ProcessTracker:
+    """Last written snapshot per system, to decide whether a new one is worth storing."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last: Dict[int, tuple] = {}  # system_id -> (timestamp, entries)
+
+    def snapshot(self, system_id: int, timestamp: datetime, processes: Optional[List[Any]]) -> Optional[dict]:
+        """A snapshot to store for this sample, or None when nothing changed meaningfully."""
+        if processes is None:
+            return None
+        entries = _entries(processes)
+        with self.lock:
+            previous = self.last.get(system_id)
+            if previous is not None and not self._changed(previous, timestamp, entries):
+                return None
+            self.last[system_id] = (timestamp, entries)
+        return {"system_id": system_id, "timestamp": timestamp, "entries": entries}
+
+    @staticmethod
+    def _changed(previous: tuple, timestamp: datetime, entries: List[tuple]) -> bool:
+        written_at, old = previous
+        if timestamp - written_at >= SNAPSHOT_MAX_AGE:
+            return True
+        # Rank shuffles within the same set are not a change; membership and big moves are
+        old_by_key = {(name, pid): (cpu, mem) for name, pid, cpu, mem in old}
+        if len(old_by_key) != len(entries):
+            return True
+        for name, pid, cpu, mem in entries:
+            values = old_by_key.get((name, pid))
+            if values is None or _moved(values[0], cpu, CPU_CHANGE) or _moved(values[1], mem, MEMORY_CHANGE):
+                return True
+        return False
+
+    def forget(self, system_id: int):
+        with self.lock:
+            self.last.pop(system_id, None)
+
+    def forget_unstored(self, snapshots: List[dict]):
+        """Snapshots whose write failed: forget their systems so the next sample stores one again."""
+        with self.lock:
+            for snapshot in snapshots:
+                self.last.pop(snapshot["system_id"], None)
+
+class ProcessNames:
+    """In-memory name -> id cache over the `process_names` dictionary table."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids: Dict[str, int] = {}
+
+    def intern(self, db: Session, names: set) -> Dict[str, int]:
+        with self.lock:
+            ids = {name: self.ids[name] for name in names if name in self.ids}
+        missing = names - ids.keys()
+        if not missing:
+            return ids
+
+        found = dict(
+            db.query(models.ProcessName.name, models.ProcessName.id)
+            .filter(models.ProcessName.name.in_(missing)).all()
+        )
+        with self.lock:
+            self.ids.update(found)
+        ids.update(found)
+        # Ids inserted here are not cached: the caller's transaction may still roll back
+        for name in missing - found.keys():
+            ids[name] = self._insert(db, name)
+        return ids
+
+    @staticmethod
+    def _insert(db: Session, name: str) -> int:
+        try:
+            with db.begin_nested():
+                entry = models.ProcessName(name=name)
+                db.add(entry)
+            return entry.id
+        except IntegrityError:
+            # Added meanwhile by another writer (batch endpoint, another worker)
+            return db.query(models.ProcessName.id).filter(models.ProcessName.name == name).scalar()
+
+def write_process_snapshots(db: Session, snapshots: List[dict]):
+    """Insert snapshots as one row per process, in the caller's transaction."""
+    if not snapshots:
+        return
+    name_ids = process_names.intern(db, {name for s in snapshots for name, _, _, _ in s["entries"]})
+    rows = [
+        {
+            "system_id": s["system_id"], "timestamp": s["timestamp"], "rank": rank,
+            "name_id": name_ids[name], "pid": pid, "cpu_percent": cpu, "memory_percent": mem,
+        }
+        for s in snapshots
+        for rank, (name, pid, cpu, mem) in enumerate(s["entries"])
+    ]
+    if rows:
+        db.execute(insert(models.ProcessSample), rows)
+
+def process_history(db: Session, system_id: int, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None, limit: int = 100) -> List[dict]:
+    """
+    Snapshots newest first. With `start`, the snapshot already in effect at
+    `start` is included, since snapshots are only written on change.
+    """
+    sample = models.ProcessSample
+    if start is not None:
+        in_effect = db.query(sample.timestamp)\
+            .filter(sample.system_id == system_id, sample.timestamp <= start)\
+            .order_by(sample.timestamp.desc()).limit(1).scalar()
+        if in_effect is not None:
+            start = in_effect
+
+    times = db.query(sample.timestamp).filter(sample.system_id == system_id)
+    if start is not None:
+        times = times.filter(sample.timestamp >= start)
+    if end is not None:
+        times = times.filter(sample.timestamp < end)
+    times = times.distinct().order_by(sample.timestamp.desc()).limit(limit).all()
+    if not times:
+        return []
+
+    rows = db.query(sample.timestamp, models.ProcessName.name, sample.pid, sample.cpu_percent, sample.memory_percent)\
+        .join(models.ProcessName, models.ProcessName.id == sample.name_id)\
+        .filter(sample.system_id == system_id, sample.timestamp >= times[-1][0], sample.timestamp <= times[0][0])\
+        .order_by(sample.timestamp.desc(), sample.rank).all()
+
+    snapshots: List[dict] = []
+    current = None
+    for timestamp, name, pid, cpu, mem in rows:
+        if timestamp != current:
+            current = timestamp
+            snapshots.append({"timestamp": as_utc(timestamp), "processes": []})
+        snapshots[-1]["processes"].append({"name": name, "pid": pid, "cpu_percent": cpu, "memory_percent": mem})
+    return snapshots
+
+def delete_expired_process_samples(db: Session, cutoff: datetime) -> int:
+    return db.query(models.ProcessSample).filter(models.ProcessSample.timestamp < cutoff).delete()
+
+# Global instances
+process_tracker = ProcessTracker()
+process_names = ProcessNames()
@@ -0,0 +1,99 @@
+"""
+In-process pub/sub for pushing changes to dashboards.
+Ingest, alert and ticket code publish small events from any thread; each
+subscriber (one per open SSE stream) receives them on its own event loop.
+"""
+import json
+import asyncio
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 1000  # Events buffered per slow client before the oldest are dropped
+
+FLEET_TOPIC = "fleet"
+
+def system_topic(system_id: int) -> str:
+    return f"system:{system_id}"
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+def format_sse(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+
+class Subscription:
+    def __init__(self, topic: str, loop: asyncio.AbstractEventLoop, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.topic = topic
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def _put(self, message: str):
+        # Runs on the subscriber's loop; a client that can't keep up loses its oldest events
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    def deliver(self, message: str) -> bool:
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+            return True
+        except RuntimeError:  # Loop already closed
+            return False
+
+class EventBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(self, topic: str) -> Subscription:
+        """Must be called from the subscriber's running event loop."""
+        subscription = Subscription(topic, asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.topic)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.topic]
+
+    def has_subscribers(self, system_id: Optional[int] = None) -> bool:
+        return FLEET_TOPIC in self.subscribers or (
+            system_id is not None and system_topic(system_id) in self.subscribers
+        )
+
+    def _send(self, topic: str, message: str):
+        with self.lock:
+            subscribers = list(self.subscribers.get(topic, ()))
+        for subscription in subscribers:
+            if not subscription.deliver(message):
+                self.unsubscribe(subscription)
+
+    def publish(self, event_type: str, data: dict, system_id: Optional[int] = None,
+                fleet_data: Optional[dict] = None):
+        """
+        Send an event to the system's subscribers (full `data`) and to fleet
+        subscribers (`fleet_data` if given, so they can get a more compact delta).
+        Each payload is encoded once, however many clients are listening.
+        """
+        if not self.has_subscribers(system_id):
+            return
+
+        if system_id is not None and system_topic(system_id) in self.subscribers:
+            self._send(system_topic(system_id), format_sse(event_type, data))
+        if FLEET_TOPIC in self.subscribers:
+            self._send(FLEET_TOPIC, format_sse(event_type, fleet_data if fleet_data is not None else data))
+
+# Global broker instance shared by publishers and the /stream endpoint
+event_broker = EventBroker()
@@ -1,50 +1,205 @@
 """
-Simple in-memory rate limiter for FastAPI.
-Limits requests per IP address.
+Token-bucket rate limiter for FastAPI.
+Agents, dashboard users and anonymous clients get separate budgets. Agents
+are keyed by IP plus X-Agent-Id, so machines behind one NAT don't share a
+bucket. Credentials are verified before a request gets an agent or user
+budget, and every IP also has an overall cap, so changing header values
+does not buy fresh buckets. Each check is O(1) and idle buckets are evicted,
+so memory stays bounded however many clients come and go. Buckets live in
+memory, or in a shared SQLite file when several worker processes serve the API.
 """
+import os
+import hmac
 import time
-from collections import defaultdict
-from fastapi import Request, HTTPException, status
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+from jose import JWTError, jwt
+from app.core.security import API_KEY, SECRET_KEY, ALGORITHM
+from app.core.workers import MULTI_WORKER
 
 class RateLimiter:
-    def __init__(self, requests_per_second: int = 10):
-        self.requests_per_second = requests_per_second
-        self.requests = defaultdict(list)
-    
-    def is_allowed(self, client_ip: str) -> bool:
-        """Check if request is allowed based on rate limit."""
-        now = time.time()
-        window_start = now - 1.0  # 1 second window
-        
-        # Clean old requests
-        self.requests[client_ip] = [
-            req_time for req_time in self.requests[client_ip]
-            if req_time > window_start
-        ]
-        
-        # Check limit
-        if len(self.requests[client_ip]) >= self.requests_per_second:
-            return False
-        
-        # Record this request
-        self.requests[client_ip].append(now)
-        return True
-
-# Global rate limiter instance - 100 req/sec to handle 1-second dashboard updates
-rate_limiter = RateLimiter(requests_per_second=100)
+    """
+    Token bucket per key: `rate` tokens per second, up to `burst` saved up.
+    Buckets live in an LRU-ordered dict, so the least recently used (and
+    therefore most idle) keys are always at the front and eviction is O(1).
+    """
+    def __init__(self, rate: float, burst: Optional[float] = None, idle_ttl: float = 60.0,
+                 max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        # A bucket idle for burst / rate seconds is full again, same as a new one
+        self.idle_ttl = max(idle_ttl, self.burst / rate)
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, last refill]
+
+    def check(self, key: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Take one token for `key`. Returns (allowed, seconds until a token is available)."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.burst, now]
+                self._evict(now)
+            else:
+                self.buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return True, 0.0
+            return False, (1.0 - bucket[0]) / self.rate
+
+    def is_allowed(self, key: str) -> bool:
+        return self.check(key)[0]
+
+    def _evict(self, now: float):
+        # Front of the dict = least recently used; stop at the first key still in use
+        while self.buckets:
+            key, (_, last) = next(iter(self.buckets.items()))
+            if len(self.buckets) <= self.max_keys and now - last < self.idle_ttl:
+                return
+            del self.buckets[key]
+
+class SharedRateLimiter:
+    """
+    The same token bucket, kept in a small SQLite file so every worker
+    process on the box draws from one budget per key (multi-worker mode).
+    Each check is a single UPSERT ... RETURNING; idle keys are purged in bulk
+    every `purge_every` checks.
+    """
+    CHECK = """
+        INSERT INTO buckets (key, tokens, last, allowed) VALUES (:key, :burst - 1, :now, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = CASE WHEN min(:burst, tokens + (:now - last) * :rate) >= 1
+                          THEN min(:burst, tokens + (:now - last) * :rate) - 1
+                          ELSE min(:burst, tokens + (:now - last) * :rate) END,
+            allowed = min(:burst, tokens + (:now - last) * :rate) >= 1,
+            last = :now
+        RETURNING tokens, allowed
+    """
+
+    def __init__(self, path: str, name: str, rate: float, burst: Optional[float] = None,
+                 idle_ttl: float = 60.0, purge_every: int = 10000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.idle_ttl = max(idle_ttl, self.burst / rate)
+        self.purge_every = purge_every
+        self.checks = 0
+        self.lock = threading.Lock()
+
+        # autocommit: every statement is its own short write transaction
+        self.conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=OFF")  # Losing buckets in a crash just refills them
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, last REAL NOT NULL, allowed INTEGER NOT NULL)"
+        )
+
+    def check(self, key: str, now: Optional[float] = None) -> Tuple[bool, float]:
+        # Wall-clock time: monotonic clocks are not comparable between processes everywhere
+        now = time.time() if now is None else now
+        params = {"key": f"{self.name}:{key}", "burst": self.burst, "rate": self.rate, "now": now}
+        with self.lock:
+            tokens, allowed = self.conn.execute(self.CHECK, params).fetchone()
+            self.checks += 1
+            if self.checks % self.purge_every == 0:
+                self.conn.execute("DELETE FROM buckets WHERE last < ?", (now - self.idle_ttl,))
+
+        if allowed:
+            return True, 0.0
+        return False, (1.0 - tokens) / self.rate
+
+    def is_allowed(self, key: str) -> bool:
+        return self.check(key)[0]
+
+# Budgets (requests per second, burst) per client class
+AGENT_RATE = float(os.getenv("RATE_LIMIT_AGENT", "20"))   # Per agent: 1 sample/s plus registration, batches, tickets
+USER_RATE = float(os.getenv("RATE_LIMIT_USER", "100"))    # Per dashboard login
+IP_RATE = float(os.getenv("RATE_LIMIT_IP", "100"))        # Everyone else, per IP
+IP_CAP_RATE = float(os.getenv("RATE_LIMIT_IP_CAP", "1000"))  # All agents and users behind one IP together
+
+BUDGETS = {
+    "agent": (AGENT_RATE, AGENT_RATE * 5),  # Room for a reconnect replay
+    "user": (USER_RATE, USER_RATE * 2),
+    "ip": (IP_RATE, IP_RATE * 2),
+    "ip_cap": (IP_CAP_RATE, IP_CAP_RATE * 2),
+}
+
+# Multi-worker mode shares buckets between worker processes through this file
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", os.path.join(tempfile.gettempdir(), "resource_monitor_ratelimit.db"))
+
+if MULTI_WORKER:
+    limiters = {name: SharedRateLimiter(RATE_LIMIT_DB, name, rate, burst) for name, (rate, burst) in BUDGETS.items()}
+else:
+    limiters = {name: RateLimiter(rate, burst) for name, (rate, burst) in BUDGETS.items()}
+
+@lru_cache(maxsize=4096)
+def _token_expiry(token: str) -> Optional[float]:
+    """Expiry of a validly signed JWT, None if the signature doesn't check out. Cached per token."""
+    try:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": False})
+    except JWTError:
+        return None
+    return float(claims.get("exp", 0))
+
+def rate_limit_key(request: Request) -> Tuple[str, str]:
+    """
+    (limiter name, bucket key) for a request. Only a valid API key or a validly
+    signed, unexpired token earns the agent or user budget; anything else is keyed by IP.
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    headers = request.headers
+
+    api_key = headers.get("x-api-key")
+    if api_key is not None and hmac.compare_digest(api_key.encode(), API_KEY.encode()):
+        return "agent", f"{client_ip}|{headers.get('x-agent-id', '')}"
+
+    authorization = headers.get("authorization", "")
+    if authorization.startswith("Bearer "):
+        token = authorization[len("Bearer "):]
+        expiry = _token_expiry(token)
+        if expiry is not None and expiry > time.time():
+            # The JWT signature is unique per token and cheap to take
+            return "user", token.rsplit(".", 1)[-1]
+
+    return "ip", client_ip
+
+async def _check(name: str, key: str) -> Tuple[bool, float]:
+    limiter = limiters[name]
+    if isinstance(limiter, SharedRateLimiter):
+        # The write can wait up to its busy timeout on another worker's lock; keep that off the event loop
+        return await run_in_threadpool(limiter.check, key)
+    return limiter.check(key)
 
 async def rate_limit_middleware(request: Request, call_next):
     """Middleware to apply rate limiting."""
-    client_ip = request.client.host if request.client else "unknown"
-    
     # Skip rate limiting for non-API routes
     if not request.url.path.startswith("/api"):
         return await call_next(request)
-    
-    if not rate_limiter.is_allowed(client_ip):
-        raise HTTPException(
+
+    name, key = rate_limit_key(request)
+    allowed, retry_after = await _check(name, key)
+    if allowed and name != "ip":
+        # Agent ids and tokens are per client, the cap bounds everything from one address
+        client_ip = request.client.host if request.client else "unknown"
+        allowed, retry_after = await _check("ip_cap", client_ip)
+    if not allowed:
+        # Exceptions raised in middleware bypass FastAPI's handlers, so answer directly
+        return JSONResponse(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Too many requests. Please slow down."
+            content={"detail": "Too many requests. Please slow down."},
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
         )
-    
+
     return await call_next(request)
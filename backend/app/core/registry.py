@@ -0,0 +1,256 @@
+"""
+Process-wide registry of known systems, their heartbeats and online state.
+Ingest checks and touches systems in memory; background threads write the
+accumulated heartbeats to systems.last_seen in one batch and mark systems
+offline when their heartbeats stop, writing only actual transitions.
+"""
+import os
+import time
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+from sqlalchemy import update, bindparam, or_
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models import models
+from app.core.history import as_utc
+from app.core.pubsub import event_broker
+from app.core.workers import MULTI_WORKER
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_FLUSH_INTERVAL = int(os.getenv("HEARTBEAT_FLUSH_INTERVAL", "5"))  # Seconds between last_seen writes
+SWEEP_INTERVAL = 5         # Seconds between liveness sweeps
+OFFLINE_AFTER_SECONDS = 60  # Allow for network delays before a system counts as offline
+EXISTS_TTL = int(os.getenv("REGISTRY_EXISTS_TTL", "5"))  # Multi-worker mode: seconds a known id is trusted before re-checking
+
+_systems = models.System.__table__
+HEARTBEAT_UPDATE = (
+    update(_systems)
+    .where(_systems.c.id == bindparam("system_id"))
+    .values(last_seen=bindparam("seen"), is_active=True)
+)
+
+class SystemRegistry:
+    def __init__(self, multi_worker: bool = MULTI_WORKER):
+        self.lock = threading.Lock()
+        # Other workers can delete systems without telling this one, so known ids expire
+        self.multi_worker = multi_worker
+        self.checked_at: Dict[int, float] = {}  # Monotonic time each id was last confirmed in the database
+        self.last_seen: Dict[int, Optional[datetime]] = {}
+        self.dirty: Dict[int, datetime] = {}
+        self.active: Set[int] = set()  # Systems currently considered online
+
+    def load(self, db: Session):
+        """Warm the registry with every system in the database."""
+        rows = db.query(models.System.id, models.System.last_seen, models.System.is_active).all()
+        with self.lock:
+            for row in rows:
+                if row.id not in self.last_seen:
+                    self._add(row.id, row.last_seen, row.is_active)
+
+    def is_known(self, system_id: int) -> bool:
+        """True if the system can be trusted to exist without asking the database."""
+        if system_id not in self.last_seen:
+            return False
+        if not self.multi_worker:
+            return True
+        checked = self.checked_at.get(system_id)
+        return checked is not None and time.monotonic() - checked < EXISTS_TTL
+
+    def exists(self, system_id: int, db: Session) -> bool:
+        """
+        True if the system is registered. Only unknown ids fall through to the database,
+        plus, in multi-worker mode, known ids not confirmed within EXISTS_TTL seconds.
+        """
+        if self.is_known(system_id):
+            return True
+
+        row = db.query(models.System.id, models.System.last_seen, models.System.is_active)\
+            .filter(models.System.id == system_id).first()
+        if not row:
+            # Deleted through another worker
+            self.remove(system_id)
+            return False
+        with self.lock:
+            if system_id in self.last_seen:
+                # Keep the in-memory heartbeat, it is newer than the flushed one
+                self.checked_at[system_id] = time.monotonic()
+            else:
+                self._add(row.id, row.last_seen, row.is_active)
+        return True
+
+    def _add(self, system_id: int, last_seen: Optional[datetime], is_active: bool):
+        self.last_seen[system_id] = as_utc(last_seen) if last_seen else None
+        self.checked_at[system_id] = time.monotonic()
+        if is_active:
+            self.active.add(system_id)
+        else:
+            self.active.discard(system_id)
+
+    def add(self, system_id: int, last_seen: Optional[datetime] = None, is_active: bool = True):
+        with self.lock:
+            self._add(system_id, last_seen, is_active)
+
+    def remove(self, system_id: int):
+        with self.lock:
+            self.last_seen.pop(system_id, None)
+            self.checked_at.pop(system_id, None)
+            self.dirty.pop(system_id, None)
+            self.active.discard(system_id)
+
+    def is_active(self, system_id: int) -> bool:
+        return system_id in self.active
+
+    def touch(self, system_id: int, when: Optional[datetime] = None):
+        """Record a heartbeat in memory; it reaches the database on the next flush."""
+        when = when or datetime.now(timezone.utc)
+        with self.lock:
+            self.last_seen[system_id] = when
+            self.dirty[system_id] = when
+            came_online = system_id not in self.active
+            self.active.add(system_id)
+
+        if came_online:
+            publish_status(system_id, True)
+
+    def sweep(self, db: Session, now: Optional[datetime] = None) -> List[int]:
+        """Mark systems whose heartbeats stopped as offline. Only transitions are written."""
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(seconds=OFFLINE_AFTER_SECONDS)
+        with self.lock:
+            stale = [
+                system_id for system_id in self.active
+                if self.last_seen.get(system_id) is None or self.last_seen[system_id] < cutoff
+            ]
+            self.active.difference_update(stale)
+        if not stale:
+            return []
+
+        try:
+            db.query(models.System).filter(models.System.id.in_(stale)).update(
+                {"is_active": False}, synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self.lock:
+                # Retry on the next sweep
+                self.active.update(s for s in stale if s in self.last_seen)
+            raise
+
+        for system_id in stale:
+            publish_status(system_id, False)
+        return stale
+
+    def sweep_database(self, db: Session, now: Optional[datetime] = None) -> List[int]:
+        """
+        Multi-worker mode: heartbeats are spread over the workers' registries,
+        so liveness is judged by the last_seen values they flush to the database.
+        """
+        cutoff = (now or datetime.now(timezone.utc)) - timedelta(seconds=OFFLINE_AFTER_SECONDS)
+        silent = or_(models.System.last_seen == None, models.System.last_seen < cutoff)
+        stale = [row.id for row in db.query(models.System.id).filter(models.System.is_active == True, silent).all()]
+        if not stale:
+            return []
+
+        # Re-check the cutoff in case a worker flushed a heartbeat since the SELECT
+        db.query(models.System).filter(models.System.id.in_(stale), silent).update(
+            {"is_active": False}, synchronize_session=False
+        )
+        db.commit()
+        with self.lock:
+            self.active.difference_update(stale)
+
+        for system_id in stale:
+            publish_status(system_id, False)
+        return stale
+
+    def flush(self, db: Session) -> int:
+        """Write pending heartbeats with one bulk UPDATE. Returns the number of systems written."""
+        with self.lock:
+            pending, self.dirty = self.dirty, {}
+        if not pending:
+            return 0
+
+        try:
+            # Core executemany: systems deleted meanwhile simply match no row
+            db.execute(HEARTBEAT_UPDATE, [
+                {"system_id": system_id, "seen": when}
+                for system_id, when in pending.items()
+            ])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the heartbeats back unless a newer one arrived meanwhile
+            with self.lock:
+                for system_id, when in pending.items():
+                    if system_id in self.last_seen:
+                        self.dirty.setdefault(system_id, when)
+            raise
+        return len(pending)
+
+class HeartbeatFlusher(threading.Thread):
+    def __init__(self, registry: SystemRegistry, interval: int = HEARTBEAT_FLUSH_INTERVAL):
+        super().__init__()
+        self.registry = registry
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.daemon = True
+
+    def run(self):
+        logger.info("Starting Heartbeat Flusher...")
+
+        while not self.stop_event.wait(self.interval):
+            self.flush()
+
+        # Final write so the last heartbeats survive a clean shutdown
+        self.flush()
+
+    def flush(self):
+        db: Session = SessionLocal()
+        try:
+            self.registry.flush(db)
+        except Exception as e:
+            logger.error(f"Heartbeat flush failed: {e}")
+        finally:
+            db.close()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=10)
+        else:
+            self.flush()
+
+class LivenessSweeper(threading.Thread):
+    def __init__(self, registry: SystemRegistry, interval: int = SWEEP_INTERVAL):
+        super().__init__()
+        self.registry = registry
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.daemon = True
+
+    def run(self):
+        logger.info("Starting Liveness Sweeper...")
+
+        while not self.stop_event.wait(self.interval):
+            db: Session = SessionLocal()
+            try:
+                sweep = self.registry.sweep_database if MULTI_WORKER else self.registry.sweep
+                offline = sweep(db)
+                if offline:
+                    logger.info(f"Marked {len(offline)} systems offline.")
+            except Exception as e:
+                logger.error(f"Liveness sweep failed: {e}")
+            finally:
+                db.close()
+
+    def stop(self):
+        self.stop_event.set()
+
+def publish_status(system_id: int, is_active: bool):
+    event_broker.publish("system", {"action": "status", "id": system_id, "is_active": is_active}, system_id=system_id)
+
+# Global registry instance shared by all endpoints
+system_registry = SystemRegistry()
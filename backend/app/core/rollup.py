@@ -0,0 +1,332 @@
+"""
+Continuous rollups of the metrics table.
+A background compactor folds closed time buckets into metric_rollups at 1m, 5m
+and 1h resolution (min/max/avg/last of CPU, memory and disk), so long ranges
+are served from a few kilobytes per machine instead of raw rows. Samples that
+arrive for a bucket that may already be closed (batch uploads, lagging agent
+clocks) are marked at ingest, and the next pass refolds the buckets they touch.
+"""
+import os
+import threading
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models import models
+from app.core.segments import segment_store
+
+logger = logging.getLogger(__name__)
+
+COMPACT_INTERVAL = int(os.getenv("ROLLUP_COMPACT_INTERVAL", "60"))  # Seconds between compactor passes
+LATE_SAMPLE_GRACE = 30      # Seconds a bucket stays open for queued / late samples
+MAX_PASS_SPAN = 3600 * 6    # Source seconds folded per query, keeps memory flat on catch-up
+
+RAW_RETENTION = timedelta(hours=int(os.getenv("METRICS_RETENTION_HOURS", "24")))  # Mirrors MetricCleaner.RETENTION_HOURS
+RAW_SAMPLE_INTERVAL = 1              # Worst-case agent cadence, used to estimate raw point counts
+
+# resolution (seconds) -> (source resolution, retention); 0 means raw samples (metrics table or segments)
+RESOLUTIONS: Dict[int, Tuple[int, timedelta]] = {
+    60: (0, timedelta(days=7)),
+    300: (60, timedelta(days=90)),
+    3600: (300, timedelta(days=730)),
+}
+
+RESOLUTION_LABELS = {0: "raw", 60: "1m", 300: "5m", 3600: "1h"}
+
+GAUGES = ("cpu", "memory", "disk")
+
+def _epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _from_epoch(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc)
+
+class _Bucket:
+    """Running aggregate for one (system, bucket) pair."""
+    __slots__ = ("count", "last_time", "stats")
+
+    def __init__(self):
+        self.count = 0
+        self.last_time = None
+        # gauge -> [min, max, weighted sum, weight, last]
+        self.stats = {gauge: [None, None, 0.0, 0, None] for gauge in GAUGES}
+
+    def add(self, when: float, count: int, values: Dict[str, Tuple]):
+        """values: gauge -> (min, max, avg, last). A raw sample passes the same value four times."""
+        self.count += count
+        is_latest = self.last_time is None or when >= self.last_time
+        if is_latest:
+            self.last_time = when
+
+        for gauge, (lo, hi, avg, last) in values.items():
+            if avg is None:
+                continue
+            stat = self.stats[gauge]
+            stat[0] = lo if stat[0] is None else min(stat[0], lo)
+            stat[1] = hi if stat[1] is None else max(stat[1], hi)
+            stat[2] += avg * count
+            stat[3] += count
+            if is_latest or stat[4] is None:
+                stat[4] = last
+
+    def to_row(self, system_id: int, resolution: int, bucket_start: float) -> dict:
+        row = {
+            "system_id": system_id,
+            "resolution": resolution,
+            "bucket_start": _from_epoch(bucket_start),
+            "sample_count": self.count,
+        }
+        for gauge, (lo, hi, total, weight, last) in self.stats.items():
+            row[f"{gauge}_min"] = lo
+            row[f"{gauge}_max"] = hi
+            row[f"{gauge}_avg"] = total / weight if weight else None
+            row[f"{gauge}_last"] = last
+        return row
+
+def _source_rows(db: Session, source: int, start: datetime, end: datetime, system_id: Optional[int] = None):
+    """(system_id, time, count, {gauge: (min, max, avg, last)}) for the source resolution, optionally one system's."""
+    if source == 0 and segment_store.enabled:
+        fields = ("timestamp", "cpu_usage", "memory_percent", "disk_usage")
+        for ids, records in segment_store.scan(system_id, start, end, newest_first=False):
+            columns = [segment_store.column(records, name) for name in fields]
+            for row_system_id, when, cpu, memory, disk in zip(ids, *columns):
+                yield row_system_id, _epoch(when), 1, {
+                    "cpu": (cpu, cpu, cpu, cpu),
+                    "memory": (memory, memory, memory, memory),
+                    "disk": (disk, disk, disk, disk),
+                }
+        return
+
+    if source == 0:
+        query = db.query(
+            models.Metric.system_id, models.Metric.timestamp,
+            models.Metric.cpu_usage, models.Metric.memory_percent, models.Metric.disk_usage
+        ).filter(models.Metric.timestamp >= start, models.Metric.timestamp < end)
+        if system_id is not None:
+            query = query.filter(models.Metric.system_id == system_id)
+        for row_system_id, when, cpu, memory, disk in query.yield_per(5000):
+            yield row_system_id, _epoch(when), 1, {
+                "cpu": (cpu, cpu, cpu, cpu),
+                "memory": (memory, memory, memory, memory),
+                "disk": (disk, disk, disk, disk),
+            }
+        return
+
+    query = db.query(models.MetricRollup).filter(
+        models.MetricRollup.resolution == source,
+        models.MetricRollup.bucket_start >= start,
+        models.MetricRollup.bucket_start < end
+    )
+    if system_id is not None:
+        query = query.filter(models.MetricRollup.system_id == system_id)
+    for r in query.yield_per(5000):
+        yield r.system_id, _epoch(r.bucket_start), r.sample_count, {
+            gauge: (getattr(r, f"{gauge}_min"), getattr(r, f"{gauge}_max"),
+                    getattr(r, f"{gauge}_avg"), getattr(r, f"{gauge}_last"))
+            for gauge in GAUGES
+        }
+
+def _source_start(db: Session, source: int, after: Optional[datetime] = None) -> Optional[datetime]:
+    """Oldest source timestamp (at or after `after`), used to skip gaps with no data."""
+    if source == 0 and segment_store.enabled:
+        return segment_store.oldest_timestamp(after)
+    if source == 0:
+        query = db.query(func.min(models.Metric.timestamp))
+        if after is not None:
+            query = query.filter(models.Metric.timestamp >= after)
+        return query.scalar()
+
+    query = db.query(func.min(models.MetricRollup.bucket_start))\
+        .filter(models.MetricRollup.resolution == source)
+    if after is not None:
+        query = query.filter(models.MetricRollup.bucket_start >= after)
+    return query.scalar()
+
+def compact_resolution(db: Session, resolution: int, now: Optional[datetime] = None) -> int:
+    """Fold every closed, not yet rolled-up bucket of one resolution. Returns rows written."""
+    source, retention = RESOLUTIONS[resolution]
+    now = now or datetime.now(timezone.utc)
+
+    # Buckets close once the grace period (and, for coarser levels, the source bucket) has passed
+    closed_until = (_epoch(now) - LATE_SAMPLE_GRACE - source) // resolution * resolution
+
+    newest = db.query(func.max(models.MetricRollup.bucket_start))\
+        .filter(models.MetricRollup.resolution == resolution).scalar()
+    # Nothing older than this level's retention is worth folding
+    after = now - retention
+    if newest is not None:
+        after = max(after, _from_epoch(_epoch(newest) + resolution))
+    first = _source_start(db, source, after)
+    if first is None:
+        return 0
+    start = _epoch(first) // resolution * resolution
+
+    pass_span = max(MAX_PASS_SPAN // resolution, 1) * resolution
+    written = 0
+    while start < closed_until:
+        end = min(start + pass_span, closed_until)
+        buckets: Dict[Tuple[int, float], _Bucket] = {}
+        for system_id, when, count, values in _source_rows(db, source, _from_epoch(start), _from_epoch(end)):
+            key = (system_id, when // resolution * resolution)
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = _Bucket()
+            bucket.add(when, count, values)
+
+        if buckets:
+            db.execute(insert(models.MetricRollup), [
+                bucket.to_row(system_id, resolution, bucket_start)
+                for (system_id, bucket_start), bucket in buckets.items()
+            ])
+            db.commit()
+            written += len(buckets)
+        start = end
+    return written
+
+def mark_late_rows(db: Session, rows: list, now: Optional[datetime] = None):
+    """
+    Record the 1-minute buckets of rows that may already be closed, in the caller's transaction.
+    The compactor's watermark is per resolution, not per system, so it would never look back at them.
+    """
+    closed_before = _epoch(now or datetime.now(timezone.utc)) - LATE_SAMPLE_GRACE
+    late = set()
+    for row in rows:
+        bucket_start = _epoch(row["timestamp"]) // 60 * 60
+        if bucket_start + 60 <= closed_before:
+            late.add((row["system_id"], bucket_start))
+    if late:
+        db.execute(insert(models.RollupLateBucket), [
+            {"system_id": system_id, "bucket_start": _from_epoch(bucket_start)} for system_id, bucket_start in late
+        ])
+
+def _newest_bucket(db: Session, resolution: int) -> Optional[float]:
+    newest = db.query(func.max(models.MetricRollup.bucket_start))\
+        .filter(models.MetricRollup.resolution == resolution).scalar()
+    return None if newest is None else _epoch(newest)
+
+def refold_buckets(db: Session, resolution: int, keys: Iterable[Tuple[int, float]]) -> int:
+    """Recompute (system_id, bucket_start) buckets from their source, replacing any existing row."""
+    source, _ = RESOLUTIONS[resolution]
+    written = 0
+    for system_id, bucket_start in sorted(keys):
+        bucket = _Bucket()
+        for _, when, count, values in _source_rows(db, source, _from_epoch(bucket_start),
+                                                   _from_epoch(bucket_start + resolution), system_id):
+            bucket.add(when, count, values)
+        # Delete and insert rather than upsert, so the same statements work on SQLite and PostgreSQL
+        db.query(models.MetricRollup).filter(
+            models.MetricRollup.system_id == system_id,
+            models.MetricRollup.resolution == resolution,
+            models.MetricRollup.bucket_start == _from_epoch(bucket_start)
+        ).delete(synchronize_session=False)
+        if bucket.count:
+            db.execute(insert(models.MetricRollup), [bucket.to_row(system_id, resolution, bucket_start)])
+            written += 1
+    db.commit()
+    return written
+
+def compact_all(db: Session, now: Optional[datetime] = None) -> int:
+    now = now or datetime.now(timezone.utc)
+    marks = db.query(models.RollupLateBucket.id, models.RollupLateBucket.system_id,
+                     models.RollupLateBucket.bucket_start).all()
+    late: Set[Tuple[int, float]] = {(system_id, _epoch(bucket_start)) for _, system_id, bucket_start in marks}
+
+    written = 0
+    # Finest first, so each level reads an up-to-date source
+    for resolution in sorted(RESOLUTIONS):
+        source, _ = RESOLUTIONS[resolution]
+        source_retention = RAW_RETENTION if source == 0 else RESOLUTIONS[source][1]
+        passed = _newest_bucket(db, resolution)
+        written += compact_resolution(db, resolution, now)
+
+        # Buckets beyond the old watermark were just folded with the late samples in them;
+        # those behind it are refolded, as long as their source hasn't expired
+        late = {(system_id, when // resolution * resolution) for system_id, when in late}
+        oldest_source = _epoch(now - source_retention)
+        stale = [key for key in late if passed is not None and oldest_source <= key[1] <= passed]
+        if stale:
+            written += refold_buckets(db, resolution, stale)
+
+    if marks:
+        db.query(models.RollupLateBucket).filter(
+            models.RollupLateBucket.id <= max(mark_id for mark_id, _, _ in marks)
+        ).delete(synchronize_session=False)
+        db.commit()
+    return written
+
+def choose_resolution(start: datetime, end: datetime, max_points: int, now: Optional[datetime] = None) -> int:
+    """
+    Finest resolution that still covers `start` within its retention and returns
+    at most `max_points` points for the range; the coarsest level otherwise.
+    """
+    now = now or datetime.now(timezone.utc)
+    span = max(_epoch(end) - _epoch(start), 0)
+
+    levels = [(0, RAW_RETENTION, RAW_SAMPLE_INTERVAL)] + [
+        (resolution, retention, resolution) for resolution, (_, retention) in sorted(RESOLUTIONS.items())
+    ]
+    for resolution, retention, step in levels:
+        if _epoch(start) < _epoch(now - retention):
+            continue
+        if span / step <= max_points:
+            return resolution
+    return max(RESOLUTIONS)
+
+def rollup_points(db: Session, system_id: int, resolution: int, start: datetime, end: datetime) -> List[dict]:
+    """Rollup buckets in range, oldest first. Averages are reported under the raw metric names."""
+    rollups = db.query(models.MetricRollup).filter(
+        models.MetricRollup.system_id == system_id,
+        models.MetricRollup.resolution == resolution,
+        models.MetricRollup.bucket_start >= start,
+        models.MetricRollup.bucket_start < end
+    ).order_by(models.MetricRollup.bucket_start).all()
+
+    return [{
+        "timestamp": r.bucket_start,
+        "sample_count": r.sample_count,
+        "cpu_usage": r.cpu_avg, "cpu_min": r.cpu_min, "cpu_max": r.cpu_max, "cpu_last": r.cpu_last,
+        "memory_percent": r.memory_avg, "memory_min": r.memory_min,
+        "memory_max": r.memory_max, "memory_last": r.memory_last,
+        "disk_usage": r.disk_avg, "disk_min": r.disk_min, "disk_max": r.disk_max, "disk_last": r.disk_last,
+    } for r in rollups]
+
+def delete_expired_rollups(db: Session, now: Optional[datetime] = None) -> int:
+    now = now or datetime.now(timezone.utc)
+    deleted = 0
+    for resolution, (_, retention) in RESOLUTIONS.items():
+        deleted += db.query(models.MetricRollup).filter(
+            models.MetricRollup.resolution == resolution,
+            models.MetricRollup.bucket_start < now - retention
+        ).delete(synchronize_session=False)
+    return deleted
+
+class RollupCompactor(threading.Thread):
+    def __init__(self, interval: int = COMPACT_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.daemon = True
+
+    def run(self):
+        logger.info("Starting Rollup Compactor...")
+
+        while not self.stop_event.is_set():
+            db: Session = SessionLocal()
+            try:
+                written = compact_all(db)
+                if written > 0:
+                    logger.info(f"Compacted {written} metric rollup buckets.")
+            except Exception as e:
+                logger.error(f"Rollup compaction failed: {e}")
+                db.rollback()
+            finally:
+                db.close()
+
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
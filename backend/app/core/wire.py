@@ -0,0 +1,108 @@
+"""
+Request body encodings for agent uploads.
+Agents may send msgpack instead of JSON and compress bodies with gzip or
+zstd; WireRoute decodes them before FastAPI validates the payload, so
+endpoints and schemas are unchanged. Agents discover what is accepted via
+GET /capabilities and fall back to plain JSON.
+"""
+import io
+import gzip
+import zlib
+from typing import Any, Callable
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+try:
+    import msgpack
+except ImportError:  # Optional: JSON only
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # Optional: gzip only
+    zstandard = None
+
+MAX_BODY_BYTES = 32 * 1024 * 1024  # Decompressed size limit, guards against compression bombs
+
+DECOMPRESS_ERRORS = (OSError, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+def capabilities() -> dict:
+    return {
+        "content_types": [JSON_TYPE] + (list(MSGPACK_TYPES[:1]) if msgpack else []),
+        "content_encodings": ["identity", "gzip"] + (["zstd"] if zstandard else []),
+    }
+
+def _bounded_read(stream) -> bytes:
+    data = stream.read(MAX_BODY_BYTES + 1)
+    if len(data) > MAX_BODY_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Decompressed body too large")
+    return data
+
+def decompress(body: bytes, encoding: str) -> bytes:
+    encoding = encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return body
+    try:
+        if encoding == "gzip":
+            return _bounded_read(gzip.GzipFile(fileobj=io.BytesIO(body)))
+        if encoding == "zstd" and zstandard:
+            return _bounded_read(zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)))
+    except DECOMPRESS_ERRORS as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid {encoding} body: {e}")
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail=f"Unsupported Content-Encoding: {encoding}"
+    )
+
+class WireRequest(Request):
+    """Decompresses the body and decodes msgpack, presenting JSON-equivalent data to FastAPI."""
+    async def body(self) -> bytes:
+        if not hasattr(self, "_decoded_body"):
+            body = await super().body()
+            self._decoded_body = decompress(body, self.headers.get("content-encoding", ""))
+        return self._decoded_body
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            if getattr(self, "_wire_msgpack", False):
+                try:
+                    self._json = msgpack.unpackb(await self.body(), raw=False)
+                except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+                    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid msgpack body: {e}")
+            else:
+                self._json = await super().json()
+        return self._json
+
+def _wrap(request: Request) -> Request:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    is_msgpack = content_type in MSGPACK_TYPES
+    if not is_msgpack and not request.headers.get("content-encoding"):
+        return request  # Plain JSON: nothing to do
+
+    if is_msgpack and msgpack is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="msgpack bodies are not supported by this server"
+        )
+
+    wire_request = WireRequest(request.scope, request.receive)
+    if is_msgpack:
+        # FastAPI only hands JSON content types to request.json()
+        headers = MutableHeaders(scope=dict(request.scope, headers=list(request.scope["headers"])))
+        headers["content-type"] = JSON_TYPE
+        wire_request._headers = headers
+        wire_request._wire_msgpack = True
+    return wire_request
+
+class WireRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        original_handler = super().get_route_handler()
+
+        async def handler(request: Request) -> Response:
+            return await original_handler(_wrap(request))
+
+        return handler
@@ -0,0 +1,94 @@
+"""
+Multi-worker support (uvicorn --workers N / WEB_CONCURRENCY=N).
+Exactly one worker holds the leader lease and runs the box-wide background
+duties (beacon, cleanup, rollups, liveness sweep); the others keep retrying,
+so a new leader takes over if the current one exits. The lease is an OS file
+lock, which the kernel releases when its process dies.
+"""
+import os
+import tempfile
+import threading
+import logging
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("WEB_CONCURRENCY", "1"))  # Same variable uvicorn reads for --workers
+MULTI_WORKER = WORKERS > 1
+
+LEADER_LOCK_FILE = os.getenv("LEADER_LOCK_FILE", os.path.join(tempfile.gettempdir(), "resource_monitor_leader.lock"))
+LEADER_RETRY_INTERVAL = 5  # Seconds between attempts to take over the lease
+
+class LeaderLease:
+    """Non-blocking exclusive lock on a file, held for the life of the process."""
+    def __init__(self, path: str = LEADER_LOCK_FILE):
+        self.path = path
+        self.file = None
+
+    @property
+    def held(self) -> bool:
+        return self.file is not None
+
+    def acquire(self) -> bool:
+        if self.held:
+            return True
+        lock_file = open(self.path, "a+")
+        try:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            return False
+        self.file = lock_file
+        return True
+
+    def release(self):
+        if not self.held:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self.file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.file.seek(0)
+                msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self.file.close()
+            self.file = None
+
+class LeaderElector(threading.Thread):
+    """Tries to take the lease until it succeeds, then runs `on_elected` once."""
+    def __init__(self, on_elected: Callable[[], None], lease: Optional[LeaderLease] = None,
+                 interval: int = LEADER_RETRY_INTERVAL):
+        super().__init__()
+        self.on_elected = on_elected
+        self.lease = lease or LeaderLease()
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.daemon = True
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lease.held
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if self.lease.acquire():
+                logger.info(f"Worker {os.getpid()} is leader; starting background duties.")
+                self.on_elected()
+                return
+            self.stop_event.wait(self.interval)
+
+    def stop(self):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout=5)
+        self.lease.release()
@@ -3,18 +3,63 @@ from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
-# SQLite Setup (no external database required)
+# SQLite by default (no external database required); postgresql://... is also supported
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./resource_monitor.db")
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Named SQLite storage profiles: PRAGMAs applied to every connection plus pool sizing.
+#   durable    - fsync on every commit; nothing committed is ever lost
+#   balanced   - fsync at checkpoints only (WAL + NORMAL); a power cut may lose the last commits, never corrupts
+#   throughput - no fsync, big cache and mmap; an OS crash or power cut may corrupt the database
+SQLITE_PROFILES = {
+    "durable": {
+        "pragmas": {
+            "journal_mode": "WAL", "synchronous": "FULL", "busy_timeout": 5000,
+            "cache_size": -16000, "temp_store": "DEFAULT", "mmap_size": 0,
+        },
+        "pool": {"pool_size": 5, "max_overflow": 10},
+    },
+    "balanced": {
+        "pragmas": {
+            "journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 5000,
+            "cache_size": -64000, "temp_store": "MEMORY", "mmap_size": 268435456,
+        },
+        "pool": {"pool_size": 10, "max_overflow": 20},
+    },
+    "throughput": {
+        "pragmas": {
+            "journal_mode": "WAL", "synchronous": "OFF", "busy_timeout": 10000,
+            "cache_size": -262144, "temp_store": "MEMORY", "mmap_size": 1073741824,
+            "wal_autocheckpoint": 10000,
+        },
+        "pool": {"pool_size": 20, "max_overflow": 40},
+    },
+}
+DB_PROFILE = os.getenv("DB_PROFILE", "balanced")
+if DB_PROFILE not in SQLITE_PROFILES:
+    raise ValueError(f"Unknown DB_PROFILE {DB_PROFILE!r}; expected one of {', '.join(SQLITE_PROFILES)}")
+
+# Pool sizing for server databases (PostgreSQL)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+def _engine_options() -> dict:
+    if IS_SQLITE:
+        return {"connect_args": {"check_same_thread": False}, **SQLITE_PROFILES[DB_PROFILE]["pool"]}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW, "pool_pre_ping": True}
+
+engine = create_engine(DATABASE_URL, **_engine_options())
 
-# Enable Write-Ahead Logging (WAL) for better concurrency
-@event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
+    """Apply the storage profile's PRAGMAs to each new SQLite connection."""
     cursor = dbapi_connection.cursor()
-    cursor.execute("PRAGMA journal_mode=WAL")
+    for name, value in SQLITE_PROFILES[DB_PROFILE]["pragmas"].items():
+        cursor.execute(f"PRAGMA {name}={value}")
     cursor.close()
 
+if IS_SQLITE:
+    event.listen(engine, "connect", set_sqlite_pragma)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -25,3 +70,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Optional async engine (DB_ASYNC=1): the hot endpoints then await the database
+# on the event loop instead of holding a threadpool slot. Needs aiosqlite (or asyncpg).
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+                .replace("postgresql://", "postgresql+asyncpg://", 1)
+)
+ASYNC_POOL_SIZE = int(os.getenv("ASYNC_POOL_SIZE", "20"))  # Bounds concurrent DB work instead of the threadpool
+
+def create_async_session_factory(url: str = ASYNC_DATABASE_URL):
+    from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+
+    async_engine = create_async_engine(url, pool_size=ASYNC_POOL_SIZE, max_overflow=0)
+    if async_engine.dialect.name == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", set_sqlite_pragma)
+    return sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+AsyncSessionLocal = create_async_session_factory() if DB_ASYNC else None
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
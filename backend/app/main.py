@@ -1,7 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
-from app.db.database import engine, Base
+from app.db.database import engine, Base, SessionLocal, DB_ASYNC
 
 # Import models so SQLAlchemy registers them with Base
 from app.models import models
@@ -26,6 +26,10 @@ app.middleware("http")(rate_limit_middleware)
 
 from app.api import endpoints, auth
 
+if DB_ASYNC:
+    # Async hot paths first; anything they don't cover falls through to the sync router
+    from app.api import async_endpoints
+    app.include_router(async_endpoints.router, prefix="/api/v1")
 app.include_router(endpoints.router, prefix="/api/v1")
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 
@@ -40,16 +44,66 @@ def health_check():
 # --- Discovery Beacon ---
 from app.core.discovery import ServiceBeacon
 from app.core.cleanup import MetricCleaner
+from app.core.ingest import metric_writer
+from app.core.registry import system_registry, HeartbeatFlusher, LivenessSweeper
+from app.core.history import metric_history
+from app.core.fleet import fleet_state
+from app.core.rollup import RollupCompactor
+from app.core.workers import MULTI_WORKER, LeaderElector
+from app.core.segments import segment_store, SegmentSealer
+from app.core.anomaly import anomaly_detector, BaselineCheckpointer
 
 beacon = ServiceBeacon()
 cleaner = MetricCleaner()
+heartbeat_flusher = HeartbeatFlusher(system_registry)
+liveness_sweeper = LivenessSweeper(system_registry)
+baseline_checkpointer = BaselineCheckpointer(anomaly_detector)
+compactor = RollupCompactor()
+sealer = SegmentSealer(segment_store) if segment_store.enabled else None
 
-@app.on_event("startup")
-async def startup_event():
+def start_leader_duties():
+    """Box-wide background work; in multi-worker mode only the lease holder runs it."""
+    liveness_sweeper.start()
     beacon.start()
     cleaner.start()
+    compactor.start()
+    if sealer:
+        sealer.start()
+
+leader_elector = LeaderElector(start_leader_duties) if MULTI_WORKER else None
+
+@app.on_event("startup")
+async def startup_event():
+    db = SessionLocal()
+    try:
+        system_registry.load(db)
+        anomaly_detector.load(db)
+        if not MULTI_WORKER:
+            # Per-process caches only see this worker's ingest, so multi-worker mode reads the DB instead
+            metric_history.warm(db, list(system_registry.last_seen))
+            fleet_state.load(db, metric_history.newest())
+    finally:
+        db.close()
+
+    # Every worker drains its own ingest queue and heartbeats, and checkpoints its own baselines
+    metric_writer.start()
+    heartbeat_flusher.start()
+    baseline_checkpointer.start()
+    if leader_elector:
+        leader_elector.start()
+    else:
+        start_leader_duties()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     beacon.stop()
     cleaner.stop()
+    compactor.stop()
+    if sealer:
+        sealer.stop()
+    metric_writer.stop()
+    liveness_sweeper.stop()
+    heartbeat_flusher.stop()
+    baseline_checkpointer.stop()
+    if leader_elector:
+        leader_elector.stop()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON, BigInteger
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, JSON, BigInteger, UniqueConstraint, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -45,12 +45,25 @@ class System(Base):
     python_version = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
     last_seen = Column(DateTime(timezone=True), nullable=True)
-    drivers = Column(JSON, nullable=True)
+    # Content hash of the driver list; lab machines built from one image share an inventory row
+    drivers_hash = Column(String(64), ForeignKey("driver_inventories.hash"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     alerts = relationship("Alert", back_populates="system", cascade="all, delete-orphan")
     metrics = relationship("Metric", back_populates="system", cascade="all, delete-orphan")
     tickets = relationship("Ticket", back_populates="system", cascade="all, delete-orphan")
+    rollups = relationship("MetricRollup", back_populates="system", cascade="all, delete-orphan")
+    process_samples = relationship("ProcessSample", cascade="all, delete-orphan")
+    anomaly_baselines = relationship("AnomalyBaseline", cascade="all, delete-orphan")
+
+class DriverInventory(Base):
+    """A distinct driver list, stored once and keyed by the SHA-256 of its canonical JSON."""
+    __tablename__ = "driver_inventories"
+
+    hash = Column(String(64), primary_key=True)
+    driver_count = Column(Integer, nullable=False)
+    drivers = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 class Alert(Base):
     __tablename__ = "alerts"
@@ -67,13 +80,25 @@ class Alert(Base):
 
 class Metric(Base):
     __tablename__ = "metrics"
+    __table_args__ = (
+        # Per-system range scans; also created for existing databases by migrate_db.py
+        Index("ix_metrics_system_id_timestamp", "system_id", "timestamp"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     system_id = Column(Integer, ForeignKey("systems.id"))
     timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     cpu_usage = Column(Float)
+    cpu_per_core = Column(LargeBinary, nullable=True)  # Packed little-endian float32, see app/core/packing.py
+    memory_total = Column(BigInteger, nullable=True)
     memory_percent = Column(Float)
     memory_used = Column(BigInteger) # Added for tracking used memory bytes
+    memory_available = Column(BigInteger, nullable=True)
+    swap_total = Column(BigInteger, nullable=True)
+    swap_used = Column(BigInteger, nullable=True)
+    swap_percent = Column(Float, nullable=True)
+    disk_total = Column(BigInteger, nullable=True)
+    disk_used = Column(BigInteger, nullable=True)
     disk_free = Column(BigInteger)
     disk_usage = Column(Float)
     
@@ -84,14 +109,89 @@ class Metric(Base):
     # Network
     network_sent = Column(BigInteger)
     network_recv = Column(Float)
+    network_packets_sent = Column(BigInteger, nullable=True)
+    network_packets_recv = Column(BigInteger, nullable=True)
     process_count = Column(Integer)
     boot_time = Column(String, nullable=True)
     uptime_seconds = Column(Integer, nullable=True)
     uptime_human = Column(String, nullable=True)
-    top_processes = Column(JSON, nullable=True)
 
     system = relationship("System", back_populates="metrics")
 
+class ProcessName(Base):
+    """Interned process names, so process samples store a small integer instead of the string."""
+    __tablename__ = "process_names"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)
+
+class ProcessSample(Base):
+    """One process of a top-N snapshot; snapshots are written only when the top processes change."""
+    __tablename__ = "process_samples"
+    __table_args__ = (
+        Index("ix_process_samples_system_id_timestamp", "system_id", "timestamp"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    system_id = Column(Integer, ForeignKey("systems.id"), nullable=False)
+    timestamp = Column(DateTime(timezone=True), nullable=False)
+    rank = Column(Integer, nullable=False)  # Position in the agent's list, 0 = busiest
+    name_id = Column(Integer, ForeignKey("process_names.id"), nullable=False)
+    pid = Column(Integer)
+    cpu_percent = Column(Float)
+    memory_percent = Column(Float)
+
+class MetricRollup(Base):
+    """min/max/avg/last of the headline gauges per system per time bucket."""
+    __tablename__ = "metric_rollups"
+    __table_args__ = (
+        UniqueConstraint("system_id", "resolution", "bucket_start", name="uq_metric_rollups_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    system_id = Column(Integer, ForeignKey("systems.id"), index=True)
+    resolution = Column(Integer, nullable=False)  # Bucket width in seconds (60, 300, 3600)
+    bucket_start = Column(DateTime(timezone=True), nullable=False, index=True)
+    sample_count = Column(Integer, nullable=False)
+
+    cpu_min = Column(Float)
+    cpu_max = Column(Float)
+    cpu_avg = Column(Float)
+    cpu_last = Column(Float)
+    memory_min = Column(Float)
+    memory_max = Column(Float)
+    memory_avg = Column(Float)
+    memory_last = Column(Float)
+    disk_min = Column(Float)
+    disk_max = Column(Float)
+    disk_avg = Column(Float)
+    disk_last = Column(Float)
+
+    system = relationship("System", back_populates="rollups")
+
+class RollupLateBucket(Base):
+    """A 1-minute bucket that received samples after it may already have been rolled up."""
+    __tablename__ = "rollup_late_buckets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    system_id = Column(Integer, nullable=False)  # No foreign key: marks of deleted systems just refold to nothing
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+
+class AnomalyBaseline(Base):
+    """Checkpoint of one system's EWMA baseline for one gauge (see app/core/anomaly.py)."""
+    __tablename__ = "anomaly_baselines"
+    __table_args__ = (
+        UniqueConstraint("system_id", "metric", name="uq_anomaly_baselines_metric"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    system_id = Column(Integer, ForeignKey("systems.id"), nullable=False)
+    metric = Column(String, nullable=False)  # Gauge label: CPU, Memory, Disk
+    mean = Column(Float, nullable=False)
+    variance = Column(Float, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    updated_at = Column(DateTime(timezone=True))
+
 class Ticket(Base):
     __tablename__ = "tickets"
 
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List, Any
+from pydantic import BaseModel, Field, ConfigDict, create_model, model_validator
+from typing import Optional, List, Any, Dict
 from datetime import datetime, timezone
 
 # --- User/Auth Schemas ---
@@ -52,10 +52,10 @@ class SystemBase(BaseModel):
     battery_percent: Optional[float] = None
     is_plugged_in: Optional[bool] = None
     python_version: Optional[str] = None
-    drivers: Optional[List[Any]] = None
 
 class SystemCreate(SystemBase):
-    pass
+    # Stored separately, see GET /systems/{id}/drivers
+    drivers: Optional[List[Any]] = None
 
 class SystemUpdate(BaseModel):
     ip_address: Optional[str] = None
@@ -70,6 +70,7 @@ class System(SystemBase):
     id: int
     is_active: bool
     last_seen: Optional[datetime] = None
+    drivers_hash: Optional[str] = None
     created_at: datetime
 
 # --- Metric Schemas ---
@@ -109,6 +110,71 @@ class Metric(MetricBase):
     model_config = ConfigDict(from_attributes=True)
     id: int
 
+class MetricBatch(BaseModel):
+    # Samples may come from several systems and carry their own agent timestamps
+    metrics: List[MetricCreate] = Field(..., min_length=1, max_length=5000)
+
+# Every metric field optional: delta frames carry only what changed.
+# Defaults are not validated, so required fields still reject an explicit null.
+MetricFields = create_model(
+    "MetricFields",
+    **{name: (field.annotation, None) for name, field in MetricBase.model_fields.items() if name != "system_id"}
+)
+
+# Monotonic counters an agent may send as the increase since its previous frame
+COUNTER_FIELDS = (
+    "disk_read_bytes", "disk_write_bytes", "network_sent", "network_recv",
+    "network_packets_sent", "network_packets_recv", "uptime_seconds",
+)
+
+REQUIRED_METRIC_FIELDS = tuple(
+    name for name, field in MetricBase.model_fields.items() if field.is_required() and name != "system_id"
+)
+
+class MetricDelta(BaseModel):
+    """
+    One frame of the delta upload protocol. A keyframe carries a full sample;
+    later frames carry only changed fields plus counter increases, and must
+    follow the previous frame's seq exactly.
+    """
+    system_id: int
+    seq: int
+    keyframe: bool = False
+    fields: MetricFields = Field(default_factory=MetricFields)
+    counters: Dict[str, int] = Field(default_factory=dict)
+
+    @model_validator(mode="after")
+    def check_frame(self):
+        unknown = set(self.counters) - set(COUNTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Not counter fields: {sorted(unknown)}")
+        if self.keyframe:
+            missing = [name for name in REQUIRED_METRIC_FIELDS if name not in self.fields.model_fields_set]
+            if missing or self.counters:
+                raise ValueError(f"Keyframes need every required field and no counters (missing: {missing})")
+        return self
+
+# --- Fleet Schemas ---
+
+class FleetSystem(BaseModel):
+    id: int
+    hostname: str
+    user_label: Optional[str] = None
+    ip_address: Optional[str] = None
+    os_info: Optional[str] = None
+    is_active: bool
+    last_seen: Optional[datetime] = None
+    cpu_usage: Optional[float] = None
+    memory_percent: Optional[float] = None
+    disk_usage: Optional[float] = None
+    sample_time: Optional[datetime] = None
+    open_alerts: int
+    critical_alerts: int
+
+class FleetOverview(BaseModel):
+    generated_at: datetime
+    systems: List[FleetSystem]
+
 # --- Alert Schemas ---
 
 class AlertBase(BaseModel):
@@ -0,0 +1,116 @@
+"""
+Benchmark for the two metric storage engines.
+
+Writes the same samples (100 systems x 1 hour at 1-second cadence, in
+5-second ingest batches like the write-behind writer) into a scratch SQLite
+metrics table and into a SegmentStore, then times the history reads the
+API serves: the newest 100 samples and a 10-minute range for every system,
+each shaped into response dicts the way the history endpoint does. Then
+seals the segments into compressed chunks and repeats the range read.
+Needs numpy. Run from backend/:
+
+    python -m benchmarks.metrics_engine_bench
+"""
+import os
+import time
+import tempfile
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.models import models
+from app.core.packing import pack_floats, unpack_floats
+from app.core.fastjson import rows_as_dicts
+from app.core.segments import SegmentStore, CHUNK_CACHE_SIZE
+
+SYSTEMS = 100
+SECONDS = 3600
+BATCH_SECONDS = 5
+
+def sample_rows(start: datetime, second: int) -> list:
+    return [
+        {"system_id": i, "timestamp": start + timedelta(seconds=second), "cpu_usage": 12.5 + second % 7,
+         "cpu_per_core": pack_floats([10.0, 15.0, 12.5, 12.5]), "memory_total": 16 * 1024 ** 3,
+         "memory_percent": 48.0, "memory_used": 8 * 1024 ** 3, "disk_usage": 61.0, "disk_free": 10 ** 11,
+         "disk_read_bytes": second * 4096, "disk_write_bytes": second * 8192, "network_sent": second * 1000,
+         "network_recv": second * 2000, "process_count": 180, "boot_time": "2026-10-01T08:00:00",
+         "uptime_seconds": second, "uptime_human": "0h 1m"}
+        for i in range(1, SYSTEMS + 1)
+    ]
+
+def batches(start: datetime):
+    for first in range(0, SECONDS, BATCH_SECONDS):
+        yield [row for second in range(first, first + BATCH_SECONDS) for row in sample_rows(start, second)]
+
+def timed(fn) -> float:
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+def directory_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def run(tmp: str):
+    start = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+    window = (start + timedelta(minutes=25), start + timedelta(minutes=35))
+
+    db_path = os.path.join(tmp, "bench.db")
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    store = SegmentStore(os.path.join(tmp, "segments"), enabled=True)
+
+    def sql_write():
+        for batch in batches(start):
+            db.execute(insert(models.Metric), batch)
+            db.commit()
+
+    def segment_write():
+        for batch in batches(start):
+            store.append(batch)
+
+    columns = list(models.Metric.__table__.columns)
+
+    def sql_query(limit, range_start=None, range_end=None):
+        for i in range(1, SYSTEMS + 1):
+            query = db.query(*columns).filter(models.Metric.system_id == i)
+            if range_start:
+                query = query.filter(models.Metric.timestamp >= range_start, models.Metric.timestamp < range_end)
+            metrics = rows_as_dicts(query.order_by(models.Metric.timestamp.desc()).limit(limit).all(), columns)
+            for metric in metrics:
+                metric["cpu_per_core"] = unpack_floats(metric["cpu_per_core"])
+
+    def segment_query(limit, range_start=None, range_end=None):
+        for i in range(1, SYSTEMS + 1):
+            store.history(i, limit, range_start, range_end)
+
+    try:
+        rows = SYSTEMS * SECONDS
+        results = {
+            "write": (timed(sql_write), timed(segment_write)),
+            "newest 100": (timed(lambda: sql_query(100)), timed(lambda: segment_query(100))),
+            "10-min range": (timed(lambda: sql_query(1000, *window)), timed(lambda: segment_query(1000, *window))),
+        }
+        print(f"--- {SYSTEMS} systems x {SECONDS} samples ({rows:,} rows) ---")
+        for label, (sql_s, segment_s) in results.items():
+            print(f"{label + ':':<16}sql {sql_s * 1000:9.1f} ms   segments {segment_s * 1000:9.1f} ms ({sql_s / segment_s:.1f}x)")
+        print(f"{'write rate:':<16}sql {rows / results['write'][0]:9,.0f} /s    segments {rows / results['write'][1]:9,.0f} /s")
+        raw_bytes = directory_bytes(store.root)
+        print(f"{'disk bytes:':<16}sql {os.path.getsize(db_path):,}   segments {raw_bytes:,}")
+
+        seal_s = timed(lambda: store.seal(now=start + timedelta(hours=2)))
+        sealed_bytes = directory_bytes(store.root)
+        print(f"--- sealed into chunks in {seal_s * 1000:.0f} ms ---")
+        print(f"{'disk bytes:':<16}{sealed_bytes:,} ({raw_bytes / sealed_bytes:.1f}x smaller than raw, "
+              f"{os.path.getsize(db_path) / sealed_bytes:.1f}x smaller than sql)")
+        # More systems than the decoded-chunk cache holds, so every read decodes
+        cold = timed(lambda: segment_query(1000, *window))
+        print(f"{'10-min range:':<16}{cold * 1000:.1f} ms decoding {SYSTEMS} chunks "
+              f"(cache holds {CHUNK_CACHE_SIZE})")
+    finally:
+        db.close()
+        engine.dispose()
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        run(tmp)
@@ -0,0 +1,52 @@
+"""
+Micro-benchmark for the rate limiter.
+
+Replays 10,000 requests per simulated second from a 500-agent lab (plus
+one-off clients) through RateLimiter.check and, for multi-worker mode,
+SharedRateLimiter.check. Reports the cost per request. Run from backend/:
+
+    python -m benchmarks.rate_limiter_bench
+"""
+import os
+import time
+import random
+import tempfile
+from app.core.rate_limiter import RateLimiter, SharedRateLimiter
+
+REQUESTS_PER_SECOND = 10000
+SIMULATED_SECONDS = 10
+AGENTS = 500
+CHURN_PER_SECOND = 50  # New one-off clients per second, to exercise eviction
+
+def run(label: str, limiter):
+    rng = random.Random(42)
+    keys = [f"10.0.{i // 250}.{i % 250}|lab-pc-{i:03d}" for i in range(AGENTS)]
+
+    # Pre-build the request stream so only the limiter is timed
+    stream = []
+    for second in range(SIMULATED_SECONDS):
+        for i in range(REQUESTS_PER_SECOND):
+            now = second + i / REQUESTS_PER_SECOND
+            if i % (REQUESTS_PER_SECOND // CHURN_PER_SECOND) == 0:
+                stream.append((f"one-off-{second}-{i}", now))
+            else:
+                stream.append((rng.choice(keys), now))
+
+    check = limiter.check
+    started = time.perf_counter()
+    allowed = 0
+    for key, now in stream:
+        allowed += check(key, now)[0]
+    elapsed = time.perf_counter() - started
+
+    per_request_us = elapsed / len(stream) * 1e6
+    print(f"--- {label} ---")
+    print(f"requests:           {len(stream):,}")
+    print(f"allowed:            {allowed:,}")
+    print(f"per request:        {per_request_us:.2f} us")
+    print(f"share of 1 core at {REQUESTS_PER_SECOND:,} req/s: {per_request_us * REQUESTS_PER_SECOND / 1e4:.2f}%")
+
+if __name__ == "__main__":
+    run("in-process", RateLimiter(rate=20, burst=100, idle_ttl=5))
+    with tempfile.TemporaryDirectory() as tmp:
+        run("shared (multi-worker)", SharedRateLimiter(os.path.join(tmp, "bench.db"), "agent", rate=20, burst=100, idle_ttl=5))
@@ -0,0 +1,110 @@
+"""
+Benchmark for list endpoint serialization.
+
+Fills a scratch SQLite database with 1,000 systems x 100 metrics and
+times the old response path (ORM objects, response_model validation /
+jsonable_encoder, stdlib json) against the column-tuple + FastJSONResponse
+path the endpoints now use, for GET /systems?limit=1000 and
+GET /metrics/{id}?limit=100 from the database for every system. Also
+checks both paths produce the same JSON. Run from backend/:
+
+    python -m benchmarks.serialization_bench
+"""
+import os
+import json
+import time
+import tempfile
+from datetime import datetime, timedelta, timezone
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.models import models
+from app.schemas import schemas
+from app.core import fastjson
+from app.core.fastjson import schema_columns, rows_as_dicts
+
+SYSTEMS = 1000
+METRICS_PER_SYSTEM = 100
+
+def stdlib_dumps(content) -> bytes:
+    # What JSONResponse.render does
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def fill(db):
+    now = datetime.now(timezone.utc)
+    db.execute(insert(models.System), [
+        {"id": i, "hostname": f"lab-pc-{i:04d}", "ip_address": f"10.0.{i // 250}.{i % 250}",
+         "os_info": "Windows 11", "cpu_name": "Intel Core i5", "cpu_cores": 6, "total_memory_gb": 16.0,
+         "is_active": True, "last_seen": now}
+        for i in range(1, SYSTEMS + 1)
+    ])
+    db.execute(insert(models.Metric), [
+        {"system_id": i, "timestamp": now - timedelta(seconds=5 * n), "cpu_usage": 12.5, "memory_percent": 48.0,
+         "memory_used": 8 * 1024 ** 3, "disk_usage": 61.0, "network_sent": 10 ** 9, "network_recv": 2 * 10 ** 9,
+         "process_count": 180, "boot_time": "2026-10-01 08:00:00"}
+        for i in range(1, SYSTEMS + 1) for n in range(METRICS_PER_SYSTEM)
+    ])
+    db.commit()
+
+def timed(fn):
+    started = time.perf_counter()
+    bodies = fn()
+    return bodies, time.perf_counter() - started
+
+def report(label: str, old, new):
+    """Each path returns a list of response bodies."""
+    (old_bodies, old_s), (new_bodies, new_s) = old, new
+    print(f"--- {label} ---")
+    print(f"response bytes:     {sum(map(len, old_bodies)):,} -> {sum(map(len, new_bodies)):,}")
+    print(f"old path:           {old_s * 1000:.1f} ms")
+    print(f"new path:           {new_s * 1000:.1f} ms ({old_s / new_s:.1f}x)")
+    print(f"same JSON:          {[json.loads(b) for b in old_bodies] == [json.loads(b) for b in new_bodies]}")
+
+def run(db):
+    systems_adapter = TypeAdapter(List[schemas.System])
+    system_columns = schema_columns(models.System, schemas.System)
+    metric_columns = list(models.Metric.__table__.columns)
+
+    def old_systems():
+        systems = db.query(models.System).limit(SYSTEMS).all()
+        return [stdlib_dumps(systems_adapter.dump_python(systems_adapter.validate_python(systems, from_attributes=True), mode="json"))]
+
+    def new_systems():
+        return [fastjson.dumps(rows_as_dicts(db.query(*system_columns).limit(SYSTEMS).all(), system_columns))]
+
+    def metric_query(*entities, system_id):
+        return db.query(*entities).filter(models.Metric.system_id == system_id)\
+            .order_by(models.Metric.timestamp.desc()).limit(METRICS_PER_SYSTEM)
+
+    def old_history():
+        return [stdlib_dumps(jsonable_encoder(metric_query(models.Metric, system_id=i).all()))
+                for i in range(1, SYSTEMS + 1)]
+
+    def new_history():
+        return [fastjson.dumps(rows_as_dicts(metric_query(*metric_columns, system_id=i).all(), metric_columns))
+                for i in range(1, SYSTEMS + 1)]
+
+    # The session's identity map would make later ORM runs cheaper; time each path from a clean session
+    for label, old_path, new_path in (
+        (f"GET /systems?limit={SYSTEMS}", old_systems, new_systems),
+        (f"GET /metrics/{{id}}?limit={METRICS_PER_SYSTEM}, all {SYSTEMS} systems", old_history, new_history),
+    ):
+        old = timed(old_path)
+        db.expunge_all()
+        report(label, old, timed(new_path))
+    print(f"encoder:            {'orjson' if fastjson.orjson else 'stdlib json'}")
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            fill(db)
+            run(db)
+        finally:
+            db.close()
+            engine.dispose()
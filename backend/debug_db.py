@@ -8,10 +8,10 @@ def check_db():
         columns = [info[1] for info in cursor.fetchall()]
         print(f"Columns in 'systems': {columns}")
         
-        if 'drivers' in columns:
-            print("✅ 'drivers' column EXISTS.")
+        if 'drivers_hash' in columns:
+            print("✅ 'drivers_hash' column EXISTS.")
         else:
-            print("❌ 'drivers' column MISSING.")
+            print("❌ 'drivers_hash' column MISSING. Run migrate_db.py.")
             
         conn.close()
     except Exception as e:
@@ -1,4 +1,6 @@
+import json
 import sqlite3
+from app.core.drivers import canonical_inventory
 
 def migrate():
     conn = None # Initialize conn to None
@@ -6,17 +8,38 @@ def migrate():
         conn = sqlite3.connect('resource_monitor.db')
         cursor = conn.cursor()
         
-        # 1. Add 'drivers' to 'systems' table
-        print("Checking for 'drivers' column in 'systems'...")
+        # 1. Move 'systems.drivers' into content-addressed 'driver_inventories'
+        print("Checking for 'drivers_hash' column in 'systems'...")
+        cursor.execute(
+            "CREATE TABLE IF NOT EXISTS driver_inventories ("
+            "hash VARCHAR(64) PRIMARY KEY, driver_count INTEGER NOT NULL, "
+            "drivers JSON NOT NULL, created_at DATETIME DEFAULT (CURRENT_TIMESTAMP))"
+        )
         cursor.execute("PRAGMA table_info(systems)")
         columns = [info[1] for info in cursor.fetchall()]
-        if 'drivers' not in columns:
-            print("Adding 'drivers' column...")
-            cursor.execute("ALTER TABLE systems ADD COLUMN drivers JSON")
+        if 'drivers_hash' not in columns:
+            print("Adding 'drivers_hash' column...")
+            cursor.execute("ALTER TABLE systems ADD COLUMN drivers_hash VARCHAR(64) REFERENCES driver_inventories (hash)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS ix_systems_drivers_hash ON systems (drivers_hash)")
             conn.commit()
-            print("Added 'drivers' column.")
+            print("Added 'drivers_hash' column.")
         else:
-            print("'drivers' column already exists.")
+            print("'drivers_hash' column already exists.")
+
+        if 'drivers' in columns:
+            cursor.execute("SELECT id, drivers FROM systems WHERE drivers IS NOT NULL")
+            moved = 0
+            for system_id, drivers in cursor.fetchall():
+                digest, ordered = canonical_inventory(json.loads(drivers))
+                cursor.execute(
+                    "INSERT OR IGNORE INTO driver_inventories (hash, driver_count, drivers) VALUES (?, ?, ?)",
+                    (digest, len(ordered), json.dumps(ordered))
+                )
+                cursor.execute("UPDATE systems SET drivers_hash = ?, drivers = NULL WHERE id = ?", (digest, system_id))
+                moved += 1
+            conn.commit()
+            cursor.execute("SELECT COUNT(*) FROM driver_inventories")
+            print(f"Moved {moved} driver lists into {cursor.fetchone()[0]} distinct inventories.")
 
         # 2. Add 'memory_used' to 'metrics' table
         print("Checking for 'memory_used' column in 'metrics'...")
@@ -39,6 +62,26 @@ def migrate():
         else:
             print("'disk_free' column already exists.")
 
+        # 4. Metric fields the agent always sent but the backend used to drop
+        for column, column_type in (
+            ("cpu_per_core", "BLOB"), ("memory_total", "BIGINT"), ("memory_available", "BIGINT"),
+            ("swap_total", "BIGINT"), ("swap_used", "BIGINT"), ("swap_percent", "FLOAT"),
+            ("disk_total", "BIGINT"), ("disk_used", "BIGINT"),
+            ("network_packets_sent", "BIGINT"), ("network_packets_recv", "BIGINT"),
+        ):
+            if column not in metric_columns:
+                print(f"Adding '{column}' column...")
+                cursor.execute(f"ALTER TABLE metrics ADD COLUMN {column} {column_type}")
+                conn.commit()
+
+        # 5. Composite (system_id, timestamp) index for per-system range queries
+        print("Ensuring 'ix_metrics_system_id_timestamp' index on 'metrics'...")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS ix_metrics_system_id_timestamp "
+            "ON metrics (system_id, timestamp)"
+        )
+        conn.commit()
+
         print("✅ Migration checks complete.")
 
     except sqlite3.OperationalError as e:
@@ -1,10 +1,19 @@
 import React, { useEffect, useState } from 'react';
 import { Link } from 'react-router-dom';
-import { getSystems, getAlerts } from '../services/api';
+import { getSystems, getFleetOverview, getAlerts, subscribeEvents } from '../services/api';
 import { Activity, AlertTriangle, Clock, Cpu, HardDrive, MemoryStick, Copy, Check, Settings } from 'lucide-react';
 import LoadingSkeleton from '../components/LoadingSkeleton';
 import AlertConfigModal from '../components/AlertConfigModal';
 
+// Live events keep the page current; this slow poll only reconciles anything missed
+const RECONCILE_INTERVAL_MS = 30000;
+
+// Overview rows win for the fields they carry; hardware specs come from the one-time /systems load
+const mergeOverview = (prev, overview) => {
+    const known = new Map(prev.map(s => [s.id, s]));
+    return overview.systems.map(row => ({ ...known.get(row.id), ...row }));
+};
+
 const Dashboard = () => {
     const [systems, setSystems] = useState([]);
     const [alerts, setAlerts] = useState([]);
@@ -16,18 +25,58 @@ const Dashboard = () => {
     const serverUrl = `${window.location.protocol}//${window.location.hostname}:8000`;
 
     useEffect(() => {
+        getSystems()
+            .then(systemsData => setSystems(prev => {
+                const live = new Map(prev.map(s => [s.id, s]));
+                return systemsData.map(s => ({ ...s, ...live.get(s.id) }));
+            }))
+            .catch(error => console.error("Error fetching systems:", error));
         fetchData();
-        const interval = setInterval(fetchData, 1000);
-        return () => clearInterval(interval);
+        const unsubscribe = subscribeEvents(null, {
+            metric: (m) => setSystems(prev => prev.map(s =>
+                s.id === m.system_id ? {
+                    ...s, is_active: true, last_seen: m.timestamp,
+                    cpu_usage: m.cpu_usage, memory_percent: m.memory_percent, disk_usage: m.disk_usage
+                } : s
+            )),
+            system: (event) => setSystems(prev => {
+                if (event.action === 'deleted') return prev.filter(s => s.id !== event.id);
+                const { action, ...system } = event;
+                if (prev.some(s => s.id === system.id)) {
+                    return prev.map(s => s.id === system.id ? { ...s, ...system } : s);
+                }
+                // Status events only carry is_active; wait for the full record
+                return action === 'status' ? prev : [...prev, system];
+            }),
+            alert: (event) => {
+                const { action, ...alert } = event;
+                setAlerts(prev => {
+                    const others = prev.filter(a => a.id !== alert.id);
+                    return action === 'resolved' ? others : [...others, alert];
+                });
+                const delta = action === 'resolved' ? -1 : 1;
+                const critical = alert.severity === 'Critical' ? delta : 0;
+                setSystems(prev => prev.map(s => s.id === alert.system_id ? {
+                    ...s,
+                    open_alerts: Math.max((s.open_alerts || 0) + delta, 0),
+                    critical_alerts: Math.max((s.critical_alerts || 0) + critical, 0)
+                } : s));
+            },
+        });
+        const interval = setInterval(fetchData, RECONCILE_INTERVAL_MS);
+        return () => {
+            unsubscribe();
+            clearInterval(interval);
+        };
     }, []);
 
     const fetchData = async () => {
         try {
-            const [systemsData, alertsData] = await Promise.all([
-                getSystems(),
+            const [overview, alertsData] = await Promise.all([
+                getFleetOverview(),
                 getAlerts(false)
             ]);
-            setSystems(systemsData);
+            setSystems(prev => mergeOverview(prev, overview));
             setAlerts(alertsData);
             setLoading(false);
         } catch (error) {
@@ -165,6 +214,31 @@ const Dashboard = () => {
                                 </div>
                             )}
 
+                            {system.cpu_usage != null && (
+                                <div className="system-specs">
+                                    <div className="spec-item" title="Latest CPU usage">
+                                        <span className="spec-label"><Cpu size={12} /> CPU</span>
+                                        <span className="spec-value">{system.cpu_usage.toFixed(1)}%</span>
+                                    </div>
+                                    {system.memory_percent != null && (
+                                        <div className="spec-item" title="Latest memory usage">
+                                            <span className="spec-label"><MemoryStick size={12} /> Memory</span>
+                                            <span className="spec-value">{system.memory_percent.toFixed(1)}%</span>
+                                        </div>
+                                    )}
+                                    <div className="spec-item" title="Latest disk usage">
+                                        <span className="spec-label"><HardDrive size={12} /> Disk</span>
+                                        <span className="spec-value">{system.disk_usage.toFixed(1)}%</span>
+                                    </div>
+                                    {system.open_alerts > 0 && (
+                                        <div className="spec-item" title="Open alerts (critical)">
+                                            <span className="spec-label"><AlertTriangle size={12} /> Alerts</span>
+                                            <span className="spec-value">{system.open_alerts} ({system.critical_alerts})</span>
+                                        </div>
+                                    )}
+                                </div>
+                            )}
+
                             <div className="last-seen">
                                 <Clock size={14} />
                                 <span>Last seen: {formatDate(system.last_seen)}</span>
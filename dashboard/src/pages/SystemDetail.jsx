@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, Link, useNavigate } from 'react-router-dom';
-import { getSystem, getMetrics, deleteSystem, getTickets, updateTicketStatus, exportMetrics } from '../services/api';
+import { getSystem, getSystemDrivers, getSystemProcesses, getMetrics, deleteSystem, getTickets, updateTicketStatus, exportMetrics, subscribeEvents } from '../services/api';
 import { Line, Doughnut } from 'react-chartjs-2';
 import {
     Chart as ChartJS,
@@ -65,6 +65,10 @@ const chartOptions = {
 
 
 
+// Samples kept for the charts, and the slow poll that reconciles anything the live stream missed
+const HISTORY_LENGTH = 100;
+const RECONCILE_INTERVAL_MS = 30000;
+
 const SystemDetail = () => {
     const { id } = useParams();
     const navigate = useNavigate();
@@ -74,14 +78,49 @@ const SystemDetail = () => {
     const [loading, setLoading] = useState(true);
     const [processingTicket, setProcessingTicket] = useState(null);
     const [showDriverList, setShowDriverList] = useState(false);
+    const [drivers, setDrivers] = useState({ hash: undefined, list: [] });
     const [showAlertConfig, setShowAlertConfig] = useState(false);
+    const [topProcesses, setTopProcesses] = useState(null);
 
     useEffect(() => {
         fetchData();
-        const interval = setInterval(fetchData, 1000);
-        return () => clearInterval(interval);
+        const unsubscribe = subscribeEvents(id, {
+            metric: (m) => {
+                setMetrics(prev => [...prev, m].slice(-HISTORY_LENGTH));
+                // Live samples carry the agent's current top processes
+                if (m.top_processes) setTopProcesses(m.top_processes);
+            },
+            ticket: (event) => setTickets(prev => {
+                const { action, ...ticket } = event;
+                return action === 'created'
+                    ? [ticket, ...prev.filter(t => t.id !== ticket.id)]
+                    : prev.map(t => t.id === ticket.id ? ticket : t);
+            }),
+            system: (event) => {
+                if (event.action === 'deleted') {
+                    navigate('/');
+                    return;
+                }
+                const { action, ...update } = event;
+                setSystem(prev => prev ? { ...prev, ...update } : prev);
+            },
+        });
+        const interval = setInterval(fetchData, RECONCILE_INTERVAL_MS);
+        return () => {
+            unsubscribe();
+            clearInterval(interval);
+        };
     }, [id]);
 
+    // The driver inventory is only downloaded when the list is opened, and again only if its hash changed
+    const driversHash = system ? system.drivers_hash : undefined;
+    useEffect(() => {
+        if (!showDriverList || driversHash === undefined || drivers.hash === driversHash) return;
+        getSystemDrivers(id)
+            .then(list => setDrivers({ hash: driversHash, list }))
+            .catch(err => console.warn("Failed to fetch drivers:", err));
+    }, [showDriverList, driversHash]);
+
     const fetchData = async () => {
         try {
             // Fetch System Details first (CRITICAL)
@@ -96,7 +135,7 @@ const SystemDetail = () => {
 
             // Fetch Metrics (Non-critical)
             try {
-                const metricsData = await getMetrics(id, 100);
+                const metricsData = await getMetrics(id, HISTORY_LENGTH);
                 if (Array.isArray(metricsData)) {
                     setMetrics(metricsData.reverse());
                 }
@@ -104,6 +143,14 @@ const SystemDetail = () => {
                 console.warn("Failed to fetch metrics (non-critical):", err);
             }
 
+            // Fetch current Top Processes (Non-critical)
+            try {
+                const [snapshot] = await getSystemProcesses(id);
+                if (snapshot) setTopProcesses(snapshot.processes);
+            } catch (err) {
+                console.warn("Failed to fetch processes (non-critical):", err);
+            }
+
             // Fetch Tickets (Non-critical)
             try {
                 const ticketsData = await getTickets(id);
@@ -504,8 +551,8 @@ const SystemDetail = () => {
             </div>
 
             {/* Top Processes */}
-            {latestMetric && latestMetric.top_processes && (
-                <ProcessList processes={latestMetric.top_processes} />
+            {topProcesses && (
+                <ProcessList processes={topProcesses} />
             )}
 
             {/* Support Tickets */}
@@ -611,7 +658,7 @@ const SystemDetail = () => {
             <DriverListModal
                 isOpen={showDriverList}
                 onClose={() => setShowDriverList(false)}
-                drivers={system.drivers || []}
+                drivers={drivers.list}
             />
         </div>
     );
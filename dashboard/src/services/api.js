@@ -60,19 +60,38 @@ export const getSystem = async (systemId) => {
   return response.data;
 };
 
+// Driver inventory, fetched on demand (not part of the systems payload)
+export const getSystemDrivers = async (systemId) => {
+  const response = await api.get(`/systems/${systemId}/drivers`);
+  return response.data;
+};
+
+// Top-process snapshots, newest first (limit=1 gives the current one)
+export const getSystemProcesses = async (systemId, limit = 1) => {
+  const response = await api.get(`/systems/${systemId}/processes`, { params: { limit } });
+  return response.data;
+};
+
 export const deleteSystem = async (systemId) => {
   const response = await api.delete(`/systems/${systemId}`);
   return response.data;
 };
 
+// Fleet overview: identity, online state, latest sample and open alert counts per system
+export const getFleetOverview = async () => {
+  const response = await api.get('/fleet/overview');
+  return response.data;
+};
+
 // Metrics
 export const getMetrics = async (systemId, limit = 100) => {
   const response = await api.get(`/metrics/${systemId}?limit=${limit}`);
   return response.data;
 };
 
-export const exportMetrics = async (systemId) => {
+export const exportMetrics = async (systemId, format = 'csv') => {
   const response = await api.get(`/metrics/${systemId}/export`, {
+    params: { format },
     responseType: 'blob', // Important for file download
   });
   return response; // Return full response to access headers if needed, or just data
@@ -115,4 +134,15 @@ export const updateAlertSettings = async (settings, systemId = null) => {
   return response.data;
 };
 
+// Live updates (Server-Sent Events)
+// handlers: { metric, alert, ticket, system } -> callback(parsedEventData)
+export const subscribeEvents = (systemId, handlers) => {
+  const url = systemId ? `${API_URL}/stream?system_id=${systemId}` : `${API_URL}/stream`;
+  const source = new EventSource(url);
+  Object.entries(handlers).forEach(([type, handler]) => {
+    source.addEventListener(type, (event) => handler(JSON.parse(event.data)));
+  });
+  return () => source.close();
+};
+
 export default api;
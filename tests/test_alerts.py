@@ -0,0 +1,244 @@
+"""
+Alert Path Tests for Resource Monitoring System
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from app.main import app
+from app.db.database import engine, SessionLocal
+from app.core.alerts import check_thresholds, alert_cache, AlertStateCache
+from app.core.anomaly import AnomalyDetector, anomaly_detector, WARMUP_SAMPLES, STREAK
+from app.models import models
+from app.schemas import schemas
+
+client = TestClient(app)
+
+TEST_API_KEY = "secret-agent-key"
+
+
+def make_metric(system_id: int, cpu: float = 10.0) -> schemas.MetricCreate:
+    return schemas.MetricCreate(
+        system_id=system_id, cpu_usage=cpu, memory_total=1000, memory_used=100,
+        disk_usage=10.0, network_sent=0, network_recv=0
+    )
+
+
+def count_statements(fn) -> int:
+    """Runs fn and returns how many SQL statements it sent to the engine."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        fn()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return len(statements)
+
+
+class AfterRead:
+    """Session stand-in that runs `callback` once, right after the first query has read its rows."""
+
+    def __init__(self, db, callback):
+        self.db = db
+        self.callbacks = [callback]
+
+    def query(self, *entities):
+        return _ReadHook(self.db.query(*entities), self.callbacks)
+
+
+class _ReadHook:
+    def __init__(self, query, callbacks):
+        self.query, self.callbacks = query, callbacks
+
+    def filter(self, *criteria):
+        return _ReadHook(self.query.filter(*criteria), self.callbacks)
+
+    def _after(self, result):
+        while self.callbacks:
+            self.callbacks.pop()()
+        return result
+
+    def all(self):
+        return self._after(self.query.all())
+
+    def first(self):
+        return self._after(self.query.first())
+
+
+@pytest.fixture
+def system_id():
+    response = client.post(
+        "/api/v1/systems/register",
+        headers={"X-API-Key": TEST_API_KEY},
+        json={"hostname": "alert-test-system"}
+    )
+    return response.json()["id"]
+
+
+class TestAlertCache:
+    """check_thresholds should be served from alert_cache."""
+
+    def test_healthy_sample_touches_db_zero_times(self, system_id):
+        db = SessionLocal()
+        try:
+            check_thresholds(make_metric(system_id), db)  # warms the cache
+            assert count_statements(lambda: check_thresholds(make_metric(system_id), db)) == 0
+        finally:
+            db.close()
+
+    def test_open_alert_not_duplicated_until_resolved(self, system_id):
+        db = SessionLocal()
+        try:
+            alert_cache.forget_system(system_id)
+            db.query(models.Alert).filter(models.Alert.system_id == system_id).delete()
+            db.commit()
+
+            check_thresholds(make_metric(system_id, cpu=99.0), db)
+            check_thresholds(make_metric(system_id, cpu=99.0), db)
+            alerts = db.query(models.Alert).filter(
+                models.Alert.system_id == system_id, models.Alert.is_resolved == False
+            ).all()
+            assert [a.alert_type for a in alerts] == ["CPU"]
+
+            response = client.put(f"/api/v1/alerts/{alerts[0].id}/resolve")
+            assert response.status_code == 200
+            assert "CPU" not in alert_cache.open_types[system_id]
+        finally:
+            db.close()
+
+    def test_settings_update_invalidates_cache(self, system_id):
+        db = SessionLocal()
+        try:
+            alert_cache.get_settings(system_id, db)
+            response = client.put("/api/v1/alerts/settings", json={
+                "system_id": system_id, "cpu_threshold": 50.0,
+                "memory_threshold": 90.0, "disk_threshold": 90.0
+            })
+            assert response.status_code == 200
+            assert alert_cache.get_settings(system_id, db).cpu_threshold == 50.0
+        finally:
+            # Back to the global settings, for later tests and later runs
+            db.query(models.AlertSettings).filter(models.AlertSettings.system_id == system_id).delete()
+            db.commit()
+            alert_cache.invalidate_settings(system_id)
+            db.close()
+
+
+class TestAlertCacheRaces:
+    """A database read racing an invalidation or a resolve must not cache the stale answer."""
+
+    def test_resolve_during_load_is_not_undone(self, system_id):
+        db = SessionLocal()
+        try:
+            db.query(models.Alert).filter(models.Alert.system_id == system_id).delete()
+            alert = models.Alert(system_id=system_id, alert_type="CPU", severity="Warning", message="high")
+            db.add(alert)
+            db.commit()
+
+            cache = AlertStateCache()
+
+            def resolve():
+                alert.is_resolved = True
+                db.commit()
+                cache.alert_resolved(system_id, "CPU")
+
+            assert cache.claim_open(system_id, ["CPU"], AfterRead(db, resolve)) == ["CPU"]
+        finally:
+            db.query(models.Alert).filter(models.Alert.system_id == system_id).delete()
+            db.commit()
+            db.close()
+
+    def test_invalidation_during_load_is_not_undone(self, system_id):
+        db = SessionLocal()
+        try:
+            db.query(models.AlertSettings).filter(models.AlertSettings.system_id == system_id).delete()
+            db.commit()
+            cache = AlertStateCache()
+            cache.get_settings(system_id, db)  # Global settings cached
+            db.add(models.AlertSettings(system_id=system_id, cpu_threshold=42.0,
+                                        memory_threshold=90.0, disk_threshold=90.0))
+
+            # The read saw no specific settings, then they were saved and invalidated
+            cache.invalidate_settings(system_id)
+            cache.get_settings(system_id, AfterRead(db, lambda: (db.commit(), cache.invalidate_settings(system_id))))
+            assert cache.get_settings(system_id, db).cpu_threshold == 42.0
+        finally:
+            db.query(models.AlertSettings).filter(models.AlertSettings.system_id == system_id).delete()
+            db.commit()
+            db.close()
+
+
+class TestAnomalyDetection:
+    """Samples far above a system's own baseline raise '<gauge> Anomaly' alerts."""
+
+    @pytest.fixture
+    def system_id(self, request):
+        response = client.post(
+            "/api/v1/systems/register",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"hostname": request.node.name}
+        )
+        return response.json()["id"]
+
+    def feed(self, detector, cpu: float, count: int) -> list:
+        return [detector.observe(1, {"CPU": cpu + i % 3}) for i in range(count)][-1]
+
+    def test_jump_from_idle_is_anomalous(self):
+        detector = AnomalyDetector()
+        self.feed(detector, 5.0, WARMUP_SAMPLES + 50)
+        # A single spike is not enough, a sustained one is
+        assert [detector.observe(1, {"CPU": 60.0}) for _ in range(STREAK)][:-1] == [[]] * (STREAK - 1)
+        [anomaly] = detector.observe(1, {"CPU": 60.0})
+        assert anomaly.gauge == "CPU" and anomaly.value == 60.0 and anomaly.z > 4
+
+    def test_hot_but_steady_machine_is_not(self):
+        detector = AnomalyDetector()
+        assert self.feed(detector, 92.0, WARMUP_SAMPLES + 200) == []
+
+    def test_alert_created_and_baseline_checkpointed(self, system_id):
+        db = SessionLocal()
+        try:
+            for _ in range(WARMUP_SAMPLES + 20):
+                check_thresholds(make_metric(system_id, cpu=5.0), db)
+            for _ in range(STREAK):
+                check_thresholds(make_metric(system_id, cpu=60.0), db)
+            alerts = db.query(models.Alert).filter(models.Alert.system_id == system_id).all()
+            assert [(a.alert_type, a.severity) for a in alerts] == [("CPU Anomaly", "Warning")]
+
+            assert anomaly_detector.checkpoint(db) >= 1
+            restored = AnomalyDetector()
+            restored.load(db)
+            baseline = restored.baselines[system_id]["CPU"]
+            assert baseline.count == WARMUP_SAMPLES + 20 + STREAK
+            assert baseline.mean == pytest.approx(anomaly_detector.baselines[system_id]["CPU"].mean)
+        finally:
+            db.close()
+
+    def test_baselines_of_deleted_systems_are_not_restored(self):
+        db = SessionLocal()
+        try:
+            system = models.System(hostname="anomaly-deleted-system")
+            db.add(system)
+            db.commit()
+            detector = AnomalyDetector()
+            detector.observe(system.id, {"CPU": 5.0})
+            detector.checkpoint(db)
+
+            # As if a checkpoint had already copied the system when delete_system ran
+            db.query(models.System).filter(models.System.id == system.id).delete()
+            db.commit()
+            restored = AnomalyDetector()
+            restored.load(db)
+            assert system.id not in restored.baselines
+            assert db.query(models.AnomalyBaseline).filter(models.AnomalyBaseline.system_id == system.id).count() == 0
+        finally:
+            db.query(models.System).filter(models.System.hostname == "anomaly-deleted-system").delete()
+            db.commit()
+            db.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,97 @@
+"""
+Async Database Layer Tests for Resource Monitoring System
+"""
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+pytest.importorskip("aiosqlite")
+
+from app.main import app as sync_app
+from app.db.database import SessionLocal, create_async_session_factory, get_async_db
+from app.api import endpoints, async_endpoints
+from app.core.ingest import metric_writer
+
+TEST_API_KEY = "secret-agent-key"
+
+# Same layout as app.main with DB_ASYNC=1: async hot paths ahead of the sync router
+app = FastAPI()
+app.include_router(async_endpoints.router, prefix="/api/v1")
+app.include_router(endpoints.router, prefix="/api/v1")
+
+AsyncTestSession = create_async_session_factory()
+
+async def override_get_async_db():
+    async with AsyncTestSession() as db:
+        yield db
+
+app.dependency_overrides[get_async_db] = override_get_async_db
+client = TestClient(app)
+
+
+@pytest.fixture
+def system_id(request):
+    """A system named after the test, deleted with its samples afterwards so reruns start clean."""
+    response = client.post(
+        "/api/v1/systems/register",
+        headers={"X-API-Key": TEST_API_KEY},
+        json={"hostname": request.node.name}
+    )
+    assert response.status_code == 200
+    yield response.json()["id"]
+    db = SessionLocal()
+    try:
+        endpoints.delete_system(response.json()["id"], db)
+    finally:
+        db.close()
+
+
+def sample(system_id: int, **overrides) -> dict:
+    return {
+        "system_id": system_id, "cpu_usage": 12.0, "memory_total": 1000, "memory_used": 100,
+        "disk_usage": 30.0, "network_sent": 0, "network_recv": 0, **overrides
+    }
+
+
+class TestAsyncEndpoints:
+    """The async router serves the hot paths with the same contract as the sync one."""
+
+    def test_systems(self, system_id):
+        response = client.get(f"/api/v1/systems/{system_id}")
+        assert response.status_code == 200
+        assert response.json()["hostname"] == "test_systems"
+        assert any(s["id"] == system_id for s in client.get("/api/v1/systems").json())
+        assert client.get("/api/v1/systems/999999").status_code == 404
+
+    def test_ingest_and_history(self, system_id):
+        response = client.post("/api/v1/metrics", headers={"X-API-Key": TEST_API_KEY}, json=sample(system_id))
+        assert response.status_code == 202
+        metric_writer.flush()
+
+        response = client.post(
+            "/api/v1/metrics/batch",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"metrics": [sample(system_id, cpu_usage=50.0, timestamp="2026-01-01T00:00:00+00:00")]}
+        )
+        assert response.status_code == 201
+        assert response.json()["stored"] == 1
+
+        latest = client.get(f"/api/v1/metrics/{system_id}?limit=1").json()
+        assert latest[0]["cpu_usage"] == 12.0
+
+        ranged = client.get(
+            f"/api/v1/metrics/{system_id}",
+            params={"start": "2026-01-01T00:00:00+00:00", "end": "2026-01-01T00:00:01+00:00"}
+        ).json()
+        assert [m["cpu_usage"] for m in ranged] == [50.0]
+
+    def test_unknown_system_rejected(self):
+        response = client.post("/api/v1/metrics", headers={"X-API-Key": TEST_API_KEY}, json=sample(999999))
+        assert response.status_code == 404
+
+    def test_non_numeric_paths_reach_sync_router(self):
+        assert client.get("/api/v1/metrics/export?format=bogus").status_code == 400
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,60 @@
+"""
+Sealed Metric Chunk Compression Tests for Resource Monitoring System
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+
+np = pytest.importorskip("numpy")
+
+from app.core import chunks
+from app.core.segments import SegmentStore, RECORD
+from app.core.packing import pack_floats
+
+T0 = datetime(2026, 8, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def hour_of_samples(count: int = 3600) -> list:
+    """One system at a 1-second cadence with jitter, drifting gauges and growing counters."""
+    return [
+        {
+            "system_id": 1, "timestamp": T0 + timedelta(seconds=i, microseconds=(i * 7919) % 20000),
+            "cpu_usage": round(10 + (i * 37) % 50 / 3, 1), "memory_percent": 48.0 + (i // 600),
+            "memory_total": 16 * 1024 ** 3, "memory_used": None if i % 100 == 0 else 8 * 1024 ** 3 + i * 4096,
+            "disk_usage": 61.0, "disk_read_bytes": i * 4096, "disk_write_bytes": i * 8192,
+            "network_sent": i * 1500, "network_recv": float(i * 3000), "process_count": 180 + i % 3,
+            "cpu_per_core": pack_floats([10.5, 20.0 + i % 5, 0.0, 99.9]),
+            "boot_time": "2026-08-01T08:00:00", "uptime_seconds": 14400 + i, "uptime_human": "4h 0m",
+        }
+        for i in range(count)
+    ]
+
+
+class TestChunkCodec:
+    def test_round_trip_is_lossless(self):
+        records = SegmentStore._encode(hour_of_samples())
+        data = chunks.encode(records)
+        assert chunks.record_count(data) == len(records)
+        assert chunks.decode(data, RECORD).tobytes() == records.tobytes()
+
+    def test_steady_series_compress_well(self):
+        records = SegmentStore._encode(hour_of_samples())
+        assert len(chunks.encode(records)) * 8 < records.nbytes
+
+    def test_edge_cases(self):
+        records = SegmentStore._encode(hour_of_samples(3))
+        # Out of order, sentinel extremes and no cpu_per_core anywhere
+        records = records[::-1].copy()
+        records["memory_used"][1] = -(2 ** 63)
+        records["disk_read_bytes"][2] = 2 ** 63 - 1
+        records["core_count"] = 0
+        records["cpu_per_core"] = 0
+        for sample in (records, records[:1], records[:0]):
+            assert chunks.decode(chunks.encode(sample), RECORD).tobytes() == sample.tobytes()
+
+    def test_rejects_other_files(self):
+        with pytest.raises(ValueError):
+            chunks.record_count(b"\0" * RECORD.itemsize)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
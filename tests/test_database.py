@@ -0,0 +1,72 @@
+"""
+Storage Backend Tests for Resource Monitoring System
+"""
+import os
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, event, text, func
+from sqlalchemy.orm import sessionmaker
+from app.db import database
+from app.db.database import Base, SQLITE_PROFILES, set_sqlite_pragma
+from app.core.ingest import write_metric_rows
+from app.models import models
+
+SYNCHRONOUS_LEVELS = {"OFF": 0, "NORMAL": 1, "FULL": 2}
+
+
+class TestSqliteProfiles:
+    """Every connection gets the selected profile's PRAGMAs."""
+
+    @pytest.mark.parametrize("profile", list(SQLITE_PROFILES))
+    def test_profile_pragmas_applied(self, profile, tmp_path, monkeypatch):
+        monkeypatch.setattr(database, "DB_PROFILE", profile)
+        engine = create_engine(f"sqlite:///{tmp_path / 'profile.db'}")
+        event.listen(engine, "connect", set_sqlite_pragma)
+
+        pragmas = SQLITE_PROFILES[profile]["pragmas"]
+        with engine.connect() as conn:
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == SYNCHRONOUS_LEVELS[pragmas["synchronous"]]
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == pragmas["busy_timeout"]
+            assert conn.execute(text("PRAGMA cache_size")).scalar() == pragmas["cache_size"]
+        engine.dispose()
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="set TEST_POSTGRES_URL to run against PostgreSQL")
+class TestPostgres:
+    """Bulk ingest through COPY against a real PostgreSQL (e.g. postgresql://postgres@localhost/monitor_test)."""
+
+    def test_copy_ingest(self):
+        engine = create_engine(os.environ["TEST_POSTGRES_URL"])
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+
+        db = Session()
+        try:
+            system = models.System(hostname="pg-system", last_seen=datetime.now(timezone.utc))
+            db.add(system)
+            db.commit()
+
+            rows = [{
+                "system_id": system.id, "cpu_usage": float(i), "memory_percent": None,
+                "memory_used": 100, "disk_usage": 1.5, "network_sent": 0, "network_recv": 0,
+                "process_count": None, "boot_time": "2026-01-01, 00:00",
+                "timestamp": datetime(2026, 1, 1, 0, 0, i, tzinfo=timezone.utc),
+            } for i in range(50)]
+            write_metric_rows(db, rows)
+            db.commit()
+
+            assert db.query(func.count(models.Metric.id)).scalar() == 50
+            newest = db.query(models.Metric).order_by(models.Metric.timestamp.desc()).first()
+            assert newest.cpu_usage == 49.0
+            assert newest.memory_percent is None
+            assert newest.boot_time == "2026-01-01, 00:00"
+        finally:
+            db.close()
+            Base.metadata.drop_all(engine)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,107 @@
+"""
+Delta Upload Tests for Resource Monitoring System
+"""
+import sys
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+
+# The agent package lives next to backend/ (see test_discovery.py)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from agent.delta import DeltaEncoder
+
+client = TestClient(app)
+
+TEST_API_KEY = "secret-agent-key"
+
+
+@pytest.fixture
+def system_id():
+    response = client.post(
+        "/api/v1/systems/register",
+        headers={"X-API-Key": TEST_API_KEY},
+        json={"hostname": "delta-system"}
+    )
+    return response.json()["id"]
+
+
+def sample(system_id: int, cpu: float = 20.0, sent: int = 1000) -> dict:
+    return {
+        "system_id": system_id, "cpu_usage": cpu, "memory_total": 8000, "memory_used": 4000,
+        "disk_total": 500000, "disk_usage": 40.0, "network_sent": sent, "network_recv": 2000,
+        "process_count": 120, "boot_time": "2026-10-01 08:00:00",
+    }
+
+
+def send(frame: dict):
+    return client.post("/api/v1/metrics/delta", headers={"X-API-Key": TEST_API_KEY}, json=frame)
+
+
+def latest(system_id: int) -> dict:
+    return client.get(f"/api/v1/metrics/{system_id}?limit=1").json()[0]
+
+
+class TestDeltaUploads:
+    def test_capabilities_advertise_delta(self):
+        assert client.get("/api/v1/capabilities").json()["delta"] is True
+
+    def test_server_reconstructs_full_samples(self, system_id):
+        encoder = DeltaEncoder()
+        for cpu, sent in ((20.0, 1000), (35.0, 1500), (35.0, 1800)):
+            frame = encoder.frame(sample(system_id, cpu, sent))
+            assert send(frame).status_code == 202
+            encoder._sent(sample(system_id, cpu, sent), frame)
+
+        assert frame["fields"].keys() == set()
+        assert frame["counters"] == {"network_sent": 300}
+        row = latest(system_id)
+        assert row["cpu_usage"] == 35.0
+        assert row["network_sent"] == 1800
+        assert row["process_count"] == 120
+
+    def test_missing_state_asks_for_keyframe(self, system_id):
+        delta = {"system_id": system_id, "seq": 1, "fields": {"cpu_usage": 50.0}}
+        assert send(delta).status_code == 409
+
+        keyframe = {"system_id": system_id, "seq": 1, "keyframe": True, "fields": sample(system_id)}
+        del keyframe["fields"]["system_id"]
+        assert send(keyframe).status_code == 202
+
+        # A skipped frame means the base is unknown
+        assert send(dict(delta, seq=3)).status_code == 409
+        assert send(dict(delta, seq=2)).status_code == 202
+
+    def test_invalid_frames_rejected(self, system_id):
+        partial = {"system_id": system_id, "seq": 1, "keyframe": True, "fields": {"cpu_usage": 1.0}}
+        assert send(partial).status_code == 422
+        nulled = {"system_id": system_id, "seq": 2, "fields": {"cpu_usage": None}}
+        assert send(nulled).status_code == 422
+        not_counter = {"system_id": system_id, "seq": 2, "counters": {"cpu_usage": 1}}
+        assert send(not_counter).status_code == 422
+
+
+class TestDeltaEncoder:
+    def test_keyframes_on_interval_and_reboot(self):
+        encoder = DeltaEncoder(keyframe_interval=2)
+        frames = []
+        for i in range(4):
+            current = sample(1, sent=1000 + i)
+            frames.append(encoder.frame(current))
+            encoder._sent(current, frames[-1])
+        assert [f["keyframe"] for f in frames] == [True, False, False, True]
+
+        rebooted = dict(sample(1, sent=10), boot_time="2026-10-02 08:00:00")
+        assert encoder.frame(rebooted)["keyframe"]
+
+    def test_counter_reset_sent_as_value(self):
+        encoder = DeltaEncoder()
+        first = sample(1, sent=1000)
+        encoder._sent(first, encoder.frame(first))
+        frame = encoder.frame(sample(1, sent=10))
+        assert frame["fields"] == {"network_sent": 10}
+        assert "counters" not in frame
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
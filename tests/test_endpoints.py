@@ -1,10 +1,27 @@
 """
 Backend Unit Tests for Resource Monitoring System
 """
+import io
+import csv
 import pytest
+from datetime import datetime, timedelta, timezone
 from fastapi.testclient import TestClient
+from sqlalchemy import text, event
+from sqlalchemy.exc import IntegrityError
 from app.main import app
 from app.db.database import Base, engine
+from app.api import endpoints
+from app.api.endpoints import delete_system
+from app.core.ingest import metric_writer
+from app.core.registry import system_registry
+from app.core.export import iter_metric_pages, CSV_COLUMNS
+from app.core.segments import segment_store
+from app.core.fleet import FleetState
+from app.core.drivers import canonical_inventory
+from app.core import fastjson
+from app.schemas import schemas
+from app.models import models
+from app.db.database import SessionLocal
 
 # Use test client
 client = TestClient(app)
@@ -13,6 +30,48 @@ client = TestClient(app)
 TEST_API_KEY = "secret-agent-key"
 
 
+def register_test_system(hostname: str) -> int:
+    """Registers a system for tests and returns its id."""
+    response = client.post(
+        "/api/v1/systems/register",
+        headers={"X-API-Key": TEST_API_KEY},
+        json={"hostname": hostname}
+    )
+    assert response.status_code == 200
+    return response.json()["id"]
+
+
+@pytest.fixture
+def test_system(request):
+    """
+    Registers a system named after the test and deletes it afterwards, rows and
+    in-memory state alike, so tests with fixed timestamps pass on every run.
+    """
+    system_ids = []
+
+    def register(suffix: str = "") -> int:
+        system_ids.append(register_test_system(f"{request.node.name}{suffix}"))
+        return system_ids[-1]
+
+    yield register
+    db = SessionLocal()
+    try:
+        for system_id in system_ids:
+            delete_system(system_id, db)
+    finally:
+        db.close()
+
+
+@pytest.fixture(params=["sql", "segments"])
+def metrics_engine(request, tmp_path, monkeypatch):
+    """Runs a test against both METRICS_ENGINE settings; their responses must not differ."""
+    if request.param == "segments":
+        pytest.importorskip("numpy")
+        monkeypatch.setattr(segment_store, "enabled", True)
+        monkeypatch.setattr(segment_store, "root", str(tmp_path))
+    return request.param
+
+
 class TestHealthEndpoints:
     """Test basic health and root endpoints."""
     
@@ -51,6 +110,104 @@ class TestSystemsEndpoints:
         assert response.status_code == 200
         assert "id" in response.json()
 
+    def test_list_response_matches_schema(self, monkeypatch):
+        """Rows are encoded straight from column tuples but keep the response_model's shape."""
+        system_id = register_test_system("fastjson-system")
+        systems = client.get("/api/v1/systems?limit=1000").json()
+        system = next(s for s in systems if s["id"] == system_id)
+        assert set(system) == set(schemas.System.model_fields)
+        assert schemas.System.model_validate(system).hostname == "fastjson-system"
+
+        # Without orjson the stdlib encoder gives the same document
+        monkeypatch.setattr(fastjson, "orjson", None)
+        assert client.get("/api/v1/systems?limit=1000").json() == systems
+
+
+class TestDriverInventory:
+    """Driver lists are stored once per distinct inventory and served separately."""
+
+    def register(self, hostname: str, drivers: list) -> dict:
+        response = client.post(
+            "/api/v1/systems/register",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"hostname": hostname, "drivers": drivers}
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    def test_identical_images_share_one_inventory(self):
+        drivers = [{"DeviceName": f"Device {n}", "DeviceClass": "NET"} for n in range(50)]
+        first = self.register("driver-image-a", drivers)
+        second = self.register("driver-image-b", list(reversed(drivers)))
+        assert first["drivers_hash"] == second["drivers_hash"]
+        assert "drivers" not in first
+
+        listed = next(s for s in client.get("/api/v1/systems?limit=1000").json() if s["id"] == first["id"])
+        assert "drivers" not in listed
+        assert "drivers" not in client.get(f"/api/v1/systems/{first['id']}").json()
+
+        response = client.get(f"/api/v1/systems/{second['id']}/drivers")
+        assert response.status_code == 200
+        assert len(response.json()) == 50
+        assert response.headers["ETag"] == f'"{first["drivers_hash"]}"'
+        cached = client.get(f"/api/v1/systems/{second['id']}/drivers", headers={"If-None-Match": response.headers["ETag"]})
+        assert cached.status_code == 304
+
+        db = SessionLocal()
+        try:
+            assert db.query(models.DriverInventory).filter(models.DriverInventory.hash == first["drivers_hash"]).count() == 1
+        finally:
+            db.close()
+
+    def test_changed_inventory_releases_the_old_one(self):
+        old = self.register("driver-upgrade", [{"DeviceName": "Old GPU driver"}])
+        new = self.register("driver-upgrade", [{"DeviceName": "New GPU driver"}])
+        assert new["drivers_hash"] != old["drivers_hash"]
+        # Registering without a driver list keeps the stored one
+        assert self.register("driver-upgrade", None)["drivers_hash"] == new["drivers_hash"]
+
+        db = SessionLocal()
+        try:
+            assert db.get(models.DriverInventory, old["drivers_hash"]) is None
+            assert db.get(models.DriverInventory, new["drivers_hash"]).driver_count == 1
+        finally:
+            db.close()
+
+    def test_failed_registration_leaves_no_inventory(self, monkeypatch):
+        drivers = [{"DeviceName": "Only on the failed machine"}]
+        store_inventory = endpoints.store_inventory
+
+        def racing_store(db, drivers):
+            # Another worker registers the same hostname first, so this registration's commit fails
+            other = SessionLocal()
+            try:
+                other.add(models.System(hostname="driver-race"))
+                other.commit()
+            finally:
+                other.close()
+            return store_inventory(db, drivers)
+
+        monkeypatch.setattr(endpoints, "store_inventory", racing_store)
+        db = SessionLocal()
+        try:
+            with pytest.raises(IntegrityError):
+                client.post(
+                    "/api/v1/systems/register",
+                    headers={"X-API-Key": TEST_API_KEY},
+                    json={"hostname": "driver-race", "drivers": drivers}
+                )
+            digest, _ = canonical_inventory(drivers)
+            assert db.get(models.DriverInventory, digest) is None
+        finally:
+            db.query(models.System).filter(models.System.hostname == "driver-race").delete()
+            db.commit()
+            db.close()
+
+    def test_system_without_drivers(self):
+        system_id = register_test_system("driverless-system")
+        assert client.get(f"/api/v1/systems/{system_id}/drivers").json() == []
+        assert client.get("/api/v1/systems/999999/drivers").status_code == 404
+
 
 class TestMetricsEndpoints:
     """Test metrics-related endpoints."""
@@ -67,6 +224,328 @@ class TestMetricsEndpoints:
         )
         assert response.status_code in [401, 403]
 
+    def test_create_metric_queued(self):
+        """Single samples are queued for the writer and visible after a flush."""
+        system_id = register_test_system("queued-system")
+        response = client.post(
+            "/api/v1/metrics",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={
+                "system_id": system_id,
+                "cpu_usage": 42.0,
+                "memory_total": 1000,
+                "memory_used": 100,
+                "disk_usage": 20.0,
+                "network_sent": 1,
+                "network_recv": 1
+            }
+        )
+        assert response.status_code == 202
+        assert response.json()["status"] == "queued"
+
+        metric_writer.flush()
+        history = client.get(f"/api/v1/metrics/{system_id}?limit=1").json()
+        assert history[0]["cpu_usage"] == 42.0
+
+    def test_metric_heartbeat_flushed_by_registry(self):
+        """Ingest records the heartbeat in memory; a registry flush writes last_seen."""
+        system_id = register_test_system("heartbeat-system")
+        client.post(
+            "/api/v1/metrics",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={
+                "system_id": system_id, "cpu_usage": 1.0, "memory_total": 10, "memory_used": 1,
+                "disk_usage": 1.0, "network_sent": 0, "network_recv": 0
+            }
+        )
+        assert system_id in system_registry.dirty
+
+        db = SessionLocal()
+        try:
+            assert system_registry.flush(db) >= 1
+        finally:
+            db.close()
+        assert system_id not in system_registry.dirty
+
+    def test_liveness_sweep_marks_stale_systems_offline(self):
+        """Reads never write; the sweeper flips is_active once heartbeats stop."""
+        system_id = register_test_system("sweep-system")
+        db = SessionLocal()
+        try:
+            system_registry.flush(db)
+            system_registry.touch(system_id, datetime.now(timezone.utc) - timedelta(minutes=5))
+            system_registry.flush(db)
+
+            statements = []
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(engine, "before_cursor_execute", listener)
+            try:
+                client.get("/api/v1/systems")
+            finally:
+                event.remove(engine, "before_cursor_execute", listener)
+            assert not any(s.lstrip().upper().startswith("UPDATE") for s in statements)
+
+            assert system_id in system_registry.sweep(db)
+            assert system_id not in system_registry.sweep(db)  # Only transitions are written
+        finally:
+            db.close()
+
+        system = client.get(f"/api/v1/systems/{system_id}").json()
+        assert system["is_active"] is False
+
+    def test_metrics_history_served_newest_first(self):
+        system_id = register_test_system("history-system")
+        for cpu in (1.0, 2.0, 3.0):
+            client.post(
+                "/api/v1/metrics",
+                headers={"X-API-Key": TEST_API_KEY},
+                json={
+                    "system_id": system_id, "cpu_usage": cpu, "memory_total": 10, "memory_used": 1,
+                    "disk_usage": 1.0, "network_sent": 0, "network_recv": 0
+                }
+            )
+        # Served from the ring buffer before the writer has flushed anything
+        history = client.get(f"/api/v1/metrics/{system_id}?limit=2").json()
+        assert [m["cpu_usage"] for m in history] == [3.0, 2.0]
+
+    def test_metrics_history_time_range(self, metrics_engine, test_system):
+        system_id = test_system()
+        client.post(
+            "/api/v1/metrics/batch",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"metrics": [
+                {
+                    "system_id": system_id, "cpu_usage": float(second), "memory_total": 10, "memory_used": 1,
+                    "disk_usage": 1.0, "network_sent": 0, "network_recv": 0,
+                    "timestamp": f"2026-03-01T00:00:0{second}+00:00"
+                }
+                for second in range(5)
+            ]}
+        )
+        history = client.get(f"/api/v1/metrics/{system_id}", params={
+            "start": "2026-03-01T00:00:01+00:00", "end": "2026-03-01T00:00:04+00:00"
+        }).json()
+        assert [m["cpu_usage"] for m in history] == [3.0, 2.0, 1.0]
+
+        newer = client.get(f"/api/v1/metrics/{system_id}", params={"since": "2026-03-01T00:00:02+00:00"}).json()
+        assert [m["cpu_usage"] for m in newer] == [4.0, 3.0]
+
+    def test_buffer_and_database_paths_serialize_alike(self, metrics_engine, test_system):
+        system_id = test_system()
+        client.post(
+            "/api/v1/metrics/batch",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"metrics": [
+                {
+                    "system_id": system_id, "cpu_usage": float(second), "memory_total": 10, "memory_used": 1,
+                    "disk_usage": 1.0, "network_sent": 0, "network_recv": 0,
+                    "timestamp": f"2026-03-02T00:00:0{second}+00:00"
+                }
+                for second in range(3)
+            ]}
+        )
+        buffered = client.get(f"/api/v1/metrics/{system_id}").json()
+        stored = client.get(f"/api/v1/metrics/{system_id}", params={"start": "2026-03-02T00:00:00+00:00"}).json()
+        assert [m["timestamp"] for m in stored] == [m["timestamp"] for m in buffered]
+        assert buffered[0]["timestamp"] == "2026-03-02T00:00:02+00:00"
+
+    def test_metrics_range_query_uses_composite_index(self):
+        with engine.connect() as conn:
+            plan = conn.execute(text(
+                "EXPLAIN QUERY PLAN SELECT * FROM metrics WHERE system_id = 1 "
+                "AND timestamp >= '2026-01-01' ORDER BY timestamp DESC LIMIT 100"
+            )).fetchall()
+        assert "ix_metrics_system_id_timestamp" in str(plan)
+
+    def test_export_metrics_csv_pages_through_ties(self, metrics_engine, test_system):
+        """Keyset paging must not skip or repeat rows that share a timestamp."""
+        system_id = test_system()
+        client.post(
+            "/api/v1/metrics/batch",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"metrics": [
+                {
+                    "system_id": system_id, "cpu_usage": float(i), "memory_total": 10, "memory_used": 1,
+                    "disk_usage": 1.0, "network_sent": 0, "network_recv": 0,
+                    "timestamp": f"2026-04-01T00:00:0{i % 3}+00:00"
+                }
+                for i in range(7)
+            ]}
+        )
+        pages = list(iter_metric_pages(system_id, CSV_COLUMNS, page_size=2))
+        assert sorted(row[1] for page in pages for row in page) == [float(i) for i in range(7)]
+
+        response = client.get(f"/api/v1/metrics/{system_id}/export", params={"start": "2026-04-01T00:00:01+00:00"})
+        assert response.status_code == 200
+        lines = response.text.strip().splitlines()
+        assert lines[0].startswith("Timestamp")
+        assert len(lines) == 1 + 4
+
+    def test_export_metrics_columnar(self, metrics_engine, test_system):
+        pa = pytest.importorskip("pyarrow")
+        import pyarrow.parquet as pq
+        system_id = test_system()
+        client.post(
+            "/api/v1/metrics/batch",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"metrics": [
+                {
+                    "system_id": system_id, "cpu_usage": float(i), "memory_total": 10, "memory_used": 1,
+                    "disk_usage": 1.0, "network_sent": 0, "network_recv": 0,
+                    "timestamp": f"2026-05-01T00:00:0{i}+00:00"
+                }
+                for i in range(3)
+            ]}
+        )
+
+        response = client.get(f"/api/v1/metrics/{system_id}/export", params={"format": "parquet"})
+        assert response.status_code == 200
+        table = pq.read_table(pa.BufferReader(response.content))
+        assert table.column("cpu_usage").to_pylist() == [2.0, 1.0, 0.0]
+        assert str(table.schema.field("timestamp").type) == "timestamp[us, tz=UTC]"
+
+        response = client.get("/api/v1/metrics/export", params={
+            "format": "arrow", "start": "2026-05-01T00:00:00+00:00", "end": "2026-05-02T00:00:00+00:00"
+        })
+        assert response.status_code == 200
+        table = pa.ipc.open_stream(response.content).read_all()
+        assert system_id in table.column("system_id").to_pylist()
+
+    def test_export_fleet_metrics_csv(self, metrics_engine, test_system):
+        system_id = test_system()
+        client.post(
+            "/api/v1/metrics/batch",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"metrics": [{
+                "system_id": system_id, "cpu_usage": 42.5, "memory_total": 10, "memory_used": 1,
+                "disk_usage": 1.0, "network_sent": 0, "network_recv": 0,
+                "timestamp": "2026-05-15T00:00:00+00:00"
+            }]}
+        )
+
+        response = client.get("/api/v1/metrics/export", params={
+            "format": "csv", "start": "2026-05-15T00:00:00+00:00", "end": "2026-05-15T00:00:01+00:00"
+        })
+        assert response.status_code == 200
+        header, *rows = csv.reader(io.StringIO(response.text))
+        assert header[:3] == ["System ID", "Timestamp", "CPU (%)"]
+        assert [str(system_id), "2026-05-15 00:00:00+00:00", "42.5"] in [row[:3] for row in rows]
+        assert client.get("/api/v1/metrics/export", params={"format": "xml"}).status_code == 400
+
+    def test_ingest_stats(self):
+        response = client.get("/api/v1/ingest/stats")
+        assert response.status_code == 200
+        data = response.json()
+        for key in ("queue_depth", "dropped_rows", "last_flush_ms"):
+            assert key in data
+
+    def test_create_metrics_batch(self):
+        """Batch ingest stores every sample for known systems and reports unknown ones."""
+        system_id = register_test_system("batch-system")
+        sample = {
+            "system_id": system_id,
+            "cpu_usage": 10.0,
+            "memory_total": 1000,
+            "memory_used": 100,
+            "disk_usage": 20.0,
+            "network_sent": 1,
+            "network_recv": 1
+        }
+        response = client.post(
+            "/api/v1/metrics/batch",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"metrics": [
+                {**sample, "timestamp": "2026-01-01T00:00:00+00:00"},
+                {**sample, "timestamp": "2026-01-01T00:00:01+00:00"},
+                {**sample, "system_id": 999999}
+            ]}
+        )
+        assert response.status_code == 201
+        data = response.json()
+        assert data["stored"] == 2
+        assert data["unknown_systems"] == [999999]
+
+    def test_create_metrics_batch_unknown_system(self):
+        response = client.post(
+            "/api/v1/metrics/batch",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"metrics": [{
+                "system_id": 999999, "cpu_usage": 1.0, "memory_total": 1, "memory_used": 1,
+                "disk_usage": 1.0, "network_sent": 0, "network_recv": 0
+            }]}
+        )
+        assert response.status_code == 404
+
+    def test_all_metric_fields_stored(self, test_system):
+        system_id = test_system()
+        sample = {
+            "system_id": system_id, "cpu_usage": 30.0, "cpu_per_core": [12.5, 47.5, 0.0, 100.0],
+            "memory_total": 16 * 1024 ** 3, "memory_used": 8 * 1024 ** 3, "memory_available": 8 * 1024 ** 3,
+            "memory_percent": 50.0, "swap_total": 4096, "swap_used": 1024, "swap_percent": 25.0,
+            "disk_total": 500, "disk_used": 200, "disk_free": 300, "disk_usage": 40.0,
+            "disk_read_bytes": 7000, "disk_write_bytes": 9000, "network_sent": 10, "network_recv": 20,
+            "network_packets_sent": 3, "network_packets_recv": 4, "uptime_seconds": 60,
+            "uptime_human": "0:01:00", "timestamp": "2026-06-01T00:00:00+00:00"
+        }
+        response = client.post("/api/v1/metrics/batch", headers={"X-API-Key": TEST_API_KEY}, json={"metrics": [sample]})
+        assert response.status_code == 201
+
+        db = SessionLocal()
+        try:
+            stored = db.query(models.Metric).filter(models.Metric.system_id == system_id).one()
+            assert isinstance(stored.cpu_per_core, bytes) and len(stored.cpu_per_core) == 4 * 4
+        finally:
+            db.close()
+
+        history = client.get(f"/api/v1/metrics/{system_id}", params={
+            "start": "2026-06-01T00:00:00+00:00", "end": "2026-06-02T00:00:00+00:00"
+        }).json()
+        assert len(history) == 1
+        for field, value in sample.items():
+            if field != "timestamp":
+                assert history[0][field] == value, field
+
+
+class TestFleetEndpoints:
+    """The fleet overview is answered from memory."""
+
+    def test_fleet_overview(self, test_system):
+        system_id = test_system()
+        client.post(
+            "/api/v1/metrics",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={
+                "system_id": system_id, "cpu_usage": 99.0, "memory_total": 1000, "memory_used": 100,
+                "memory_percent": 10.0, "disk_usage": 20.0, "network_sent": 0, "network_recv": 0
+            }
+        )
+
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            response = client.get("/api/v1/fleet/overview")
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        assert response.status_code == 200
+        assert statements == []
+
+        system = next(s for s in response.json()["systems"] if s["id"] == system_id)
+        assert system["hostname"] == "test_fleet_overview"
+        assert system["is_active"] is True
+        assert system["cpu_usage"] == 99.0
+        assert system["memory_percent"] == 10.0
+        assert system["open_alerts"] == 1
+        assert system["critical_alerts"] == 1
+
+    def test_fleet_state_remove_keeps_columns_dense(self):
+        state = FleetState()
+        for system_id in (1, 2, 3):
+            state.upsert_system(models.System(id=system_id, hostname=f"host-{system_id}"))
+        state.remove(1)
+        assert [row["hostname"] for row in state.snapshot(set(), {})] == ["host-2", "host-3"]
+        assert state.slots == {3: 0, 2: 1}
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,40 @@
+"""
+Metric History Buffer Tests for Resource Monitoring System
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from app.core.history import MetricRingBuffer
+
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def sample(second: int) -> dict:
+    return {"system_id": 1, "timestamp": BASE_TIME + timedelta(seconds=second), "cpu_usage": float(second)}
+
+
+class TestMetricRingBuffer:
+    """The ring keeps the newest `size` samples in timestamp order."""
+
+    def test_wraps_around_and_returns_newest_first(self):
+        buffer = MetricRingBuffer(size=3)
+        for second in range(5):
+            buffer.append(sample(second))
+        assert buffer.count == 3
+        assert [s["cpu_usage"] for s in buffer.latest(10)] == [4.0, 3.0, 2.0]
+
+    def test_late_sample_is_kept_in_order(self):
+        buffer = MetricRingBuffer(size=4)
+        for second in (0, 2, 3):
+            buffer.append(sample(second))
+        buffer.append(sample(1))
+        assert [s["cpu_usage"] for s in buffer.latest(4)] == [3.0, 2.0, 1.0, 0.0]
+
+    def test_prepend_older_fills_remaining_room(self):
+        buffer = MetricRingBuffer(size=3)
+        buffer.append(sample(10))
+        buffer.prepend_older([sample(9), sample(8), sample(7)])
+        assert [s["cpu_usage"] for s in buffer.latest(3)] == [10.0, 9.0, 8.0]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
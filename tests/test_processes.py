@@ -0,0 +1,164 @@
+"""
+Top-Process Storage Tests for Resource Monitoring System
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core.processes import ProcessTracker, SNAPSHOT_MAX_AGE
+from app.core import ingest
+from app.core.ingest import metric_writer
+from app.api.endpoints import delete_system
+from app.db.database import SessionLocal
+from app.models import models
+
+client = TestClient(app)
+
+TEST_API_KEY = "secret-agent-key"
+
+T0 = datetime(2026, 5, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def top(*processes):
+    return [{"name": name, "pid": pid, "cpu_percent": cpu, "memory_percent": 1.0} for name, pid, cpu in processes]
+
+
+class TestProcessTracker:
+    def test_only_meaningful_changes_are_stored(self):
+        tracker = ProcessTracker()
+        base = top(("chrome.exe", 10, 30.0), ("python.exe", 20, 10.0))
+        assert tracker.snapshot(1, T0, base)
+
+        # Small moves and rank shuffles within the same set
+        assert tracker.snapshot(1, T0 + timedelta(seconds=5), top(("chrome.exe", 10, 32.0), ("python.exe", 20, 9.0))) is None
+        assert tracker.snapshot(1, T0 + timedelta(seconds=10), list(reversed(base))) is None
+
+        # A big move, a new process, a restarted process (new pid)
+        assert tracker.snapshot(1, T0 + timedelta(seconds=15), top(("chrome.exe", 10, 60.0), ("python.exe", 20, 10.0)))
+        assert tracker.snapshot(1, T0 + timedelta(seconds=20), top(("chrome.exe", 10, 60.0), ("code.exe", 30, 10.0)))
+        assert tracker.snapshot(1, T0 + timedelta(seconds=25), top(("chrome.exe", 11, 60.0), ("code.exe", 30, 10.0)))
+
+    def test_unchanged_snapshot_rewritten_after_max_age(self):
+        tracker = ProcessTracker()
+        processes = top(("idle.exe", 1, 0.0))
+        assert tracker.snapshot(1, T0, processes)
+        assert tracker.snapshot(1, T0 + SNAPSHOT_MAX_AGE - timedelta(seconds=1), processes) is None
+        assert tracker.snapshot(1, T0 + SNAPSHOT_MAX_AGE, processes)
+
+
+class TestProcessHistory:
+    @pytest.fixture
+    def system_id(self, request):
+        """A system named after the test, deleted with its snapshots afterwards so reruns start clean."""
+        response = client.post(
+            "/api/v1/systems/register",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"hostname": request.node.name}
+        )
+        yield response.json()["id"]
+        db = SessionLocal()
+        try:
+            delete_system(response.json()["id"], db)
+        finally:
+            db.close()
+
+    def upload(self, system_id: int, samples):
+        response = client.post(
+            "/api/v1/metrics/batch",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"metrics": [
+                {
+                    "system_id": system_id, "cpu_usage": 10.0, "memory_total": 10, "memory_used": 1,
+                    "disk_usage": 1.0, "network_sent": 0, "network_recv": 0,
+                    "timestamp": timestamp.isoformat(), "top_processes": processes
+                }
+                for timestamp, processes in samples
+            ]}
+        )
+        assert response.status_code == 201
+
+    def test_snapshots_stored_on_change_with_interned_names(self, system_id):
+        steady = top(("svchost.exe", 4, 1.0), ("explorer.exe", 8, 2.0))
+        busy = top(("svchost.exe", 4, 1.0), ("compiler.exe", 99, 80.0))
+        self.upload(system_id, [
+            (T0, steady),
+            (T0 + timedelta(seconds=5), steady),
+            (T0 + timedelta(seconds=10), steady),
+            (T0 + timedelta(seconds=15), busy),
+        ])
+
+        snapshots = client.get(f"/api/v1/systems/{system_id}/processes").json()
+        assert [s["timestamp"] for s in snapshots] == [
+            (T0 + timedelta(seconds=15)).isoformat(), T0.isoformat()
+        ]
+        assert [p["name"] for p in snapshots[0]["processes"]] == ["svchost.exe", "compiler.exe"]
+        assert snapshots[0]["processes"][1]["cpu_percent"] == 80.0
+
+        db = SessionLocal()
+        try:
+            assert db.query(models.ProcessSample).filter(models.ProcessSample.system_id == system_id).count() == 4
+            assert db.query(models.ProcessName).filter(models.ProcessName.name == "svchost.exe").count() == 1
+        finally:
+            db.close()
+
+        # The snapshot written at T0 is still the one in effect at T0 + 12s
+        ranged = client.get(f"/api/v1/systems/{system_id}/processes", params={
+            "start": (T0 + timedelta(seconds=12)).isoformat(), "end": (T0 + timedelta(seconds=14)).isoformat()
+        }).json()
+        assert [s["timestamp"] for s in ranged] == [T0.isoformat()]
+
+        current = client.get(f"/api/v1/systems/{system_id}/processes?limit=1").json()
+        assert len(current) == 1 and current[0]["processes"][1]["name"] == "compiler.exe"
+
+    def test_queued_samples_write_snapshots_with_the_batch(self, system_id):
+        for _ in range(3):
+            response = client.post(
+                "/api/v1/metrics",
+                headers={"X-API-Key": TEST_API_KEY},
+                json={
+                    "system_id": system_id, "cpu_usage": 10.0, "memory_total": 10, "memory_used": 1,
+                    "disk_usage": 1.0, "network_sent": 0, "network_recv": 0,
+                    "top_processes": top(("sqlservr.exe", 7, 25.0))
+                }
+            )
+            assert response.status_code == 202
+        metric_writer.flush()
+
+        snapshots = client.get(f"/api/v1/systems/{system_id}/processes").json()
+        assert len(snapshots) == 1
+        assert snapshots[0]["processes"][0]["name"] == "sqlservr.exe"
+
+    def test_failed_flush_does_not_suppress_the_next_snapshot(self, system_id, monkeypatch):
+        def post():
+            response = client.post(
+                "/api/v1/metrics",
+                headers={"X-API-Key": TEST_API_KEY},
+                json={
+                    "system_id": system_id, "cpu_usage": 10.0, "memory_total": 10, "memory_used": 1,
+                    "disk_usage": 1.0, "network_sent": 0, "network_recv": 0,
+                    "top_processes": top(("backup.exe", 9, 40.0))
+                }
+            )
+            assert response.status_code == 202
+
+        def failing_write(db, rows):
+            raise RuntimeError("disk I/O error")
+
+        post()
+        monkeypatch.setattr(ingest, "write_metric_rows", failing_write)
+        metric_writer.flush()
+        monkeypatch.undo()
+
+        # Same processes as the lost snapshot, so only a forgotten tracker stores it
+        post()
+        metric_writer.flush()
+        snapshots = client.get(f"/api/v1/systems/{system_id}/processes").json()
+        assert len(snapshots) == 1
+        assert snapshots[0]["processes"][0]["name"] == "backup.exe"
+
+    def test_unknown_system(self):
+        assert client.get("/api/v1/systems/999999/processes").status_code == 404
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
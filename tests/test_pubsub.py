@@ -0,0 +1,69 @@
+"""
+Live Update Broker Tests for Resource Monitoring System
+"""
+import json
+import asyncio
+import threading
+import pytest
+from app.core.pubsub import EventBroker, FLEET_TOPIC, system_topic
+
+
+def parse(message: str) -> tuple:
+    event_line, data_line = message.strip().split("\n")
+    return event_line.removeprefix("event: "), json.loads(data_line.removeprefix("data: "))
+
+
+class TestEventBroker:
+    """Events published from worker threads reach subscribers on their event loop."""
+
+    def test_fleet_and_system_subscribers_get_their_payloads(self):
+        broker = EventBroker()
+
+        async def scenario():
+            fleet = broker.subscribe(FLEET_TOPIC)
+            system = broker.subscribe(system_topic(7))
+            other = broker.subscribe(system_topic(8))
+
+            publisher = threading.Thread(target=broker.publish, args=(
+                "metric", {"system_id": 7, "cpu_usage": 1.0, "top_processes": []}
+            ), kwargs={"system_id": 7, "fleet_data": {"system_id": 7, "cpu_usage": 1.0}})
+            publisher.start()
+            publisher.join()
+
+            fleet_event = parse(await asyncio.wait_for(fleet.queue.get(), timeout=1))
+            system_event = parse(await asyncio.wait_for(system.queue.get(), timeout=1))
+            assert other.queue.empty()
+            return fleet_event, system_event
+
+        fleet_event, system_event = asyncio.run(scenario())
+        assert fleet_event == ("metric", {"system_id": 7, "cpu_usage": 1.0})
+        assert "top_processes" in system_event[1]
+
+    def test_slow_subscriber_drops_oldest(self):
+        broker = EventBroker()
+
+        async def scenario():
+            subscription = broker.subscribe(FLEET_TOPIC)
+            subscription.queue = asyncio.Queue(maxsize=2)
+            for i in range(3):
+                broker.publish("metric", {"n": i})
+            await asyncio.sleep(0)
+            return [parse(subscription.queue.get_nowait())[1]["n"] for _ in range(2)], subscription.dropped
+
+        received, dropped = asyncio.run(scenario())
+        assert received == [1, 2]
+        assert dropped == 1
+
+    def test_unsubscribe_stops_delivery(self):
+        broker = EventBroker()
+
+        async def scenario():
+            subscription = broker.subscribe(FLEET_TOPIC)
+            broker.unsubscribe(subscription)
+            return broker.has_subscribers()
+
+        assert asyncio.run(scenario()) is False
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
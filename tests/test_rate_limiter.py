@@ -0,0 +1,143 @@
+"""
+Rate Limiter Tests for Resource Monitoring System
+"""
+import uuid
+import time
+import asyncio
+import sqlite3
+import threading
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core import rate_limiter
+from app.core.rate_limiter import RateLimiter, SharedRateLimiter, rate_limit_middleware
+from app.core.security import API_KEY, create_access_token
+
+
+class TestTokenBucket:
+    """Token buckets refill at `rate` and never hold more than `burst`."""
+
+    def test_burst_then_refill(self):
+        limiter = RateLimiter(rate=10, burst=2)
+        assert limiter.check("a", now=0.0) == (True, 0.0)
+        assert limiter.check("a", now=0.0)[0] is True
+        allowed, retry_after = limiter.check("a", now=0.0)
+        assert allowed is False
+        assert retry_after == pytest.approx(0.1)
+        assert limiter.check("a", now=0.1)[0] is True
+
+    def test_keys_are_independent(self):
+        limiter = RateLimiter(rate=1, burst=1)
+        assert limiter.is_allowed("10.0.0.1|lab-pc-01")
+        assert limiter.is_allowed("10.0.0.1|lab-pc-02")
+        assert not limiter.is_allowed("10.0.0.1|lab-pc-01")
+
+    def test_idle_keys_evicted(self):
+        limiter = RateLimiter(rate=10, burst=10, idle_ttl=5)
+        for i in range(1000):
+            limiter.check(f"client-{i}", now=0.0)
+        limiter.check("late", now=10.0)
+        assert list(limiter.buckets) == ["late"]
+
+    def test_key_count_capped(self):
+        limiter = RateLimiter(rate=10, max_keys=100)
+        for i in range(1000):
+            limiter.check(f"client-{i}", now=0.0)
+        assert len(limiter.buckets) == 100
+
+
+class TestMiddleware:
+    @pytest.fixture
+    def client(self):
+        app = FastAPI()
+        app.middleware("http")(rate_limit_middleware)
+        app.get("/api/ping")(lambda: {"ok": True})
+        return TestClient(app)
+
+    def test_agents_behind_one_nat_get_separate_budgets(self, client, monkeypatch):
+        monkeypatch.setitem(rate_limiter.limiters, "agent", RateLimiter(rate=1, burst=1))
+
+        def ping(agent_id):
+            return client.get("/api/ping", headers={"X-API-Key": API_KEY, "X-Agent-Id": agent_id})
+
+        assert ping("lab-pc-01").status_code == 200
+        assert ping("lab-pc-02").status_code == 200
+        throttled = ping("lab-pc-01")
+        assert throttled.status_code == 429
+        assert throttled.headers["Retry-After"] == "1"
+
+    def test_random_agent_ids_with_a_wrong_key_share_the_ip_bucket(self, client, monkeypatch):
+        monkeypatch.setitem(rate_limiter.limiters, "ip", RateLimiter(rate=1, burst=2))
+        codes = [
+            client.get("/api/ping", headers={"X-API-Key": "guess", "X-Agent-Id": uuid.uuid4().hex}).status_code
+            for _ in range(3)
+        ]
+        assert codes == [200, 200, 429]
+
+    def test_random_agent_ids_with_the_key_hit_the_ip_cap(self, client, monkeypatch):
+        monkeypatch.setitem(rate_limiter.limiters, "ip_cap", RateLimiter(rate=1, burst=2))
+        codes = [
+            client.get("/api/ping", headers={"X-API-Key": API_KEY, "X-Agent-Id": uuid.uuid4().hex}).status_code
+            for _ in range(3)
+        ]
+        assert codes == [200, 200, 429]
+
+    def test_forged_tokens_share_the_ip_bucket(self, client, monkeypatch):
+        monkeypatch.setitem(rate_limiter.limiters, "ip", RateLimiter(rate=1, burst=1))
+        monkeypatch.setitem(rate_limiter.limiters, "user", RateLimiter(rate=1, burst=1))
+        forged = [f"Bearer header.payload.{uuid.uuid4().hex}" for _ in range(2)]
+        assert [client.get("/api/ping", headers={"Authorization": a}).status_code for a in forged] == [200, 429]
+
+        # A real token gets its own user budget
+        token = create_access_token({"sub": "rate-limit@example.com"})
+        assert client.get("/api/ping", headers={"Authorization": f"Bearer {token}"}).status_code == 200
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
+
+
+class TestSharedLimiterMiddleware:
+    def test_locked_bucket_file_does_not_block_the_event_loop(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "limits.db")
+        monkeypatch.setitem(rate_limiter.limiters, "ip", SharedRateLimiter(path, "ip", rate=100))
+        app = FastAPI()
+        app.middleware("http")(rate_limit_middleware)
+        app.get("/api/ping")(lambda: {"ok": True})
+
+        # Another worker holds the write lock for half a second
+        holder = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        holder.execute("BEGIN IMMEDIATE")
+        threading.Timer(0.5, holder.rollback).start()
+
+        async def scenario():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            scope = {"type": "http", "method": "GET", "path": "/api/ping", "raw_path": b"/api/ping",
+                     "query_string": b"", "headers": [], "client": ("10.0.0.1", 1234)}
+            messages = []
+
+            async def receive():
+                return {"type": "http.request", "body": b""}
+
+            async def send(message):
+                messages.append(message)
+
+            started = time.monotonic()
+            await app(scope, receive, send)
+            elapsed = time.monotonic() - started
+            task.cancel()
+            return messages[0]["status"], elapsed, ticks
+
+        status_code, elapsed, ticks = asyncio.run(scenario())
+        holder.close()
+        assert status_code == 200
+        assert elapsed >= 0.4
+        # The loop kept running other work while the check waited for the lock
+        assert ticks >= 20
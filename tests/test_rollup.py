@@ -0,0 +1,121 @@
+"""
+Metric Rollup Tests for Resource Monitoring System
+"""
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.endpoints import delete_system
+from app.db.database import SessionLocal
+from app.core.rollup import compact_all, choose_resolution
+from app.models import models
+
+client = TestClient(app)
+
+TEST_API_KEY = "secret-agent-key"
+
+NOW = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+BUCKET = NOW - timedelta(hours=2)
+
+
+@pytest.fixture
+def register(request):
+    """Registers systems named after the test; deletes them, with their metrics and rollups, afterwards."""
+    system_ids = []
+
+    def register(suffix: str = "") -> int:
+        response = client.post("/api/v1/systems/register", headers={"X-API-Key": TEST_API_KEY},
+                               json={"hostname": f"{request.node.name}{suffix}"})
+        system_ids.append(response.json()["id"])
+        return system_ids[-1]
+
+    yield register
+    db = SessionLocal()
+    try:
+        for system_id in system_ids:
+            delete_system(system_id, db)
+    finally:
+        db.close()
+
+
+class TestRollups:
+    """Closed buckets are folded into 1m/5m/1h rollups."""
+
+    def test_compactor_builds_minute_buckets(self, register):
+        system_id = register()
+        samples = [
+            {
+                "system_id": system_id, "cpu_usage": cpu, "memory_total": 100, "memory_used": 50,
+                "memory_percent": 50.0, "disk_usage": 10.0, "network_sent": 0, "network_recv": 0,
+                "timestamp": (BUCKET + timedelta(seconds=offset)).isoformat()
+            }
+            for offset, cpu in ((0, 10.0), (20, 30.0), (40, 20.0))
+        ]
+        response = client.post("/api/v1/metrics/batch", headers={"X-API-Key": TEST_API_KEY},
+                               json={"metrics": samples})
+        assert response.status_code == 201
+
+        db = SessionLocal()
+        try:
+            compact_all(db, now=NOW)
+            rollup = db.query(models.MetricRollup).filter(
+                models.MetricRollup.system_id == system_id,
+                models.MetricRollup.resolution == 60
+            ).one()
+            assert rollup.sample_count == 3
+            assert (rollup.cpu_min, rollup.cpu_max, rollup.cpu_avg, rollup.cpu_last) == (10.0, 30.0, 20.0, 20.0)
+            assert db.query(models.MetricRollup).filter(
+                models.MetricRollup.system_id == system_id,
+                models.MetricRollup.resolution == 3600
+            ).count() == 1
+        finally:
+            db.close()
+
+        series = client.get(f"/api/v1/metrics/{system_id}/series", params={
+            "start": (NOW - timedelta(hours=6)).isoformat(), "end": NOW.isoformat(), "max_points": 500
+        }).json()
+        assert series["resolution"] == "1m"
+        assert series["points"][0]["cpu_max"] == 30.0
+
+    def test_late_batch_after_a_pass_is_rolled_up(self, register):
+        def send(system_id, offset, cpu):
+            response = client.post("/api/v1/metrics/batch", headers={"X-API-Key": TEST_API_KEY}, json={"metrics": [{
+                "system_id": system_id, "cpu_usage": cpu, "memory_total": 100, "memory_used": 50,
+                "memory_percent": 50.0, "disk_usage": 10.0, "network_sent": 0, "network_recv": 0,
+                "timestamp": (BUCKET + timedelta(seconds=offset)).isoformat()
+            }]})
+            assert response.status_code == 201
+
+        def rollups(system_id, resolution):
+            return db.query(models.MetricRollup).filter(
+                models.MetricRollup.system_id == system_id, models.MetricRollup.resolution == resolution
+            ).order_by(models.MetricRollup.bucket_start).all()
+
+        early, late = register("-early"), register("-late")
+        send(early, 0, 10.0)
+        db = SessionLocal()
+        try:
+            compact_all(db, now=NOW)
+            # Both behind the watermark: another system's first data, and a replay into a rolled-up bucket
+            send(late, -600, 70.0)
+            send(early, 30, 30.0)
+            compact_all(db, now=NOW)
+            db.expire_all()
+
+            [minute] = rollups(late, 60)
+            assert (minute.sample_count, minute.cpu_max) == (1, 70.0)
+            [minute] = rollups(early, 60)
+            assert (minute.sample_count, minute.cpu_avg, minute.cpu_last) == (2, 20.0, 30.0)
+            assert [r.sample_count for r in rollups(early, 3600)] == [2]
+            assert db.query(models.RollupLateBucket).count() == 0
+        finally:
+            db.close()
+
+    def test_choose_resolution(self):
+        assert choose_resolution(NOW - timedelta(minutes=5), NOW, 500, now=NOW) == 0
+        assert choose_resolution(NOW - timedelta(hours=6), NOW, 500, now=NOW) == 60
+        assert choose_resolution(NOW - timedelta(days=30), NOW, 500, now=NOW) == 3600
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
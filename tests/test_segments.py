@@ -0,0 +1,199 @@
+"""
+Segment-File Metric Store Tests for Resource Monitoring System
+"""
+import os
+import pytest
+from datetime import datetime, timedelta, timezone
+from fastapi.testclient import TestClient
+
+np = pytest.importorskip("numpy")
+
+from app.main import app
+from app.core.segments import SegmentStore, segment_store, RECORD
+from app.core.ingest import metric_writer
+from app.core.packing import pack_floats
+from app.db.database import SessionLocal
+from app.models import models
+
+client = TestClient(app)
+
+TEST_API_KEY = "secret-agent-key"
+
+T0 = datetime(2026, 7, 1, 12, 59, 50, tzinfo=timezone.utc)
+
+
+def row(system_id: int, seconds: int, cpu: float, **fields) -> dict:
+    return {"system_id": system_id, "timestamp": T0 + timedelta(seconds=seconds), "cpu_usage": cpu,
+            "disk_read_bytes": 0, "disk_write_bytes": 0, **fields}
+
+
+class TestSegmentStore:
+    @pytest.fixture
+    def store(self, tmp_path):
+        return SegmentStore(str(tmp_path), enabled=True)
+
+    def test_round_trip_with_nulls_and_vectors(self, store):
+        store.append([row(1, 0, 12.5, cpu_per_core=pack_floats([10.5, 14.5]), memory_total=8 * 1024 ** 3,
+                          boot_time="2026-07-01T08:00:00", uptime_seconds=None)])
+        [sample] = store.history(1)
+        assert sample["timestamp"] == T0
+        assert sample["cpu_usage"] == 12.5
+        assert sample["cpu_per_core"] == [10.5, 14.5]
+        assert sample["memory_total"] == 8 * 1024 ** 3
+        assert sample["boot_time"] == "2026-07-01T08:00:00"
+        assert sample["uptime_seconds"] is None and sample["memory_percent"] is None
+
+    def test_hourly_segments_read_newest_first(self, store):
+        # Straddles an hour boundary and arrives out of order
+        store.append([row(1, second, float(second)) for second in (15, 0, 5, 20, 10)])
+        assert len(os.listdir(os.path.join(store.root, "1"))) == 2
+        assert [s["cpu_usage"] for s in store.history(1, limit=3)] == [20.0, 15.0, 10.0]
+
+        ranged = store.history(1, start=T0 + timedelta(seconds=5), end=T0 + timedelta(seconds=15))
+        assert [s["cpu_usage"] for s in ranged] == [10.0, 5.0]
+        assert [s["cpu_usage"] for s in store.history(1, since=T0 + timedelta(seconds=10))] == [20.0, 15.0]
+        assert [s["cpu_usage"] for s in store.latest(1, 2, before=T0 + timedelta(seconds=10))] == [5.0, 0.0]
+
+    def test_torn_trailing_record_is_ignored(self, store):
+        store.append([row(1, 0, 1.0), row(1, 1, 2.0)])
+        [name] = os.listdir(os.path.join(store.root, "1"))
+        with open(os.path.join(store.root, "1", name), "ab") as f:
+            f.write(b"\0" * (RECORD.itemsize // 2))
+        assert [s["cpu_usage"] for s in store.history(1)] == [2.0, 1.0]
+
+    def test_append_after_a_torn_record_starts_on_a_boundary(self, store):
+        store.append([row(1, 0, 1.0)])
+        [name] = os.listdir(os.path.join(store.root, "1"))
+        with open(os.path.join(store.root, "1", name), "ab") as f:
+            f.write(b"\xff" * (RECORD.itemsize // 2))
+        store.append([row(1, 1, 2.0), row(1, 2, 3.0)])
+        assert [s["cpu_usage"] for s in store.history(1)] == [3.0, 2.0, 1.0]
+
+    def test_short_writes_are_completed(self, store, monkeypatch):
+        real_write = os.write
+        monkeypatch.setattr(os, "write", lambda fd, data: real_write(fd, bytes(data[:100])))
+        store.append([row(1, second, float(second)) for second in range(3)])
+        monkeypatch.undo()
+        assert [s["cpu_usage"] for s in store.history(1)] == [2.0, 1.0, 0.0]
+
+    def test_fleet_pages_merge_systems_by_time(self, store):
+        store.append([row(1, 0, 1.0), row(1, 20, 3.0), row(2, 10, 2.0)])
+        pages = list(store.pages(None, ["system_id", "cpu_usage"], page_size=2))
+        assert pages == [[(1, 3.0), (2, 2.0)], [(1, 1.0)]]
+        assert store.oldest_timestamp() == T0
+
+    def test_retention_drops_whole_segments(self, store):
+        store.append([row(1, 0, 1.0), row(1, 20, 2.0)])
+        # The first segment ends at the hour boundary, 10 seconds after T0
+        assert store.delete_before(T0 + timedelta(seconds=5)) == 0
+        assert store.delete_before(T0 + timedelta(seconds=10)) == 1
+        assert [s["cpu_usage"] for s in store.history(1)] == [2.0]
+
+        store.drop_system(1)
+        assert store.systems() == []
+
+
+class TestSealing:
+    @pytest.fixture
+    def store(self, tmp_path):
+        return SegmentStore(str(tmp_path), enabled=True)
+
+    def files(self, store) -> list:
+        return sorted(os.listdir(os.path.join(store.root, "1")))
+
+    def test_closed_segments_are_compressed(self, store):
+        store.append([row(1, second, float(second), cpu_per_core=pack_floats([1.5, 2.5])) for second in range(0, 30, 2)])
+        before = store.history(1)
+
+        # Only the first segment (ending 10 s after T0) is closed long enough to seal
+        assert store.seal(now=T0 + timedelta(seconds=10, minutes=5)) == 1
+        hour = int(T0.timestamp()) // 3600 * 3600
+        assert self.files(store) == [f"{hour}.chunk", f"{hour + 3600}.seg"]
+        assert store.history(1) == before
+
+    def test_late_samples_merge_into_the_chunk(self, store):
+        store.append([row(1, 0, 1.0), row(1, 4, 3.0)])
+        store.seal(now=T0 + timedelta(hours=1))
+        store.append([row(1, 2, 2.0)])
+        assert [s["cpu_usage"] for s in store.history(1)] == [3.0, 2.0, 1.0]
+
+        store.seal(now=T0 + timedelta(hours=1))
+        assert [name.split(".")[1] for name in self.files(store)] == ["chunk"]
+        assert [s["cpu_usage"] for s in store.history(1)] == [3.0, 2.0, 1.0]
+
+    def test_interrupted_seal_does_not_duplicate(self, store):
+        store.append([row(1, 0, 1.0)])
+        store.seal(now=T0 + timedelta(hours=1))
+        # As if the pass died after writing the chunk but before removing its input
+        store.append([row(1, 0, 1.0)])
+        segment = os.path.join(store.root, "1", self.files(store)[1])
+        os.replace(segment, segment.replace(".seg", ".sealing"))
+
+        store.seal(now=T0 + timedelta(hours=1))
+        assert [s["cpu_usage"] for s in store.history(1)] == [1.0]
+
+    def test_retention_counts_sealed_samples(self, store):
+        store.append([row(1, 0, 1.0), row(1, 2, 2.0)])
+        store.seal(now=T0 + timedelta(hours=1))
+        assert store.delete_before(T0 + timedelta(hours=1)) == 2
+        assert store.history(1) == []
+
+
+class TestSegmentEngine:
+    # Recent enough for /series to serve raw samples
+    START = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(minutes=10)
+
+    @pytest.fixture(autouse=True)
+    def segments_engine(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(segment_store, "enabled", True)
+        monkeypatch.setattr(segment_store, "root", str(tmp_path))
+
+    @pytest.fixture
+    def system_id(self, request):
+        response = client.post(
+            "/api/v1/systems/register",
+            headers={"X-API-Key": TEST_API_KEY},
+            json={"hostname": request.node.name}
+        )
+        return response.json()["id"]
+
+    def sample(self, system_id: int, seconds: int, cpu: float) -> dict:
+        return {
+            "system_id": system_id, "cpu_usage": cpu, "memory_total": 10, "memory_used": 1,
+            "disk_usage": 1.0, "network_sent": 0, "network_recv": 0,
+            "timestamp": (self.START + timedelta(seconds=seconds)).isoformat()
+        }
+
+    def test_ingest_and_history_bypass_the_metrics_table(self, system_id):
+        response = client.post("/api/v1/metrics/batch", headers={"X-API-Key": TEST_API_KEY}, json={
+            "metrics": [self.sample(system_id, second, float(second)) for second in range(0, 30, 5)]
+        })
+        assert response.status_code == 201
+        client.post("/api/v1/metrics", headers={"X-API-Key": TEST_API_KEY}, json=self.sample(system_id, 0, 99.0))
+        metric_writer.flush()
+
+        db = SessionLocal()
+        try:
+            assert db.query(models.Metric).filter(models.Metric.system_id == system_id).count() == 0
+        finally:
+            db.close()
+
+        history = client.get(f"/api/v1/metrics/{system_id}", params={
+            "start": (self.START + timedelta(seconds=5)).isoformat(), "end": (self.START + timedelta(seconds=20)).isoformat()
+        }).json()
+        assert [m["cpu_usage"] for m in history] == [15.0, 10.0, 5.0]
+
+        series = client.get(f"/api/v1/metrics/{system_id}/series", params={
+            "start": self.START.isoformat(), "end": (self.START + timedelta(seconds=30)).isoformat()
+        }).json()
+        assert series["resolution"] == "raw"
+        assert [p["cpu_usage"] for p in series["points"]][-3:] == [15.0, 20.0, 25.0]
+
+        export = client.get(f"/api/v1/metrics/{system_id}/export", params={"start": self.START.isoformat()})
+        assert export.status_code == 200
+        # The queued sample is stamped on arrival
+        assert len(export.text.strip().splitlines()) == 1 + 7
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,95 @@
+"""
+Upload Encoding Tests for Resource Monitoring System
+"""
+import sys
+import gzip
+import json
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.core import wire
+
+client = TestClient(app)
+
+TEST_API_KEY = "secret-agent-key"
+
+
+@pytest.fixture
+def system_id():
+    response = client.post(
+        "/api/v1/systems/register",
+        headers={"X-API-Key": TEST_API_KEY},
+        json={"hostname": "wire-system"}
+    )
+    return response.json()["id"]
+
+
+def sample(system_id: int) -> dict:
+    return {
+        "system_id": system_id, "cpu_usage": 33.0, "memory_total": 1000, "memory_used": 100,
+        "disk_usage": 10.0, "network_sent": 0, "network_recv": 0,
+        "cpu_per_core": [10.0] * 64, "top_processes": [{"name": "python.exe", "cpu_percent": 1.0}] * 10
+    }
+
+
+def agent_encoder():
+    # The agent package lives next to backend/ (see test_discovery.py) and needs its own requirements
+    pytest.importorskip("requests")
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from agent.wire import WireEncoder
+    return WireEncoder
+
+
+def post(body: bytes, headers: dict, path: str = "/api/v1/metrics"):
+    return client.post(path, content=body, headers={"X-API-Key": TEST_API_KEY, **headers})
+
+
+class TestWireFormats:
+    def test_capabilities(self):
+        caps = client.get("/api/v1/capabilities").json()
+        assert "application/json" in caps["content_types"]
+        assert "gzip" in caps["content_encodings"]
+
+    def test_gzip_json(self, system_id):
+        body = gzip.compress(json.dumps(sample(system_id)).encode())
+        response = post(body, {"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        assert response.status_code == 202
+
+    def test_msgpack_zstd_batch(self, system_id):
+        msgpack = pytest.importorskip("msgpack")
+        zstandard = pytest.importorskip("zstandard")
+        body = zstandard.ZstdCompressor().compress(msgpack.packb({"metrics": [sample(system_id)] * 3}))
+        response = post(body, {"Content-Type": "application/msgpack", "Content-Encoding": "zstd"},
+                        path="/api/v1/metrics/batch")
+        assert response.status_code == 201
+        assert response.json()["stored"] == 3
+
+    def test_msgpack_is_validated_like_json(self, system_id):
+        msgpack = pytest.importorskip("msgpack")
+        payload = sample(system_id)
+        del payload["cpu_usage"]
+        response = post(msgpack.packb(payload), {"Content-Type": "application/msgpack"})
+        assert response.status_code == 422
+
+    def test_bad_bodies_rejected(self, system_id, monkeypatch):
+        assert post(b"not gzip", {"Content-Type": "application/json", "Content-Encoding": "gzip"}).status_code == 400
+        assert post(b"{}", {"Content-Type": "application/json", "Content-Encoding": "br"}).status_code == 415
+
+        monkeypatch.setattr(wire, "MAX_BODY_BYTES", 1024)
+        bomb = gzip.compress(b" " * 4096)
+        assert post(bomb, {"Content-Type": "application/json", "Content-Encoding": "gzip"}).status_code == 413
+
+    def test_agent_encoder_round_trip(self, system_id):
+        encoder = agent_encoder().negotiate(client, "/api/v1")
+        body, headers = encoder.encode(sample(system_id))
+        assert len(body) < len(json.dumps(sample(system_id)))
+        assert post(body, headers).status_code == 202
+
+    def test_agent_falls_back_to_json_without_capabilities(self):
+        encoder = agent_encoder().negotiate(client, "/no-such-prefix")
+        assert encoder.is_plain
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,152 @@
+"""
+Multi-Worker Mode Tests for Resource Monitoring System
+"""
+import threading
+import pytest
+from datetime import datetime, timedelta, timezone
+from app.core.workers import LeaderLease, LeaderElector
+from app.core.rate_limiter import SharedRateLimiter
+from app.core import fleet, registry
+from app.core.registry import SystemRegistry
+from app.db.database import SessionLocal
+from app.models import models
+
+
+class TestLeaderLease:
+    """Exactly one holder at a time; the next contender takes over on release."""
+
+    def test_lease_is_exclusive(self, tmp_path):
+        path = str(tmp_path / "leader.lock")
+        first, second = LeaderLease(path), LeaderLease(path)
+        assert first.acquire()
+        assert not second.acquire()
+        first.release()
+        assert second.acquire()
+        second.release()
+
+    def test_elector_takes_over_when_leader_leaves(self, tmp_path):
+        path = str(tmp_path / "leader.lock")
+        leader = LeaderLease(path)
+        assert leader.acquire()
+
+        elected = threading.Event()
+        elector = LeaderElector(elected.set, LeaderLease(path), interval=0.05)
+        elector.start()
+        assert not elected.wait(0.2)
+
+        leader.release()
+        assert elected.wait(2)
+        assert elector.is_leader
+        elector.stop()
+
+
+class TestSharedRateLimiter:
+    def test_workers_share_one_budget(self, tmp_path):
+        path = str(tmp_path / "limits.db")
+        worker_a = SharedRateLimiter(path, "agent", rate=10, burst=2)
+        worker_b = SharedRateLimiter(path, "agent", rate=10, burst=2)
+        other_class = SharedRateLimiter(path, "user", rate=10, burst=2)
+
+        assert worker_a.check("10.0.0.1|pc", now=0.0)[0]
+        assert worker_b.check("10.0.0.1|pc", now=0.0)[0]
+        allowed, retry_after = worker_a.check("10.0.0.1|pc", now=0.0)
+        assert not allowed
+        assert retry_after == pytest.approx(0.1)
+        assert other_class.check("10.0.0.1|pc", now=0.0)[0]
+        assert worker_b.check("10.0.0.1|pc", now=0.1)[0]
+
+
+class TestDatabaseSweep:
+    def test_sweep_uses_flushed_last_seen(self):
+        db = SessionLocal()
+        try:
+            system = models.System(
+                hostname="mw-sweep-system", is_active=True,
+                last_seen=datetime.now(timezone.utc) - timedelta(minutes=5)
+            )
+            db.add(system)
+            db.commit()
+
+            registry = SystemRegistry()
+            assert system.id in registry.sweep_database(db)
+            assert system.id not in registry.sweep_database(db)
+            db.refresh(system)
+            assert system.is_active is False
+        finally:
+            db.query(models.System).filter(models.System.hostname == "mw-sweep-system").delete()
+            db.commit()
+            db.close()
+
+
+class TestRegistryAcrossWorkers:
+    def test_delete_through_one_worker_reaches_the_other(self, monkeypatch):
+        db = SessionLocal()
+        try:
+            system = models.System(hostname="mw-deleted-system", is_active=True)
+            db.add(system)
+            db.commit()
+            system_id = system.id
+
+            worker_a, worker_b = SystemRegistry(multi_worker=True), SystemRegistry(multi_worker=True)
+            assert worker_a.exists(system_id, db) and worker_b.exists(system_id, db)
+
+            # Worker A handles the delete
+            db.delete(system)
+            db.commit()
+            worker_a.remove(system_id)
+            assert not worker_a.exists(system_id, db)
+
+            # Worker B trusts its copy until the TTL runs out, then re-checks
+            assert worker_b.exists(system_id, db)
+            monkeypatch.setattr(registry, "EXISTS_TTL", 0)
+            assert not worker_b.exists(system_id, db)
+            assert system_id not in worker_b.last_seen
+        finally:
+            db.query(models.System).filter(models.System.hostname == "mw-deleted-system").delete()
+            db.commit()
+            db.close()
+
+    def test_single_worker_never_rechecks(self, monkeypatch):
+        monkeypatch.setattr(registry, "EXISTS_TTL", 0)
+        single = SystemRegistry(multi_worker=False)
+        single.add(123456)
+        assert single.exists(123456, db=None)
+
+
+class TestFleetSnapshot:
+    def test_snapshot_reads_newest_sample_and_is_reused_within_ttl(self, monkeypatch):
+        monkeypatch.setattr(fleet, "_snapshot", None)
+        db = SessionLocal()
+        try:
+            system = models.System(hostname="mw-fleet-snapshot", is_active=True)
+            db.add(system)
+            db.commit()
+            base = datetime(2020, 1, 1, tzinfo=timezone.utc)
+            db.add_all([
+                models.Metric(system_id=system.id, timestamp=base + timedelta(seconds=i), cpu_usage=float(i))
+                for i in range(3)
+            ])
+            db.commit()
+
+            row = next(r for r in fleet.load_fleet_snapshot(db) if r["id"] == system.id)
+            assert row["cpu_usage"] == 2.0
+
+            # A newer sample is not picked up until the cached overview expires
+            db.add(models.Metric(system_id=system.id, timestamp=base + timedelta(seconds=10), cpu_usage=10.0))
+            db.commit()
+            row = next(r for r in fleet.load_fleet_snapshot(db) if r["id"] == system.id)
+            assert row["cpu_usage"] == 2.0
+
+            monkeypatch.setattr(fleet, "SNAPSHOT_TTL", 0)
+            row = next(r for r in fleet.load_fleet_snapshot(db) if r["id"] == system.id)
+            assert row["cpu_usage"] == 10.0
+        finally:
+            ids = db.query(models.System.id).filter(models.System.hostname == "mw-fleet-snapshot")
+            db.query(models.Metric).filter(models.Metric.system_id.in_(ids)).delete(synchronize_session=False)
+            db.query(models.System).filter(models.System.hostname == "mw-fleet-snapshot").delete()
+            db.commit()
+            db.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])